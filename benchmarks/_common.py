@@ -0,0 +1,32 @@
+"""
+Shared helpers for the benchmark scripts.
+The tool is a single file that Open WebUI execs, so it is loaded by path here
+rather than imported as a package.
+"""
+
+import importlib.util
+import pathlib
+import sys
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+TOOL_PATH = REPO_ROOT / "tools" / "time_calculator.py"
+CORPUS_DIR = pathlib.Path(__file__).resolve().parent / "corpus"
+
+
+def load_tool(module_name: str = "time_calculator"):
+    """
+    Load tools/time_calculator.py as a module and return it.
+    """
+    spec = importlib.util.spec_from_file_location(module_name, TOOL_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_queries(name: str = "queries_v1.txt") -> list:
+    """
+    Load a query corpus, one query per line. Blank lines and # comments are skipped.
+    """
+    lines = (CORPUS_DIR / name).read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#")]
@@ -0,0 +1,81 @@
+"""
+Check that offloaded Tools calls overlap instead of serializing.
+
+N concurrent calls are issued, each blocking for a different amount of time inside the
+tool (simulated by wrapping parse_duration with a sleep, which stands in for work that
+releases the GIL). The offload_min_chars Valve is set to 0 so that these short calls are
+offloaded too; the wall time should then track the slowest call rather than the sum. The
+script also checks that call_timeout_seconds returns a clean error, and exits non-zero if
+either check fails. tests/test_async.py runs the same checks.
+
+Usage: python benchmarks/bench_async_concurrency.py [--calls N] [--step SECONDS]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from _common import load_tool
+
+
+def install_slow_parse_duration(tool, step):
+    original = tool.parse_duration
+
+    def slow_parse_duration(duration_str):
+        result = original(duration_str)
+        time.sleep(step * result.hours)
+        return result
+
+    tool.parse_duration = slow_parse_duration
+
+
+async def timed_call(tools, hours):
+    start = time.perf_counter()
+    result = await tools.calculate_time_addition(f"{hours} hours", "2024-01-01")
+    return time.perf_counter() - start, result
+
+
+async def run_concurrent(tools, calls):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(timed_call(tools, hours) for hours in range(1, calls + 1)))
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=8)
+    parser.add_argument("--step", type=float, default=0.05, help="Seconds of blocking work per hour of duration")
+    args = parser.parse_args()
+
+    tool = load_tool()
+    install_slow_parse_duration(tool, args.step)
+    tools = tool.Tools()
+    tools.valves.offload_min_chars = 0
+    tools.valves.executor_max_workers = args.calls
+    tools.valves.parse_cache_size = 0
+
+    wall, results = asyncio.run(run_concurrent(tools, args.calls))
+    slowest = max(elapsed for elapsed, _ in results)
+    total = sum(elapsed for elapsed, _ in results)
+    print(f"{args.calls} concurrent calls: wall {wall:.3f}s, slowest {slowest:.3f}s, sum {total:.3f}s")
+
+    failures = []
+    if any("Result:" not in result for _, result in results):
+        failures.append("a concurrent call did not return a result")
+    if wall > slowest * 1.5:
+        failures.append(f"wall time {wall:.3f}s is not close to the slowest call {slowest:.3f}s")
+
+    tools.valves.call_timeout_seconds = args.step
+    result = asyncio.run(tools.calculate_time_addition("20 hours", "2024-01-01"))
+    print(f"timeout check: {result}")
+    if "timed out" not in result:
+        failures.append("call_timeout_seconds did not produce a timeout error")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Batch throughput check: 100,000-row calls to the bulk date arithmetic methods.
+
+Runs calculate_pairwise_difference and calculate_batch_addition on 100,000 naive ISO
+timestamps and on 100,000 ISO timestamps with UTC offsets, in every output mode, through the
+public coroutine methods as Open WebUI calls them. NumPy is imported before the clock starts,
+as it would be after the first batch call in a running worker.
+
+Fails (exit code 1) when the best of --runs for any call takes longer than --budget seconds.
+
+Usage: python benchmarks/bench_batch.py [--size N] [--budget S] [--runs N]
+"""
+
+import argparse
+import asyncio
+import gc
+import sys
+import time
+
+from _common import load_tool
+
+
+def build_inputs(size):
+    naive = [f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00" for i in range(size)]
+    offset = [f"{stamp}{'+' if i % 2 else '-'}{i % 12:02d}:30" for i, stamp in enumerate(naive)]
+    ends = [f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:00:00" for i in range(size)]
+    return {
+        "naive": {
+            "calculate_pairwise_difference": (naive, ends),
+            "calculate_batch_addition": (naive, "1 month 2 days 3 hours"),
+        },
+        "offset": {
+            "calculate_pairwise_difference": (offset, ends),
+            "calculate_batch_addition": (offset, "1 month 2 days 3 hours"),
+        },
+    }
+
+
+async def best_of(tools, method, args, runs):
+    best = float("inf")
+    for _ in range(runs):
+        gc.collect()
+        start = time.perf_counter()
+        await getattr(tools, method)(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def main_async(args):
+    tool = load_tool()
+    tool._import_numpy()
+    tools = tool.Tools()
+    tools.valves.call_timeout_seconds = 0
+
+    failures = []
+    print(f"{'method':30} {'inputs':7} {'mode':9} {'best s':>7}")
+    for inputs, calls in build_inputs(args.size).items():
+        for method, call_args in calls.items():
+            for mode in tool.OUTPUT_MODES:
+                tools.valves.output_mode = mode
+                seconds = await best_of(tools, method, call_args, args.runs)
+                print(f"{method:30} {inputs:7} {mode:9} {seconds:7.3f}")
+                if seconds > args.budget:
+                    failures.append(f"{method} on {args.size:,} {inputs} inputs ({mode}): "
+                                    f"{seconds:.3f}s over the {args.budget:.2f}s budget")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100_000, help="Rows per call")
+    parser.add_argument("--budget", type=float, default=0.75, help="Slowest allowed call, in seconds")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per call; the fastest counts")
+    args = parser.parse_args()
+
+    failures = asyncio.run(main_async(args))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
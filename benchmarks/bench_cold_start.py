@@ -0,0 +1,85 @@
+"""
+Cold-start budget check: how long Open WebUI takes to load the tool.
+
+Open WebUI execs the tool source on every worker start and tool reload, then instantiates
+Tools. This script repeats that in fresh interpreters (compile + exec of the source, then
+Tools()) and fails if the median load time exceeds the budget. pydantic is imported and
+warmed up before the clock starts, since Open WebUI has it loaded already.
+
+It also fails if loading the tool imports any of the optional heavy modules, which should
+only be imported by the features that use them.
+
+Usage: python benchmarks/bench_cold_start.py [--budget-ms MS] [--runs N]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from _common import TOOL_PATH
+
+# Modules the tool must not import until a feature needs them
+DEFERRED_MODULES = ("asyncio", "concurrent.futures", "json", "numpy", "zoneinfo")
+
+CHILD = r"""
+import sys, time
+from pydantic import BaseModel, Field
+
+class _Warmup(BaseModel):
+    value: int = Field(default=0, description="warm up pydantic model construction")
+
+before = set(sys.modules)
+start = time.perf_counter()
+with open(sys.argv[1], encoding="utf-8") as handle:
+    source = handle.read()
+namespace = {"__name__": "time_calculator"}
+exec(compile(source, sys.argv[1], "exec"), namespace)
+loaded = time.perf_counter()
+namespace["Tools"]()
+instantiated = time.perf_counter()
+new_modules = set(sys.modules) - before
+import json
+print(json.dumps({
+    "load_ms": (loaded - start) * 1e3,
+    "total_ms": (instantiated - start) * 1e3,
+    "new_modules": sorted(new_modules),
+}))
+"""
+
+
+def measure_once():
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, str(TOOL_PATH)], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget-ms", type=float, default=120.0, help="Maximum median load + Tools() time")
+    parser.add_argument("--runs", type=int, default=7, help="Fresh interpreters to measure")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    load_ms = statistics.median(run["load_ms"] for run in runs)
+    total_ms = statistics.median(run["total_ms"] for run in runs)
+    new_modules = runs[0]["new_modules"]
+    print(f"load {load_ms:.1f} ms, load + Tools() {total_ms:.1f} ms (median of {args.runs}, budget {args.budget_ms:g} ms)")
+    print(f"modules imported by the tool: {', '.join(new_modules) or 'none'}")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"cold start {total_ms:.1f} ms exceeds the {args.budget_ms:g} ms budget")
+    eager = [name for name in DEFERRED_MODULES if name in new_modules]
+    if eager:
+        failures.append(f"imported at load time: {', '.join(eager)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark the single-pass duration tokenizer against the legacy per-unit regex loops.
+
+Usage: python benchmarks/bench_duration_tokenizer.py [--repeat N]
+"""
+
+import argparse
+import re
+import timeit
+
+from _common import load_queries, load_tool
+
+# Reference copy of the pre-tokenizer implementation, kept here for comparison.
+LEGACY_PARSE_PATTERNS = {
+    'years': r'(\d+)\s*(?:year|years|yr|yrs|y)',
+    'months': r'(\d+)\s*(?:month|months|mon|mons|mo)',
+    'weeks': r'(\d+)\s*(?:week|weeks|wk|wks|w)',
+    'days': r'(\d+)\s*(?:day|days|d)',
+    'hours': r'(\d+)\s*(?:hour|hours|hr|hrs|h)',
+    'minutes': r'(\d+)\s*(?:minute|minutes|min|mins|m)',
+    'seconds': r'(\d+)\s*(?:second|seconds|sec|secs|s)'
+}
+
+LEGACY_QUERY_PATTERNS = [
+    r'(\d+\s+(?:hours?|hrs?|h))',
+    r'(\d+\s+(?:minutes?|mins?|m))',
+    r'(\d+\s+(?:seconds?|secs?|s))',
+    r'(\d+\s+(?:days?|d))',
+    r'(\d+\s+(?:weeks?|wks?|w))',
+    r'(\d+\s+(?:months?|mos?))',
+    r'(\d+\s+(?:years?|yrs?))'
+]
+
+
+def legacy_parse_duration(duration_str):
+    duration_str = duration_str.lower().strip()
+    result = {}
+    for unit, pattern in LEGACY_PARSE_PATTERNS.items():
+        match = re.search(pattern, duration_str)
+        if match:
+            result[unit] = int(match.group(1))
+    return result
+
+
+def legacy_extract_duration(query):
+    duration_str = ""
+    for pattern in LEGACY_QUERY_PATTERNS:
+        matches = re.findall(pattern, query.lower())
+        if matches:
+            duration_str += " ".join(matches) + " "
+    return duration_str.strip()
+
+
+def new_extract_duration(tool, query):
+    query_lower = query.lower()
+    return " ".join(
+        query_lower[token.start:token.end]
+        for token in tool.scan_duration_tokens(query_lower)
+    )
+
+
+def bench(label, func, queries, repeat):
+    def run():
+        for query in queries:
+            func(query)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    per_call_us = best / len(queries) * 1e6
+    print(f"{label:<40} {per_call_us:8.2f} us/query  {len(queries) / best:12,.0f} queries/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    tool = load_tool()
+    queries = load_queries()
+    print(f"{len(queries)} queries, best of {args.repeat} runs\n")
+
+    old = bench("legacy parse_duration", legacy_parse_duration, queries, args.repeat)
+    new = bench("tokenizer parse_duration", tool.parse_duration, queries, args.repeat)
+    print(f"{'speedup':<40} {old / new:8.2f}x\n")
+
+    old = bench("legacy query duration extraction", legacy_extract_duration, queries, args.repeat)
+    new = bench("tokenizer query duration extraction", lambda q: new_extract_duration(tool, q), queries, args.repeat)
+    print(f"{'speedup':<40} {old / new:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+End-to-end load simulator: replay a tool-call mix against the tool the way Open WebUI
+dispatches it, at a configurable concurrency, and report throughput, latency percentiles
+and memory growth.
+
+The Open WebUI stand-in execs the tool source into a fresh module (reading the frontmatter
+docstring for its metadata), sets the Valves from a JSON object and instantiates Tools once
+per process. Each call in the mix is a JSON argument string, as a model's tool call would
+send it. The string is decoded and filtered to the method's parameters, then passed as
+keyword arguments to the public method, and the coroutine it returns is awaited.
+
+Modes:
+  threads    N threads, each with its own event loop, share one Tools instance
+  asyncio    N tasks on one event loop share one Tools instance (long calls go to the tool's executor)
+  processes  N processes each load the tool and await their share of the calls
+
+Every result is compared with a single-threaded reference run of the same call under the
+same frozen clock. A race on shared state (caches, statistics, Valves) shows up as a
+mismatch. The run fails (exit code 1) on any mismatch. It also fails when resident memory
+grows by more than --max-growth-mb between the end of the warm-up pass and the end of
+the run.
+
+Usage:
+    python benchmarks/bench_load.py --mode threads --concurrency 32 --calls 20000
+    python benchmarks/bench_load.py --mode asyncio --valves '{"parse_cache_size": 0}'
+    python benchmarks/bench_load.py --mode processes --concurrency 4 --json
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import datetime
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+import types
+
+from _common import CORPUS_DIR, TOOL_PATH, load_queries
+
+MB = 1024 * 1024
+DEFAULT_MIX = CORPUS_DIR / "load_mix_v1.json"
+
+
+def parse_frontmatter(source: str) -> dict:
+    """
+    Read the "key: value" lines of the leading docstring, as Open WebUI does for tool metadata.
+    """
+    frontmatter = {}
+    lines = source.lstrip().splitlines()
+    if not lines or not lines[0].startswith('"""'):
+        return frontmatter
+    for line in lines[1:]:
+        if line.strip().startswith('"""'):
+            break
+        key, separator, value = line.partition(":")
+        if separator:
+            frontmatter[key.strip().lower()] = value.strip()
+    return frontmatter
+
+
+def load_tool_module(path=TOOL_PATH, tool_id: str = "time_calculator", valves: dict = None):
+    """
+    Load the tool like Open WebUI: exec the source into a new module registered in
+    sys.modules, then instantiate Tools and apply the Valves. Returns (module, frontmatter, tools).
+    """
+    with open(path, encoding="utf-8") as handle:
+        source = handle.read()
+    module = types.ModuleType(f"tool_{tool_id}")
+    sys.modules[module.__name__] = module
+    exec(compile(source, str(path), "exec"), module.__dict__)
+    tools = module.Tools()
+    if valves:
+        tools.valves = module.Tools.Valves(**valves)
+    return module, parse_frontmatter(source), tools
+
+
+class Dispatcher:
+    """
+    Resolve tool calls to bound methods. The accepted parameter names are read once per
+    method, like Open WebUI building a tool's spec when it loads it.
+    """
+
+    def __init__(self, tools):
+        self.tools = tools
+        self._methods = {}
+
+    def resolve(self, method: str, arguments: str):
+        entry = self._methods.get(method)
+        if entry is None:
+            func = getattr(self.tools, method)
+            entry = self._methods[method] = (func, frozenset(inspect.signature(func).parameters))
+        func, accepted = entry
+        params = json.loads(arguments)
+        return func, {name: value for name, value in params.items() if name in accepted}
+
+    async def call(self, method: str, arguments: str):
+        func, kwargs = self.resolve(method, arguments)
+        result = func(**kwargs)
+        return await result if inspect.isawaitable(result) else result
+
+    async def run(self, calls, results, latencies, indices=None) -> None:
+        """Await calls in order, storing each result and latency at its index."""
+        for i in (range(len(calls)) if indices is None else indices):
+            start = time.perf_counter()
+            results[i] = await self.call(*calls[i])
+            latencies[i] = time.perf_counter() - start
+
+
+def load_mix(path) -> tuple:
+    """
+    Expand a mix file into ([(method, JSON arguments)], [weight], frozen instant).
+    """
+    with open(path, encoding="utf-8") as handle:
+        mix = json.load(handle)
+    calls, weights = [], []
+    for entry in mix["calls"]:
+        if entry["arguments"] == "@query_corpus":
+            queries = load_queries(mix["query_corpus"])
+            calls += [(entry["method"], json.dumps({"query": query})) for query in queries]
+            weights += [entry["weight"] / len(queries)] * len(queries)
+        else:
+            calls.append((entry["method"], json.dumps(entry["arguments"])))
+            weights.append(entry["weight"])
+    return calls, weights, datetime.datetime.fromisoformat(mix["frozen_now"])
+
+
+def rss_mb() -> float:
+    """
+    Current resident set size in MB (peak RSS where /proc is not available).
+    """
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (MB if sys.platform == "darwin" else 1024)
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_threads(dispatcher, schedule, concurrency):
+    results, latencies = [None] * len(schedule), [0.0] * len(schedule)
+    barrier = threading.Barrier(concurrency + 1)
+
+    def worker(indices):
+        # Each thread is a separate event loop awaiting the shared Tools instance
+        barrier.wait()
+        asyncio.run(dispatcher.run(schedule, results, latencies, indices))
+
+    threads = [threading.Thread(target=worker, args=(range(w, len(schedule), concurrency),))
+               for w in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, results, latencies
+
+
+def run_asyncio(dispatcher, schedule, concurrency):
+    results, latencies = [None] * len(schedule), [0.0] * len(schedule)
+
+    async def main():
+        start = time.perf_counter()
+        await asyncio.gather(*(dispatcher.run(schedule, results, latencies, range(w, len(schedule), concurrency))
+                               for w in range(concurrency)))
+        return time.perf_counter() - start
+
+    return asyncio.run(main()), results, latencies
+
+
+def process_worker(schedule, valves, frozen_now, warmup):
+    """
+    One Open WebUI worker process: load the tool, warm up, then await its calls in order.
+    perf_counter is system-wide on Linux, so the parent can line up the workers' intervals.
+    """
+    module, _, tools = load_tool_module(valves=valves)
+    dispatcher = Dispatcher(tools)
+    results, latencies = [None] * len(schedule), [0.0] * len(schedule)
+    with module.frozen_clock(frozen_now):
+        asyncio.run(dispatcher.run(warmup, [None] * len(warmup), [0.0] * len(warmup)))
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        asyncio.run(dispatcher.run(schedule, results, latencies))
+        finished = time.perf_counter()
+    return started, finished, results, latencies, rss_mb() - rss_before
+
+
+def run_processes(schedule, concurrency, valves, frozen_now, warmup):
+    slices = [list(range(w, len(schedule), concurrency)) for w in range(concurrency)]
+    results, latencies = [None] * len(schedule), [0.0] * len(schedule)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(process_worker, [schedule[i] for i in indices], valves, frozen_now, warmup)
+                   for indices in slices]
+        outcomes = [future.result() for future in futures]
+    for indices, (_, _, worker_results, worker_latencies, _) in zip(slices, outcomes):
+        for i, result, latency in zip(indices, worker_results, worker_latencies):
+            results[i], latencies[i] = result, latency
+    wall = max(outcome[1] for outcome in outcomes) - min(outcome[0] for outcome in outcomes)
+    return wall, results, latencies, max(outcome[4] for outcome in outcomes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("threads", "asyncio", "processes"), default="threads")
+    parser.add_argument("--concurrency", type=int, default=16, help="Threads, tasks or processes")
+    parser.add_argument("--calls", type=int, default=10000, help="Total tool calls to replay")
+    parser.add_argument("--mix", default=str(DEFAULT_MIX), help="Tool-call mix file")
+    parser.add_argument("--valves", default="{}", help="Valves as a JSON object")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for drawing calls from the mix")
+    parser.add_argument("--max-growth-mb", type=float, default=32.0, help="Allowed RSS growth after warm-up")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    valves = json.loads(args.valves)
+    calls, weights, frozen_now = load_mix(args.mix)
+    schedule = random.Random(args.seed).choices(calls, weights, k=args.calls)
+    if args.mode == "asyncio":
+        valves.setdefault("executor_max_workers", args.concurrency)
+
+    # Single-threaded reference pass, which also warms up the parse cache, zones and patterns
+    module, frontmatter, tools = load_tool_module(valves=valves)
+    dispatcher = Dispatcher(tools)
+    with module.frozen_clock(frozen_now):
+        reference_results = [None] * len(calls)
+        asyncio.run(dispatcher.run(calls, reference_results, [0.0] * len(calls)))
+        reference = dict(zip(calls, reference_results))
+        rss_before = rss_mb()
+        if args.mode == "threads":
+            wall, results, latencies = run_threads(dispatcher, schedule, args.concurrency)
+        elif args.mode == "asyncio":
+            wall, results, latencies = run_asyncio(dispatcher, schedule, args.concurrency)
+        else:
+            wall, results, latencies, worker_growth = run_processes(
+                schedule, args.concurrency, valves, frozen_now, calls)
+    growth = worker_growth if args.mode == "processes" else rss_mb() - rss_before
+
+    mismatches = [(call, result) for call, result in zip(schedule, results) if result != reference[call]]
+    by_method = {}
+    for (method, _), latency in zip(schedule, latencies):
+        by_method.setdefault(method, []).append(latency)
+    ordered = sorted(latencies)
+    report = {
+        "tool": f"{frontmatter.get('title', 'tool')} {frontmatter.get('version', '')}".strip(),
+        "mode": args.mode,
+        "concurrency": args.concurrency,
+        "calls": len(schedule),
+        "wall_seconds": wall,
+        "throughput_per_second": len(schedule) / wall,
+        "latency_ms": {name: percentile(ordered, fraction) * 1e3
+                       for name, fraction in (("p50", 0.5), ("p99", 0.99), ("p999", 0.999))},
+        "max_latency_ms": ordered[-1] * 1e3,
+        "rss_growth_mb": growth,
+        "mismatches": len(mismatches),
+        "methods": {method: {"calls": len(values),
+                             "p50_ms": percentile(sorted(values), 0.5) * 1e3,
+                             "p99_ms": percentile(sorted(values), 0.99) * 1e3}
+                    for method, values in sorted(by_method.items())},
+        "parse_cache": module.get_parse_cache_stats() if args.mode != "processes" else None,
+    }
+
+    failures = []
+    if mismatches:
+        (method, arguments), result = mismatches[0]
+        failures.append(f"{len(mismatches)} results differ from the single-threaded reference, "
+                        f"first: {method}({arguments}) returned {result[:200]!r}")
+    if growth > args.max_growth_mb:
+        failures.append(f"RSS grew {growth:.1f} MB during the run (limit {args.max_growth_mb:g} MB)")
+
+    if args.json:
+        print(json.dumps(dict(report, failures=failures), indent=2))
+    else:
+        latency = report["latency_ms"]
+        print(f"{report['tool']}: {args.mode}, concurrency {args.concurrency}, {len(schedule)} calls")
+        print(f"throughput {report['throughput_per_second']:,.0f} calls/s (wall {wall:.2f} s)")
+        print(f"latency p50 {latency['p50']:.3f} ms, p99 {latency['p99']:.3f} ms, p999 {latency['p999']:.3f} ms, "
+              f"max {report['max_latency_ms']:.3f} ms")
+        print(f"RSS growth after warm-up {growth:+.2f} MB; {len(mismatches)} mismatches")
+        print(f"\n{'method':32} {'calls':>7} {'p50 ms':>9} {'p99 ms':>9}")
+        for method, stats in report["methods"].items():
+            print(f"{method:32} {stats['calls']:7} {stats['p50_ms']:9.3f} {stats['p99_ms']:9.3f}")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Stress benchmark for query scanning on very long and adversarial inputs.
+
+LLMs sometimes pass a whole pasted transcript as the query. For each input size
+(1-10 MB by default) this times parse_query with the default max_scan_chars window and
+with the window disabled (a full scan), on a realistic transcript that ends in a question
+and on strings built to make backtracking regexes go quadratic (long digit runs, repeated
+"it is", whitespace runs, unpunctuated text after a marker).
+
+Fails (exit code 1) when a full scan grows faster than linearly with the input size, when
+a windowed scan is slower than the full scan, or when the transcript is parsed wrongly.
+
+Usage: python benchmarks/bench_long_queries.py [--sizes 1,2,5,10] [--window CHARS]
+"""
+
+import argparse
+import sys
+import time
+
+from _common import load_tool
+
+MB = 1024 * 1024
+FILLER = "Speaker A: we went through the roadmap and agreed to revisit the open items next quarter. "
+QUESTION = " The current time is 12:55 PM. What time will it be in 2 hours and 30 minutes?"
+
+ADVERSARIAL = {
+    "digit run": "9",
+    "digits after 'it is'": "1",
+    "repeated 'it is'": "it is ",
+    "whitespace run": " ",
+    "repeated 'time is'": "time is ",
+    "repeated unit-like tokens": "1 m 2 h ",
+}
+
+
+def build_input(kind, size):
+    if kind == "transcript":
+        return (FILLER * (size // len(FILLER) + 1))[:size] + QUESTION
+    unit = ADVERSARIAL[kind]
+    body = (unit * (size // len(unit) + 1))[:size]
+    if kind == "digits after 'it is'":
+        return "it is " + body
+    if kind == "whitespace run":
+        return "the current time is" + body + "x"
+    return body
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1,2,5,10", help="Comma-separated input sizes in MB")
+    parser.add_argument("--window", type=int, default=None, help="Scan window (default: the max_scan_chars Valve)")
+    parser.add_argument("--slack", type=float, default=2.5, help="Allowed growth over linear scaling")
+    args = parser.parse_args()
+
+    tool = load_tool()
+    tool.PARSE_CACHE.resize(0)
+    window = args.window if args.window is not None else tool.Tools().valves.max_scan_chars
+    sizes = [float(size) for size in args.sizes.split(",")]
+
+    failures = []
+    print(f"{'input':28} {'MB':>5} {'full scan s':>12} {'MB/s':>8} {'window s':>10}")
+    for kind in ["transcript"] + list(ADVERSARIAL):
+        full_times = []
+        for size_mb in sizes:
+            query = build_input(kind, int(size_mb * MB))
+            full, full_result = timed(tool.parse_query, query, 0)
+            windowed, windowed_result = timed(tool.parse_query, query, window)
+            full_times.append(full)
+            print(f"{kind:28} {size_mb:5g} {full:12.4f} {size_mb / full:8.1f} {windowed:10.4f}")
+
+            if kind == "transcript":
+                for label, result in (("full scan", full_result), ("window", windowed_result)):
+                    if result.base_text != "12:55 pm" or result.duration_text != "2 hours 30 minutes":
+                        failures.append(f"{label} misparsed the transcript at {size_mb:g} MB: {result}")
+            if windowed > max(full * 1.5, 0.01):
+                failures.append(f"{kind} at {size_mb:g} MB: window scan {windowed:.3f}s slower than full scan {full:.3f}s")
+
+        growth = full_times[-1] / max(full_times[0], 1e-6)
+        linear = sizes[-1] / sizes[0]
+        if growth > linear * args.slack:
+            failures.append(f"{kind}: full scan grew {growth:.1f}x for {linear:g}x more input")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Streaming check: time to first output and peak memory of long results sent through
+Open WebUI's __event_emitter__.
+
+For each input size this runs a bulk timezone conversion and a whole-document extraction
+twice, offloaded to the thread executor: once without an emitter (the whole table comes
+back in the result) and once with a stand-in emitter that discards what it receives, as the
+chat would. Peak memory is traced with tracemalloc, so absolute times are inflated.
+
+Fails (exit code 1) when the streamed rows differ from the rows of the whole result, when
+streaming's peak memory grows with the input size, or when the first chunk arrives later
+than --first-output of the total time.
+
+Usage: python benchmarks/bench_streaming.py [--sizes 5000,20000] [--chunk-rows N]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+import tracemalloc
+
+from _common import load_tool
+
+SENTENCE = "We met on March 3rd at 2pm and talked for 45 minutes; the review is friday at 10am. "
+
+
+def build_calls(size):
+    timestamps = [f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00" for i in range(size)]
+    return {
+        "convert_timezone_bulk": ((timestamps, "Asia/Tokyo"), "results"),
+        "extract_time_expressions": ((SENTENCE * (size // 3), size), "expressions"),
+    }
+
+
+def row_lines(rows):
+    return "".join(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n" for row in rows)
+
+
+async def run(tools, method, args, stream):
+    """Return (seconds, seconds to first chunk or None, peak MB, digest of the table rows)."""
+    digest = hashlib.sha256()
+    start = time.perf_counter()
+    first = None
+
+    async def emitter(event):
+        nonlocal first
+        if event["type"] == "message":
+            if first is None:
+                first = time.perf_counter() - start
+            digest.update(event["data"]["content"].encode())
+
+    tracemalloc.start()
+    result = await getattr(tools, method)(*args, **({"__event_emitter__": emitter} if stream else {}))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return time.perf_counter() - start, first, peak / 1e6, result, digest
+
+
+async def main_async(args):
+    tool = load_tool()
+    tools = tool.Tools()
+    tools.valves.output_mode = "json"
+    tools.valves.stream_chunk_rows = args.chunk_rows
+    tools.valves.offload_min_chars = 0
+    tools.valves.max_extracted_expressions = 10 ** 9
+    tools.valves.call_timeout_seconds = 0
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    failures = []
+    peaks = {}
+    print(f"{'method':26} {'size':>7} {'whole s':>8} {'whole MB':>9} {'stream s':>9} {'first s':>8} {'stream MB':>10}")
+    for size in sizes:
+        for method, (call_args, table_key) in build_calls(size).items():
+            whole_s, _, whole_mb, whole, _ = await run(tools, method, call_args, stream=False)
+            stream_s, first, stream_mb, streamed, digest = await run(tools, method, call_args, stream=True)
+            print(f"{method:26} {size:7,} {whole_s:8.2f} {whole_mb:9.1f} {stream_s:9.2f} "
+                  f"{first if first is not None else float('nan'):8.3f} {stream_mb:10.1f}")
+
+            rows = json.loads(whole)[table_key]
+            if digest.hexdigest() != hashlib.sha256(row_lines(rows).encode()).hexdigest():
+                failures.append(f"{method} at {size:,}: streamed rows differ from the whole result")
+            if json.loads(streamed).get("streamed_rows") != len(rows):
+                failures.append(f"{method} at {size:,}: result does not report {len(rows):,} streamed rows")
+            if first is None or first > stream_s * args.first_output:
+                failures.append(f"{method} at {size:,}: first chunk after {first}s of {stream_s:.2f}s")
+            peaks.setdefault(method, []).append(stream_mb)
+
+    for method, method_peaks in peaks.items():
+        if method_peaks[-1] > method_peaks[0] * args.slack + 1:
+            failures.append(f"{method}: streaming peak memory grew from {method_peaks[0]:.1f} to {method_peaks[-1]:.1f} MB")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="5000,20000", help="Comma-separated row counts")
+    parser.add_argument("--chunk-rows", type=int, default=200, help="The stream_chunk_rows Valve")
+    parser.add_argument("--first-output", type=float, default=0.25, help="Latest first chunk, as a share of the total time")
+    parser.add_argument("--slack", type=float, default=1.5, help="Allowed growth of streaming peak memory")
+    args = parser.parse_args()
+
+    failures = asyncio.run(main_async(args))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Microbenchmark suite for the time calculator with a frozen clock and regression gates.
+
+Every target in the versioned corpus (corpus/suite_v*.json) is timed call by call with
+get_current_time pinned to the corpus' frozen instant, so timings and outputs are
+deterministic. The report gives ops/sec, p50 and p99 per target. When a baseline file
+exists, the run fails if any target's best-round median latency grows by more than
+--threshold. The whole corpus is timed --repeats times, interleaving the targets, with
+the garbage collector paused, and the gate compares the fastest round's median over all
+repeats: a burst of scheduler noise slows some rounds, but never makes one faster.
+
+Usage:
+    python benchmarks/bench_suite.py                     # run and compare to baseline
+    python benchmarks/bench_suite.py --update-baseline   # record a new baseline
+    python benchmarks/bench_suite.py --filter parse_ --threshold 0.15
+
+Baselines are machine specific; record one on the machine that runs the gate.
+"""
+
+import argparse
+import datetime
+import functools
+import gc
+import hashlib
+import json
+import pathlib
+import platform
+import statistics
+import sys
+import time
+
+from _common import CORPUS_DIR, load_queries, load_tool
+
+BENCH_DIR = pathlib.Path(__file__).resolve().parent
+DEFAULT_CORPUS = CORPUS_DIR / "suite_v1.json"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+
+def load_cases(corpus: dict) -> dict:
+    """
+    Expand "@query_corpus" references into one single-argument case per query.
+    """
+    queries = load_queries(corpus["query_corpus"])
+    cases = {}
+    for target, target_cases in corpus["cases"].items():
+        if target_cases == "@query_corpus":
+            target_cases = [[query] for query in queries]
+        cases[target] = [tuple(args) for args in target_cases]
+    return cases
+
+
+def resolve_target(tool, tools, target: str):
+    if target.startswith("Tools."):
+        # The synchronous implementation: the suite times the work, not the event-loop dispatch
+        return functools.partial(getattr(tool.Tools, target[len("Tools."):]).sync, tools)
+    return getattr(tool, target)
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def bench_target(func, cases: list, min_time: float, min_rounds: int, sample: dict) -> None:
+    """
+    Call func over all cases repeatedly for at least min_time seconds and min_rounds rounds,
+    adding the call latencies and round medians to sample.
+    """
+    # The first pass doubles as warm-up and records a digest of the outputs
+    digest = hashlib.sha256()
+    for args in cases:
+        digest.update(repr(func(*args)).encode())
+    sample["output_digest"] = digest.hexdigest()[:16]
+
+    perf_counter_ns = time.perf_counter_ns
+    rounds = 0
+    gc.collect()
+    gc.disable()
+    try:
+        deadline = time.perf_counter() + min_time
+        while rounds < min_rounds or time.perf_counter() < deadline:
+            round_latencies = []
+            for args in cases:
+                start = perf_counter_ns()
+                func(*args)
+                round_latencies.append(perf_counter_ns() - start)
+            sample["latencies"].extend(round_latencies)
+            sample["round_medians"].append(statistics.median(round_latencies))
+            rounds += 1
+    finally:
+        gc.enable()
+
+
+def summarize(sample: dict) -> dict:
+    latencies = sorted(sample["latencies"])
+    total_seconds = sum(latencies) / 1e9
+    return {
+        "calls": len(latencies),
+        "ops_per_sec": len(latencies) / total_seconds,
+        "p50_us": percentile(latencies, 0.50) / 1e3,
+        "p99_us": percentile(latencies, 0.99) / 1e3,
+        "mean_us": statistics.fmean(latencies) / 1e3,
+        "best_round_p50_us": min(sample["round_medians"]) / 1e3,
+        "output_digest": sample["output_digest"],
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Return a list of regression messages for targets whose best-round p50 grew by more than threshold.
+    """
+    regressions = []
+    for target, result in results.items():
+        reference = baseline["results"].get(target)
+        if reference is None:
+            continue
+        change = result["best_round_p50_us"] / reference["best_round_p50_us"] - 1
+        result["change"] = change
+        if change > threshold:
+            regressions.append(
+                f"{target}: best-round p50 {result['best_round_p50_us']:.2f} us vs baseline "
+                f"{reference['best_round_p50_us']:.2f} us ({change:+.1%}, threshold +{threshold:.0%})"
+            )
+        if result["output_digest"] != reference.get("output_digest"):
+            print(f"note: output of {target} changed since the baseline was recorded")
+    return regressions
+
+
+def print_report(results: dict) -> None:
+    print(f"{'target':<36} {'ops/sec':>12} {'p50 us':>9} {'p99 us':>9} {'p50 vs base':>12}")
+    for target, result in results.items():
+        change = f"{result['change']:+.1%}" if "change" in result else "-"
+        print(
+            f"{target:<36} {result['ops_per_sec']:>12,.0f} {result['p50_us']:>9.2f} "
+            f"{result['p99_us']:>9.2f} {change:>12}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=pathlib.Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--baseline", type=pathlib.Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.12,
+                        help="Fail when best-round p50 latency grows by more than this fraction (default 0.12)")
+    parser.add_argument("--filter", default="", help="Only run targets containing this substring")
+    parser.add_argument("--min-time", type=float, default=0.3, help="Minimum seconds per target")
+    parser.add_argument("--min-rounds", type=int, default=5, help="Minimum passes over the cases per target")
+    parser.add_argument("--repeats", type=int, default=7, help="Times the whole corpus is timed; the best round counts")
+    parser.add_argument("--cache", action="store_true", help="Keep the parse cache enabled (measures warm lookups)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    corpus = json.loads(args.corpus.read_text(encoding="utf-8"))
+    cases = load_cases(corpus)
+    tool = load_tool()
+    tools = tool.Tools()
+    if not args.cache:
+        tools.valves.parse_cache_size = 0
+        tool.PARSE_CACHE.resize(0)
+
+    targets = {target: target_cases for target, target_cases in cases.items() if args.filter in target}
+    samples = {target: {"latencies": [], "round_medians": []} for target in targets}
+    frozen_now = datetime.datetime.fromisoformat(corpus["frozen_now"])
+    with tool.frozen_clock(frozen_now):
+        for _ in range(max(1, args.repeats)):
+            for target, target_cases in targets.items():
+                bench_target(resolve_target(tool, tools, target), target_cases,
+                             args.min_time, args.min_rounds, samples[target])
+    results = {target: summarize(sample) for target, sample in samples.items()}
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps({
+            "corpus_version": corpus["version"],
+            "cache": args.cache,
+            "machine": {"python": platform.python_version(), "platform": platform.platform()},
+            "results": results,
+        }, indent=2) + "\n", encoding="utf-8")
+        print_report(results)
+        print(f"\nbaseline written to {args.baseline}")
+        return 0
+
+    regressions = []
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline["corpus_version"] != corpus["version"] or baseline["cache"] != args.cache:
+            print("baseline was recorded with a different corpus version or cache mode; not comparing")
+        else:
+            regressions = compare(results, baseline, args.threshold)
+    else:
+        print(f"no baseline at {args.baseline}; run with --update-baseline to record one")
+
+    print_report(results)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
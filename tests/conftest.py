@@ -0,0 +1,31 @@
+"""
+Shared fixtures. The tool is a single file that Open WebUI execs, so it is loaded by
+path here, the same way the benchmarks load it.
+"""
+
+import datetime
+import importlib.util
+import pathlib
+import sys
+
+import pytest
+
+TOOL_PATH = pathlib.Path(__file__).resolve().parent.parent / "tools" / "time_calculator.py"
+FROZEN_NOW = datetime.datetime(2024, 3, 15, 10, 30, 45)
+
+
+@pytest.fixture(scope="session")
+def tool():
+    """The tool module, registered as time_calculator so process workers can import it."""
+    spec = importlib.util.spec_from_file_location("time_calculator", TOOL_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["time_calculator"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def frozen(tool):
+    """Pin the tool's clock to FROZEN_NOW for the duration of a test."""
+    with tool.frozen_clock(FROZEN_NOW):
+        yield FROZEN_NOW
@@ -0,0 +1,142 @@
+"""
+The public Tools methods are coroutines: short calls run inline, longer ones and methods
+that can be slow on short input are offloaded to the executor, overlap with each other,
+and stop once they time out.
+"""
+
+import asyncio
+import inspect
+import json
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def slow_parse_duration(tool, monkeypatch):
+    """parse_duration that blocks for step seconds per hour of duration, releasing the GIL."""
+    original = tool.parse_duration
+    step = 0.05
+
+    def slow(duration_str):
+        result = original(duration_str)
+        time.sleep(step * result.hours)
+        return result
+
+    monkeypatch.setattr(tool, "parse_duration", slow)
+    return step
+
+
+def test_public_methods_are_coroutines(tool):
+    tools = tool.Tools()
+    public = [name for name in dir(tools) if not name.startswith("_") and inspect.isfunction(getattr(tool.Tools, name, None))]
+    assert public and all(inspect.iscoroutinefunction(getattr(tools, name)) for name in public)
+    assert not [name for name in public if name.endswith("_async")]
+    assert "__event_emitter__" in inspect.signature(tools.convert_timezone_bulk).parameters
+    assert "__event_emitter__" not in inspect.signature(tools.convert_duration).parameters
+
+
+def test_inline_and_offloaded_calls_agree(tool, frozen):
+    tools = tool.Tools()
+    inline = asyncio.run(tools.calculate_time_addition("1 month 3 days", "2024-01-31"))
+    tools.valves.offload_min_chars = 0
+    offloaded = asyncio.run(tools.calculate_time_addition("1 month 3 days", "2024-01-31"))
+    assert inline == offloaded == tools.calculate_time_addition.sync(tools, "1 month 3 days", "2024-01-31")
+
+
+def test_concurrent_calls_overlap(tool, slow_parse_duration):
+    calls = 6
+    tools = tool.Tools()
+    tools.valves.offload_min_chars = 0
+    tools.valves.executor_max_workers = calls
+    tools.valves.parse_cache_size = 0
+
+    async def run():
+        start = time.perf_counter()
+        results = await asyncio.gather(*(tools.calculate_time_addition(f"{hours} hours", "2024-01-01")
+                                         for hours in range(1, calls + 1)))
+        return time.perf_counter() - start, results
+
+    wall, results = asyncio.run(run())
+    assert all("Result:" in result for result in results)
+    slowest = slow_parse_duration * calls
+    assert wall < slowest * 1.5 < slow_parse_duration * sum(range(1, calls + 1))
+
+
+def test_timeout_returns_error_and_stops_the_worker(tool, monkeypatch):
+    produced = []
+    original = tool.parse_natural_datetime
+
+    def slow_parse_natural_datetime(*args):
+        produced.append(None)
+        time.sleep(0.002)
+        return original(*args)
+
+    monkeypatch.setattr(tool, "parse_natural_datetime", slow_parse_natural_datetime)
+    tools = tool.Tools()
+    tools.valves.offload_min_chars = 0
+    tools.valves.call_timeout_seconds = 0.1
+    starts = [f"january {i % 28 + 1} 2024 at {i % 12 + 1}pm" for i in range(5000)]
+
+    result = asyncio.run(tools.calculate_pairwise_difference(starts, starts))
+    assert "timed out" in result
+    time.sleep(0.05)
+    stopped_at = len(produced)
+    time.sleep(0.1)
+    assert len(produced) == stopped_at < len(starts)
+
+
+@pytest.mark.parametrize("method", ["count_business_days", "expand_recurrence", "get_world_clock",
+                                    "calculate_pairwise_difference", "find_free_slot"])
+def test_methods_slow_on_short_input_are_always_offloaded(tool, method):
+    assert getattr(tool.Tools, method).offload
+    assert not tool.Tools.calculate_time_addition.offload
+
+
+def test_short_business_day_count_runs_off_the_event_loop(tool, frozen, monkeypatch):
+    threads = []
+    original = tool.BusinessCalendar.count
+
+    def recording_count(self, *args):
+        threads.append(threading.current_thread())
+        return original(self, *args)
+
+    monkeypatch.setattr(tool.BusinessCalendar, "count", recording_count)
+    tools = tool.Tools()
+    result = asyncio.run(tools.count_business_days("2024-01-01", "2034-12-31"))
+    assert "Business days" in result
+    assert threads and threads[0] is not threading.current_thread()
+
+
+def test_inline_calls_time_out_at_their_next_check(tool, monkeypatch):
+    original = tool.parse_duration
+
+    def slow_parse_duration(duration_str):
+        time.sleep(0.1)
+        tool.check_cancelled()
+        return original(duration_str)
+
+    monkeypatch.setattr(tool, "parse_duration", slow_parse_duration)
+    tools = tool.Tools()
+    tools.valves.parse_cache_size = 0
+    tools.valves.call_timeout_seconds = 0.05
+    result = asyncio.run(tools.calculate_time_addition("2 hours", "2024-01-01"))
+    assert result == "Error: calculate_time_addition timed out after 0.05 seconds"
+
+    tools.valves.call_timeout_seconds = 1
+    assert "Result:" in asyncio.run(tools.calculate_time_addition("2 hours", "2024-01-01"))
+
+
+def test_process_executor_keeps_conversation_calls_in_process(tool, frozen):
+    tools = tool.Tools()
+    tools.valves.offload_min_chars = 0
+    tools.valves.executor_type = "process"
+    tools.valves.output_mode = "json"
+    metadata = {"chat_id": "test-process-executor"}
+
+    first = asyncio.run(tools.calculate_time_from_query("2 hours from now. the current time is 9:00 AM",
+                                                        __metadata__=metadata))
+    follow_up = asyncio.run(tools.calculate_time_from_query("and in 3 hours?", __metadata__=metadata))
+    assert json.loads(first)["result"] == "2024-03-15T11:00:00"
+    assert json.loads(follow_up)["result"] == "2024-03-15T12:00:00"
@@ -0,0 +1,74 @@
+"""
+The vectorized NumPy batch path must give the same results as the pure-Python fallback.
+"""
+
+import warnings
+
+import pytest
+
+pytest.importorskip("numpy")
+
+TIMESTAMPS = [
+    "2024-01-31T10:00:00+05:00",
+    "2024-01-31T10:00:00Z",
+    "2024-01-31T23:30:00-02:00",
+    "2024-03-10 09:00",
+    "2024-02-29",
+    "1710061200",
+    "2024-03-10 09:00 Europe/Paris",
+    "tomorrow at 3pm",
+]
+
+NAIVE_ISO = ["2024-01-31T10:00:00", "2024-02-29", "2023-12-31 23:59:59"]
+
+
+def both_paths(tool, monkeypatch, func, *args):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        vectorized = func(*args)
+    monkeypatch.setattr(tool, "_import_numpy", lambda: None)
+    fallback = func(*args)
+    monkeypatch.undo()
+    return vectorized, fallback
+
+
+@pytest.mark.parametrize("items", [TIMESTAMPS, NAIVE_ISO], ids=["mixed", "naive-iso"])
+@pytest.mark.parametrize("duration", ["1 month", "2 hours 30 minutes", "1 year 1 day"])
+@pytest.mark.parametrize("sign", [1, -1])
+def test_shift_timestamps_matches_fallback(tool, frozen, monkeypatch, items, duration, sign):
+    vectorized, fallback = both_paths(tool, monkeypatch, tool.shift_timestamps,
+                                      items, tool.parse_duration(duration), sign)
+    assert vectorized == fallback
+
+
+@pytest.mark.parametrize("items", [TIMESTAMPS, NAIVE_ISO], ids=["mixed", "naive-iso"])
+def test_pairwise_differences_matches_fallback(tool, frozen, monkeypatch, items):
+    ends = items[1:] + items[:1]
+    vectorized, fallback = both_paths(tool, monkeypatch, tool.pairwise_differences, items, ends)
+    assert vectorized == fallback
+
+
+def test_offsets_keep_wall_time_and_elapsed_difference(tool, frozen):
+    inputs, results = tool.shift_timestamps(["2024-01-31T10:00:00+05:00"], tool.parse_duration("1 month"))
+    assert (inputs, results) == (["2024-01-31 10:00:00"], ["2024-02-29 10:00:00"])
+
+    starts, ends, seconds = tool.pairwise_differences(["2024-01-31T10:00:00+05:00"], ["2024-01-31T12:00:00+01:00"])
+    assert (starts, ends, seconds) == (["2024-01-31 10:00:00"], ["2024-01-31 12:00:00"], [6 * 3600])
+
+
+@pytest.mark.parametrize("seconds", [
+    [0, 1, -1, 59, 60, 3599, 3600, 86399, 86400, -90061],
+    [29 * 86400, 30 * 86400, 364 * 86400, 365 * 86400, 400 * 86400 + 3661, -800 * 86400, 10 ** 12],
+    [3600] * 5 + [7200, 3600],
+])
+def test_format_durations_matches_format_duration(tool, monkeypatch, seconds):
+    expected = [f"{'-' if value < 0 else ''}{tool.format_duration(abs(value))}" for value in seconds]
+    vectorized, fallback = both_paths(tool, monkeypatch, tool.format_durations, seconds)
+    assert vectorized == fallback == expected
+
+
+def test_datetime64_formatting_handles_five_digit_years(tool):
+    np = tool._import_numpy()
+    values = np.array(["2024-01-31T10:00:00", "9999-12-31", "10000-01-01T12:00"], dtype="datetime64[us]")
+    assert tool._format_datetime64(np, values[:2]) == ["2024-01-31 10:00:00", "9999-12-31 00:00:00"]
+    assert tool._format_datetime64(np, values)[2] == "10000-01-01 12:00:00"
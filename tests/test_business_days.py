@@ -0,0 +1,141 @@
+"""
+Business-day arithmetic reads prefix sums over per-year bitsets, so counts and shifts must
+agree with walking the calendar one day at a time, across year boundaries, custom weekends
+and holidays that fall on non-working days.
+"""
+
+import datetime
+import json
+
+import pytest
+
+HOLIDAYS = """\
+# US federal holidays, 2024
+2023-12-25 Christmas Day
+2024-01-01 New Year's Day
+2024-07-04 Independence Day
+2024-07-06 Saturday holiday
+2024-12-25 Christmas Day
+"""
+
+
+def ordinal(year, month, day):
+    return datetime.date(year, month, day).toordinal()
+
+
+def walk_count(holidays, weekend, start, end):
+    """Business days in [start, end), one day at a time."""
+    sign, (low, high) = (1, (start, end)) if start <= end else (-1, (end, start))
+    return sign * sum(
+        1 for day in range(low, high)
+        if datetime.date.fromordinal(day).weekday() not in weekend and day not in holidays
+    )
+
+
+@pytest.fixture
+def calendar_dir(tmp_path):
+    (tmp_path / "us.txt").write_text(HOLIDAYS, encoding="utf-8")
+    return tmp_path
+
+
+@pytest.fixture
+def tools(tool, calendar_dir):
+    tools = tool.Tools()
+    tools.valves.output_mode = "json"
+    tools.valves.holiday_calendar_dir = str(calendar_dir)
+    tools.valves.default_holiday_calendar = "us"
+    return tools
+
+
+def call(tools, method, *args):
+    return json.loads(getattr(tools, method).sync(tools, *args))
+
+
+def test_holiday_on_a_weekend_is_not_counted_twice(tools):
+    result = call(tools, "count_business_days", "2024-07-01", "2024-07-08")
+    assert (result["business_days"], result["non_working_days"]) == (4, 3)
+
+
+@pytest.mark.parametrize("start, end", [
+    ((2023, 12, 20), (2024, 1, 10)),
+    ((2023, 12, 31), (2024, 1, 2)),
+    ((2022, 6, 15), (2025, 3, 3)),
+    ((2024, 1, 10), (2023, 12, 20)),
+])
+def test_counts_across_years_match_a_day_by_day_walk(tool, calendar_dir, start, end):
+    holidays = tool.load_holiday_file(str(calendar_dir / "us.txt"))
+    business_calendar = tool.BusinessCalendar(holidays)
+    expected = walk_count(holidays, {5, 6}, ordinal(*start), ordinal(*end))
+    assert business_calendar.count(ordinal(*start), ordinal(*end)) == expected
+
+
+@pytest.mark.parametrize("start, days, expected", [
+    ((2024, 7, 8), -3, (2024, 7, 2)),
+    ((2024, 1, 2), -1, (2023, 12, 29)),
+    ((2024, 7, 6), -1, (2024, 7, 5)),
+    ((2024, 7, 7), 1, (2024, 7, 8)),
+    ((2024, 1, 3), -260, None),
+])
+def test_negative_shifts_walk_back_over_weekends_and_holidays(tool, calendar_dir, start, days, expected):
+    holidays = tool.load_holiday_file(str(calendar_dir / "us.txt"))
+    business_calendar = tool.BusinessCalendar(holidays)
+    result = business_calendar.add(ordinal(*start), days)
+    if expected is not None:
+        assert result == ordinal(*expected)
+    # Shifting lands on a business day exactly |days| business days away.
+    assert business_calendar.is_business_day(result)
+    if days < 0:
+        assert walk_count(holidays, {5, 6}, ordinal(*start), result) == days
+    else:
+        assert walk_count(holidays, {5, 6}, ordinal(*start) + 1, result + 1) == days
+
+
+def test_subtract_business_days_skips_the_holiday(tools):
+    result = call(tools, "subtract_business_days", "3 business days", "2024-07-08")
+    assert result["result"] == "2024-07-02T00:00:00"
+    assert result["day_of_week"] == "Tuesday"
+
+
+def test_custom_weekend(tools):
+    tools.valves.weekend_days = "fri,sat"
+    tools.valves.default_holiday_calendar = ""
+    count = call(tools, "count_business_days", "2024-03-10", "2024-03-17")
+    assert count["business_days"] == 5
+    added = call(tools, "add_business_days", "1 business day", "2024-03-14")
+    assert (added["result"], added["day_of_week"]) == ("2024-03-17T00:00:00", "Sunday")
+    week = call(tools, "add_business_days", "1 week", "2024-03-10")
+    assert week["business_days"] == 5
+
+
+def test_a_weekend_of_seven_days_is_rejected(tool):
+    with pytest.raises(ValueError, match="At least one weekday"):
+        tool.BusinessCalendar(weekend=frozenset(range(7)))
+
+
+@pytest.mark.parametrize("start, end, hours", [
+    ("2024-07-06 10:00", "2024-07-08 12:00", 3.0),
+    ("2024-07-05 16:00", "2024-07-07 10:00", 1.0),
+    ("2024-07-06 10:00", "2024-07-07 18:00", 0.0),
+    ("2024-07-03 16:30", "2024-07-05 09:30", 1.0),
+    ("2024-07-04 08:00", "2024-07-06 20:00", 8.0),
+    ("2024-07-08 12:00", "2024-07-06 10:00", -3.0),
+])
+def test_working_hours_starting_or_ending_on_non_business_days(tools, start, end, hours):
+    assert call(tools, "calculate_working_hours", start, end)["working_hours"] == hours
+
+
+def test_bad_holiday_file_names_the_line(tool, tools, calendar_dir):
+    (calendar_dir / "bad.txt").write_text("2024-01-01 New Year\n\n2024-02-30 Not a day\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="line 3"):
+        tool.load_holiday_file(str(calendar_dir / "bad.txt"))
+    result = call(tools, "count_business_days", "2024-01-01", "2024-03-01", "bad")
+    assert "line 3" in result["error"] and result["error"].startswith("Error counting business days")
+    for line in ("2024-13-01", "2024-1", "Christmas"):
+        (calendar_dir / "bad.txt").write_text(line, encoding="utf-8")
+        with pytest.raises(ValueError, match="line 1"):
+            tool.load_holiday_file(str(calendar_dir / "bad.txt"))
+
+
+def test_missing_holiday_calendar_is_an_error(tools):
+    result = call(tools, "count_business_days", "2024-01-01", "2024-03-01", "missing")
+    assert "Holiday calendar not found" in result["error"]
@@ -0,0 +1,81 @@
+"""
+Exact calendar arithmetic: months added at the end of a month clamp to the last day of the
+target month, and month and year conversions are measured on the real calendar.
+"""
+
+import datetime
+import json
+
+import pytest
+
+
+@pytest.mark.parametrize("start, months, expected", [
+    ((2024, 1, 31), 1, (2024, 2, 29)),
+    ((2023, 1, 31), 1, (2023, 2, 28)),
+    ((2024, 3, 31), -1, (2024, 2, 29)),
+    ((2024, 5, 31), 1, (2024, 6, 30)),
+    ((2024, 2, 29), 12, (2025, 2, 28)),
+    ((2024, 2, 29), 48, (2028, 2, 29)),
+    ((2024, 12, 31), 2, (2025, 2, 28)),
+])
+def test_add_months_clamps_to_the_end_of_the_month(tool, start, months, expected):
+    assert tool.add_months(datetime.datetime(*start, 10, 30), months) == datetime.datetime(*expected, 10, 30)
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    ((2024, 1, 31), (2024, 3, 1), (0, 1, 1, 0, 0, 0)),
+    ((2024, 1, 31), (2024, 2, 29), (0, 1, 0, 0, 0, 0)),
+    ((2020, 2, 29), (2024, 3, 15), (4, 0, 15, 0, 0, 0)),
+    ((2023, 3, 31), (2023, 2, 28), (0, 1, 3, 0, 0, 0)),
+])
+def test_calendar_breakdown_counts_clamped_months(tool, start, end, expected):
+    assert tool.calendar_breakdown(datetime.datetime(*start), datetime.datetime(*end)) == expected
+
+
+def convert(tool, now, duration, unit, mode="exact"):
+    tools = tool.Tools()
+    tools.valves.output_mode = "json"
+    tools.valves.calendar_mode = mode
+    with tool.frozen_clock(now):
+        return json.loads(tools.convert_duration.sync(tools, duration, unit))
+
+
+@pytest.mark.parametrize("now, duration, unit, converted", [
+    (datetime.datetime(2024, 1, 31), "1 month", "days", 29.0),
+    (datetime.datetime(2023, 1, 31), "1 month", "days", 28.0),
+    (datetime.datetime(2024, 2, 29), "1 year", "days", 365.0),
+    (datetime.datetime(2023, 3, 1), "1 year", "days", 366.0),
+    (datetime.datetime(2024, 1, 31), "1 month", "months", 1.0),
+    (datetime.datetime(2024, 1, 31), "24 months", "years", 2.0),
+    (datetime.datetime(2024, 1, 31), "18 months", "years", 1 + 181 / 365),
+    (datetime.datetime(2024, 1, 31), "29 days", "months", 1.0),
+    (datetime.datetime(2024, 1, 31), "30 days", "months", 1 + 1 / 31),
+])
+def test_exact_conversions_at_month_ends(tool, now, duration, unit, converted):
+    result = convert(tool, now, duration, unit)
+    assert result["converted"] == pytest.approx(converted)
+    assert result["measured_from"] == now.isoformat()
+
+
+@pytest.mark.parametrize("duration, unit, converted", [
+    ("90 minutes", "hours", 1.5),
+    ("2 weeks 3 days", "days", 17.0),
+    ("27 days 23 hours", "seconds", 2415600.0),
+])
+def test_durations_shorter_than_any_month_are_not_measured_from_now(tool, duration, unit, converted):
+    result = convert(tool, datetime.datetime(2024, 1, 31), duration, unit)
+    assert result["converted"] == converted
+    assert "measured_from" not in result
+    assert result == convert(tool, datetime.datetime(2024, 1, 31), duration, unit, mode="approximate")
+
+
+def test_approximate_mode_keeps_30_day_months(tool):
+    result = convert(tool, datetime.datetime(2024, 1, 31), "1 month", "days", mode="approximate")
+    assert result["converted"] == 30.0
+    assert "measured_from" not in result
+
+
+@pytest.mark.parametrize("seconds", [0, 59, 86399, 27 * 86400 + 3661])
+def test_durations_shorter_than_a_month_format_the_same_in_both_modes(tool, seconds):
+    anchor = datetime.datetime(2024, 1, 31)
+    assert tool.format_duration(seconds, anchor) == tool.format_duration(seconds)
@@ -0,0 +1,26 @@
+"""
+Loading the tool imports none of the optional modules and compiles no regular expressions;
+the features that need them do that on first use. The load-time budget itself is checked
+by benchmarks/bench_cold_start.py, not here.
+"""
+
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "benchmarks"))
+import bench_cold_start  # noqa: E402
+from _common import TOOL_PATH  # noqa: E402
+
+
+def test_load_imports_no_optional_modules():
+    new_modules = bench_cold_start.measure_once()["new_modules"]
+    assert not set(bench_cold_start.DEFERRED_MODULES) & set(new_modules)
+
+
+def test_load_compiles_no_patterns():
+    namespace = {"__name__": "time_calculator"}
+    exec(compile(TOOL_PATH.read_text(encoding="utf-8"), str(TOOL_PATH), "exec"), namespace)
+    namespace["Tools"]()
+    patterns = [value for value in namespace.values() if isinstance(value, namespace["LazyPattern"])]
+    assert patterns
+    assert all(set(vars(pattern)) == {"pattern", "flags"} for pattern in patterns)
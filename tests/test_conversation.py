@@ -0,0 +1,75 @@
+"""
+The base time a user states in a conversation is the clock for the rest of it: follow-ups
+skip the extraction, a restated time anchors afresh, and every time-taking tool uses it.
+"""
+
+import asyncio
+import datetime
+import json
+
+import pytest
+
+STATED = "add 2 hours. the current time is 3pm in Tokyo"
+
+
+@pytest.fixture
+def clock(tool):
+    """A clock the test can move forward, starting at 2024-03-15 10:30:45."""
+    now = [datetime.datetime(2024, 3, 15, 10, 30, 45)]
+    tool.set_clock(lambda: now[0])
+    yield now
+    tool.set_clock()
+
+
+@pytest.fixture
+def conversation(tool, request):
+    """Call a Tools method (JSON output) as part of a conversation unique to the test."""
+    tools = tool.Tools()
+    tools.valves.output_mode = "json"
+    metadata = {"chat_id": request.node.name}
+
+    def call(method, *args, valves=None):
+        for name, value in (valves or {}).items():
+            setattr(tools.valves, name, value)
+        return json.loads(asyncio.run(getattr(tools, method)(*args, __metadata__=metadata)))
+
+    return call
+
+
+def test_follow_up_skips_base_extraction(tool, clock, conversation, monkeypatch):
+    assert conversation("calculate_time_from_query", STATED)["result"] == "2024-03-15T17:00:00+09:00"
+    calls = []
+    original = tool.find_base_time
+    monkeypatch.setattr(tool, "find_base_time", lambda text: calls.append(text) or original(text))
+    clock[0] += datetime.timedelta(minutes=30)
+    assert conversation("calculate_time_from_query", "and in 3 hours?")["result"] == "2024-03-15T18:30:00+09:00"
+    assert calls == []
+
+
+def test_restated_base_anchors_afresh(clock, conversation):
+    conversation("calculate_time_from_query", STATED)
+    clock[0] += datetime.timedelta(minutes=45)
+    restated = conversation("calculate_time_from_query", STATED)
+    assert restated["base_time"] == "2024-03-15T15:00:00+09:00"
+    restated = conversation("calculate_time_from_query", "add 1 hour, it is 4pm")
+    assert restated["base_time"] == "2024-03-15T16:00:00+09:00"
+
+
+@pytest.mark.parametrize("method, args, field, expected", [
+    ("calculate_time_addition", ("1 hour",), "result", "2024-03-15T16:00:00+09:00"),
+    ("calculate_time_subtraction", ("1 hour", "5pm"), "result", "2024-03-15T16:00:00+09:00"),
+    ("calculate_time_difference", ("now", "6pm"), "total_seconds", 3 * 3600),
+    ("parse_to_timestamp", ("tomorrow at 9am",), "iso_format", "2024-03-16T09:00:00+09:00"),
+    ("convert_timezone", ("now", "UTC"), "converted_time", "2024-03-15T06:00:00+00:00"),
+])
+def test_other_tools_use_the_stated_clock(clock, conversation, method, args, field, expected):
+    conversation("calculate_time_from_query", STATED)
+    assert conversation(method, *args)[field] == expected
+
+
+def test_stated_locale_is_the_auto_fallback(clock, conversation):
+    auto = {"locale": "auto"}
+    assert conversation("parse_to_timestamp", "05/01/2024", valves=auto)["iso_format"] == "2024-05-01T00:00:00"
+    conversation("calculate_time_from_query", "add 2 hours. the current time is lundi 9:00", valves=auto)
+    assert conversation("parse_to_timestamp", "05/01/2024", valves=auto)["iso_format"] == "2024-01-05T00:00:00"
+    assert conversation("parse_to_timestamp", "12h55", valves=auto)["iso_format"].endswith("T12:55:00")
@@ -0,0 +1,42 @@
+"""
+The duration tokenizer: one pass over the text finds every "<number> <unit>" token, repeated
+units add up, and each spelling maps to the right unit.
+"""
+
+import pytest
+
+
+def test_repeated_units_are_summed(tool):
+    assert tool.parse_duration("2 hours and 3 hours") == tool.DurationVector(hours=5)
+    assert tool.parse_duration("1 day, 30 mins and 45 minutes") == tool.DurationVector(days=1, minutes=75)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1 month", {"months": 1}),
+    ("1 mo", {"months": 1}),
+    ("1mon", {"months": 1}),
+    ("1 minute", {"minutes": 1}),
+    ("1 min", {"minutes": 1}),
+    ("1m", {"minutes": 1}),
+    ("5 minutes 1 month", {"minutes": 5, "months": 1}),
+    ("1 yr 2 wks 3 d 4 hrs 5 s", {"years": 1, "weeks": 2, "days": 3, "hours": 4, "seconds": 5}),
+])
+def test_unit_spellings(tool, text, expected):
+    assert tool.parse_duration(text) == tool.DurationVector(**expected)
+
+
+def test_tokens_carry_spans(tool):
+    text = "in 2 hours and 30 mins"
+    tokens = tool.scan_duration_tokens(text)
+    assert [(token.value, token.unit) for token in tokens] == [(2, "hours"), (30, "minutes")]
+    assert [text[token.start:token.end] for token in tokens] == ["2 hours", "30 mins"]
+
+
+@pytest.mark.parametrize("text", ["2 hello", "the 1st of may", "12345", "no duration here"])
+def test_units_must_be_whole_words_after_a_number(tool, text):
+    assert tool.parse_duration(text) is None
+
+
+@pytest.mark.parametrize("text", ["in 2 hours and 30 mins", "2h30m 2h", "1 yr 2 wks 3 d", "2 hello", ""])
+def test_summing_without_spans_matches_the_tokens(tool, text):
+    assert tool.duration_from_text(text) == tool.duration_from_tokens(tool.scan_duration_tokens(text))
@@ -0,0 +1,74 @@
+"""
+The epoch-nanosecond core: shift_ns adds months first, clamped to the end of the target
+month like add_months, then the fixed-length part, for years far past datetime's 9999.
+"""
+
+import datetime
+
+import pytest
+
+DAYS_PER_400_YEARS = 146097
+
+
+def ns(tool, *fields):
+    return tool.datetime_to_ns(datetime.datetime(*fields))
+
+
+@pytest.mark.parametrize("start", [(2024, 1, 31, 10, 30), (2023, 1, 31), (2024, 2, 29, 23, 59, 59), (2024, 12, 31)])
+@pytest.mark.parametrize("months", [1, -1, 13, -25, 12 * 5000 + 1, 12 * 7974 + 10, -12 * 2000 - 1])
+def test_month_shifts_match_add_months(tool, start, months):
+    shifted = tool.shift_ns(ns(tool, *start), months, 0)
+    assert tool.ns_to_datetime(shifted) == tool.add_months(datetime.datetime(*start), months)
+
+
+def test_months_are_added_before_the_rest(tool):
+    shifted = tool.shift_ns(ns(tool, 2024, 1, 31, 10, 30), 1, tool.NS_PER_DAY)
+    assert tool.format_ns(shifted) == "2024-03-01 10:30:00"
+    shifted = tool.shift_ns(ns(tool, 2024, 3, 31), -1, -tool.NS_PER_DAY)
+    assert tool.format_ns(shifted) == "2024-02-28 00:00:00"
+
+
+@pytest.mark.parametrize("start", [(2024, 1, 31, 10, 30), (2024, 2, 29), (2023, 12, 31, 23, 59, 59)])
+@pytest.mark.parametrize("cycles", [13, 20, 1995])
+def test_shifts_of_thousands_of_years_keep_the_calendar(tool, start, cycles):
+    # The Gregorian calendar repeats every 400 years, so whole cycles land on the same date
+    start_ns = ns(tool, *start)
+    shifted = tool.shift_ns(start_ns, 12 * 400 * cycles, 0)
+    assert shifted - start_ns == cycles * DAYS_PER_400_YEARS * tool.NS_PER_DAY
+    assert tool.ns_to_civil(shifted) == (start[0] + 400 * cycles, *tool.ns_to_civil(start_ns)[1:])
+    assert tool.shift_ns(shifted, -12 * 400 * cycles, 0) == start_ns
+
+
+def test_leap_day_clamps_in_far_years(tool):
+    leap_day = ns(tool, 2024, 2, 29)
+    assert tool.format_ns(tool.shift_ns(leap_day, 12 * 6000, 0)) == "8024-02-29 00:00:00"
+    assert tool.format_ns(tool.shift_ns(leap_day, 12 * 6001, 0)) == "8025-02-28 00:00:00"
+    # 10100 is not a leap year, 10400 is
+    assert tool.format_ns(tool.shift_ns(leap_day, 12 * 8076, 0)) == "10100-02-28 00:00:00"
+    assert tool.format_ns(tool.shift_ns(leap_day, 12 * 8376, 0)) == "10400-02-29 00:00:00"
+
+
+def test_far_years_past_datetime(tool):
+    shifted = tool.shift_ns(ns(tool, 2024, 1, 31, 10, 30), 12 * 8000, 0)
+    fields = tool.ns_fields(shifted)
+    assert (fields.iso, fields.date_text, fields.day_name) == ("10024-01-31T10:30:00", "10024-01-31", "Wednesday")
+    with pytest.raises(ValueError, match="10024-01-31 10:30:00 is outside the years 1-9999"):
+        tool.ns_to_datetime(shifted)
+
+
+@pytest.mark.parametrize("months, nanoseconds, message", [
+    (-12 * 2024, 0, "before year 1"),
+    (12 * 999_999, 0, "after year 999,999"),
+    (12 * 997_000, 10 ** 30, "after year 999,999"),
+    (0, -10 ** 30, "before year 1"),
+])
+def test_shifts_out_of_range_are_errors(tool, months, nanoseconds, message):
+    with pytest.raises(ValueError, match=message):
+        tool.shift_ns(ns(tool, 2024, 1, 31), months, nanoseconds)
+
+
+def test_instants_of_aware_times_are_utc(tool):
+    tokyo = datetime.datetime(2024, 3, 10, 9, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=9)))
+    utc = datetime.datetime(2024, 3, 10, 0, 0, 0, 500, tzinfo=datetime.timezone.utc)
+    assert tool.instant_ns(utc) - tool.instant_ns(tokyo) == 500_000
+    assert tool.instant_ns(tokyo.replace(tzinfo=None)) == ns(tool, 2024, 3, 10, 9)
@@ -0,0 +1,45 @@
+"""
+Time expression extraction: unit spellings only count as expression words after a number
+or "a", so ordinary prose around them is not read as a time.
+"""
+
+import datetime
+
+import pytest
+
+NOW = datetime.datetime(2024, 3, 15, 10, 30, 45)
+
+
+def mentions(tool, chunks):
+    return [(mention.kind, mention.text, mention.start, mention.value)
+            for mention in tool.iter_time_mentions(chunks, NOW)]
+
+
+@pytest.mark.parametrize("text", [
+    "We met in the second half.",
+    "It was the second time we met.",
+    "I'm sure it's fine, and so is the second draft.",
+])
+def test_unit_words_in_prose_are_not_times(tool, text):
+    assert mentions(tool, text) == []
+
+
+def test_a_minute_ago_is_a_time(tool):
+    assert mentions(tool, "He called a minute ago.") == [
+        ("datetime", "a minute ago", 10, datetime.datetime(2024, 3, 15, 10, 29, 45)),
+    ]
+
+
+def test_a_minute_ago_beside_the_second_half(tool):
+    text = "We met in the second half, then he left a minute ago."
+    assert mentions(tool, text) == [
+        ("datetime", "a minute ago", text.index("a minute"), datetime.datetime(2024, 3, 15, 10, 29, 45)),
+    ]
+
+
+def test_expressions_cut_by_a_chunk_boundary_are_found_whole(tool):
+    text = "x" * 300 + " He called a minute ago. We met in the second half."
+    cut = text.index("minute") + 3
+    assert mentions(tool, [text[:cut], text[cut:]]) == mentions(tool, text) == [
+        ("datetime", "a minute ago", text.index("a minute"), datetime.datetime(2024, 3, 15, 10, 29, 45)),
+    ]
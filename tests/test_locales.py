@@ -0,0 +1,72 @@
+"""
+Locale and date-order Valves apply per call: instances with different settings must not
+change each other's results, or the module-level defaults.
+"""
+
+import asyncio
+import json
+import threading
+
+
+def make_tools(tool, **valves):
+    tools = tool.Tools()
+    tools.valves.output_mode = "json"
+    for name, value in valves.items():
+        setattr(tools.valves, name, value)
+    return tools
+
+
+def converted_hours(result):
+    return json.loads(asyncio.run(result))["converted"]
+
+
+def test_convert_duration_localizes_target_unit(tool, frozen):
+    french = make_tools(tool, locale="fr")
+    assert converted_hours(french.convert_duration("3 jours", "heures")) == 72
+    auto = make_tools(tool, locale="auto")
+    assert converted_hours(auto.convert_duration("2 Tage", "Stunden")) == 48
+
+
+def test_instances_keep_their_own_locale(tool, frozen):
+    french = make_tools(tool, locale="fr")
+    english = make_tools(tool)
+    for _ in range(2):
+        assert converted_hours(french.convert_duration("3 jours", "heures")) == 72
+        assert "error" in json.loads(asyncio.run(english.convert_duration("3 jours", "hours")))
+    assert tool.parse_duration("3 jours") is None
+    assert tool.parse_settings() == tool.ParseSettings()
+
+
+def test_instances_keep_their_own_date_order(tool, frozen):
+    day_first = make_tools(tool, date_order="day_first")
+    month_first = make_tools(tool, date_order="month_first")
+
+    def iso(tools):
+        return json.loads(asyncio.run(tools.parse_to_timestamp("05/01/2024")))["iso_format"]
+
+    assert iso(day_first).startswith("2024-01-05")
+    assert iso(month_first).startswith("2024-05-01")
+    assert iso(day_first).startswith("2024-01-05")
+
+
+def test_concurrent_calls_with_different_locales(tool, frozen):
+    calls = {
+        "fr": (make_tools(tool, locale="fr"), "3 jours", "heures"),
+        "de": (make_tools(tool, locale="de"), "3 Tage", "Stunden"),
+        "en": (make_tools(tool), "3 days", "hours"),
+    }
+    results = {code: [] for code in calls}
+    start = threading.Barrier(len(calls))
+
+    def worker(code):
+        tools, duration, unit = calls[code]
+        start.wait()
+        for _ in range(200):
+            results[code].append(converted_hours(tools.convert_duration(duration, unit)))
+
+    threads = [threading.Thread(target=worker, args=(code,)) for code in calls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(values == [72] * 200 for values in results.values())
@@ -0,0 +1,68 @@
+"""
+The relative-date grammar: a day named in words resolves to the same instant as the
+numeric form of that day, and only offsets from now keep the current time of day.
+"""
+
+import datetime
+
+import pytest
+
+
+@pytest.mark.parametrize("words, numeric", [
+    ("march 5th 2025", "2025-03-05"),
+    ("5 march 2025", "2025-03-05"),
+    ("5th of march 2025", "2025-03-05"),
+    ("mar 5, 2025", "03/05/2025"),
+    ("march 5", "2024-03-05"),
+    ("the 5th", "2024-03-05"),
+    ("1st of next month", "2024-04-01"),
+    ("last day of next month", "2024-04-30"),
+    ("first monday of next month", "2024-04-01"),
+    ("next friday", "2024-03-22"),
+    ("last monday", "2024-03-11"),
+    ("friday", "2024-03-15"),
+    ("friday next week", "2024-03-22"),
+    ("start of next month", "2024-04-01"),
+])
+def test_days_named_in_words_start_at_midnight(tool, frozen, words, numeric):
+    parsed = tool.parse_natural_datetime(words)
+    assert parsed == tool.parse_natural_datetime(numeric)
+    assert parsed.time() == datetime.time(0, 0)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("march 5th 2025 at 3pm", datetime.datetime(2025, 3, 5, 15)),
+    ("next friday at 9:30", datetime.datetime(2024, 3, 22, 9, 30)),
+    ("end of month", datetime.datetime(2024, 3, 31, 23, 59, 59)),
+    ("3 days after march 5th 2025", datetime.datetime(2025, 3, 8)),
+])
+def test_a_stated_time_or_boundary_wins(tool, frozen, text, expected):
+    assert tool.parse_natural_datetime(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("tomorrow", datetime.datetime(2024, 3, 16, 10, 30, 45)),
+    ("in 3 days", datetime.datetime(2024, 3, 18, 10, 30, 45)),
+    ("2 days ago", datetime.datetime(2024, 3, 13, 10, 30, 45)),
+    ("next week", datetime.datetime(2024, 3, 22, 10, 30, 45)),
+])
+def test_offsets_from_now_keep_the_time_of_day(tool, frozen, text, expected):
+    assert tool.parse_natural_datetime(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "9:45 am", "9:45am", "3 pm", "15:30", "15:30:20", "12:00 am", "0:05",
+    "tomorrow at 3pm", "today at 9:30 am", "now at 5pm", "yesterday at 23:59",
+    "in 3 weeks", "in 2h30m", "in 1 year 6 months", "in 2 hours 2 hours", "in 3 weeks at 5pm",
+])
+def test_common_shapes_compile_as_the_grammar_does(tool, text):
+    assert tool.compile_natural_datetime(text) == tool._compile_lexemes(tool.lex_datetime_words(text), text)
+
+
+@pytest.mark.parametrize("text", ["13 pm", "25:00", "tomorrow at 9:61"])
+def test_impossible_clock_times_fail_as_the_grammar_does(tool, text):
+    with pytest.raises(ValueError) as fast:
+        tool.compile_natural_datetime(text)
+    with pytest.raises(ValueError) as lexed:
+        tool._compile_lexemes(tool.lex_datetime_words(text), text)
+    assert str(fast.value) == str(lexed.value)
@@ -0,0 +1,113 @@
+"""
+Every output_mode carries the same result: JSON has a key for each markdown field and a
+value for each table cell, and compact output holds the markdown text without its markup.
+"""
+
+import json
+import re
+
+import pytest
+
+CASES = [
+    ("calculate_time_from_query", ("what time is it 2 hours from now? the current time is 12:55 pm",)),
+    ("calculate_time_addition", ("1 month 2 days", "2024-01-31 08:00")),
+    ("calculate_time_subtraction", ("90 minutes", "2024-03-10 01:00 UTC")),
+    ("calculate_time_difference", ("2024-01-31 08:00", "2025-03-01 17:45:30")),
+    ("convert_duration", ("2 days 3 hours", "minutes")),
+    ("format_current_time", ("%Y-%m-%d %H:%M",)),
+    ("parse_to_timestamp", ("2024-03-10 14:30 +05:30",)),
+    ("get_time_info", ("Asia/Tokyo",)),
+    ("convert_timezone", ("2024-03-10 14:30", "America/New_York", "Europe/Paris")),
+    ("get_world_clock", (["UTC", "Asia/Kolkata", "America/Los_Angeles"],)),
+    ("convert_timezone_bulk", (["2024-03-10 14:30", "2024-07-01 00:00"], "Asia/Tokyo")),
+    ("calculate_batch_addition", (["2024-01-31T10:00:00", "2024-02-29T23:30:00+01:00"], "1 month")),
+    ("calculate_pairwise_difference", (["2024-01-01", "2024-06-01 12:00"], ["2024-03-01", "2023-06-01"])),
+    ("merge_time_ranges", (["2024-03-10 09:00 - 10:30", "2024-03-10 10:00 - 11:00", "2024-03-10 13:00 - 14:00"],)),
+    ("intersect_time_ranges", (["2024-03-10 09:00 - 12:00", "2024-03-10 10:00 - 14:00"],)),
+    ("find_time_gaps", (["2024-03-10 09:00 - 10:00", "2024-03-10 11:00 - 12:00"], "2024-03-10 08:00",
+                        "2024-03-10 13:00")),
+    ("find_free_slot", (["2024-03-10 09:00 - 10:00"], "30 minutes", "2024-03-10 09:00")),
+    ("add_business_days", ("5 business days", "2024-03-15")),
+    ("count_business_days", ("2024-03-01", "2024-04-01")),
+    ("calculate_working_hours", ("2024-03-15 16:00", "2024-03-18 10:30")),
+    ("expand_recurrence", ("every other tuesday at 3pm", "2024-03-13", 3)),
+    ("extract_time_expressions", ("We met on 2024-03-01 at 9am for 2 hours, then again 3 days later.", 2)),
+]
+
+
+def render_all(tool, method, args):
+    """The ToolResult a call builds, and its output in each mode from calling the method in that mode."""
+    tools = tool.Tools()
+    built = []
+
+    def render(result):
+        built.append(result)
+        return result.render(tools.valves.output_mode)
+
+    tools._render = render
+    outputs = {}
+    for mode in tool.OUTPUT_MODES:
+        tools.valves.output_mode = mode
+        outputs[mode] = getattr(tools, method).sync(tools, *args)
+    assert len(built) == len(tool.OUTPUT_MODES), outputs
+    return built[0], outputs
+
+
+def markdown_parts(text):
+    """(label, text) of each field, the table rows as lists of cell texts, and the note."""
+    blocks = text.split("\n\n")
+    assert blocks[0].startswith("**") and blocks[0].endswith(":**")
+    fields = [re.fullmatch(r"• \*\*(.+?):\*\* (.*)", line).groups() for line in blocks[1].split("\n")]
+    rows, note = [], None
+    for block in blocks[2:]:
+        if block.startswith("|"):
+            rows = [[cell.strip() for cell in line.strip("|").split(" | ")] for line in block.split("\n")[2:]]
+        else:
+            assert block.startswith("*") and block.endswith("*")
+            note = block[1:-1]
+    return fields, rows, note
+
+
+@pytest.mark.parametrize("method, args", CASES)
+def test_modes_carry_the_same_result(tool, frozen, method, args):
+    result, outputs = render_all(tool, method, args)
+    fields, rows, note = markdown_parts(outputs["markdown"])
+    assert fields == [(label, text) for _, label, _, text in result.fields]
+
+    # Compact output is the markdown text without the markup
+    compact = outputs["compact"].split("\n")
+    assert compact[0] == "; ".join(f"{label}: {text}" for label, text in fields)
+    assert compact[1:] == [" | ".join(row) for row in rows] + ([note] if note else [])
+
+    # JSON has one key per field, none of them shadowed by another field or an extra
+    payload = json.loads(outputs["json"])
+    keys = [key for key, _, _, _ in result.fields]
+    assert len(set(keys)) == len(keys)
+    assert not set(keys) & set(result.data)
+    assert result.columns is None or result.columns[0] not in keys
+    assert payload.pop("type") == result.kind
+    for key, _, value, _ in result.fields:
+        expected = value.iso if isinstance(value, tool.DateTimeFields) else value
+        assert payload.pop(key) == json.loads(json.dumps(expected))
+    assert payload.pop("note", None) == note
+    if result.columns is not None:
+        table_key, columns = result.columns
+        table = payload.pop(table_key)
+        assert len(table) == len(rows)
+        assert all(list(row) == [key for key, _ in columns] for row in table)
+    assert payload == json.loads(json.dumps(result.data))
+
+
+@pytest.mark.parametrize("mode", ["markdown", "json", "compact"])
+def test_failures_in_every_mode(tool, mode):
+    tools = tool.Tools()
+    tools.valves.output_mode = mode
+    output = tools.calculate_time_addition.sync(tools, "soon-ish", "2024-03-10")
+    message = "Could not parse duration: soon-ish"
+    assert output == (json.dumps({"error": message}) if mode == "json" else message)
+
+
+def test_unknown_output_mode_is_an_error(tool):
+    tools = tool.Tools()
+    tools.valves.output_mode = "yaml"
+    assert "Unknown output_mode 'yaml'" in tools.calculate_time_addition.sync(tools, "1 hour", "2024-03-10")
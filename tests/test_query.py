@@ -0,0 +1,109 @@
+"""
+parse_query reads a conversational query once into a ParsedQuery: its spans point back into
+the query, its parts agree with parsing them on their own, and the Tools methods give the
+same answer from it as from the parts.
+"""
+
+import json
+import time
+
+import pytest
+
+QUERIES = [
+    ("what time is it 2 hours from now? the current time is 12:55 pm", "add"),
+    ("It is 3pm, add 2 hours and 30 minutes", "add"),
+    ("5 days ago", "subtract"),
+    ("the time is 9:00. what was it 90 minutes before?", "subtract"),
+    ("The Current Time Is 2024-03-01 08:00, in 1 week 2 days?", "add"),
+]
+
+
+@pytest.mark.parametrize("query, operation", QUERIES)
+def test_spans_point_back_into_the_query(tool, query, operation):
+    parsed = tool.parse_query(query)
+    assert parsed.operation == operation
+    if parsed.base_span is not None:
+        start, end = parsed.base_span
+        assert query[start:end].lower() == parsed.base_text
+    assert " ".join(query[start:end].lower() for start, end in parsed.duration_spans) == parsed.duration_text
+    assert tool.parse_duration(parsed.duration_text) == parsed.duration
+
+
+@pytest.mark.parametrize("query, operation", QUERIES)
+def test_scan_window_keeps_spans_in_the_original_query(tool, query, operation):
+    padded = "filler text without times. " * 200 + query
+    parsed = tool.parse_query(padded, scan_window=len(query) + 10)
+    plain = tool.parse_query(query)
+    shift = len(padded) - len(query)
+    assert (parsed.base_text, parsed.duration, parsed.operation) == (plain.base_text, plain.duration, plain.operation)
+    assert parsed.duration_spans == tuple((start + shift, end + shift) for start, end in plain.duration_spans)
+    if plain.base_span is not None:
+        assert parsed.base_span == (plain.base_span[0] + shift, plain.base_span[1] + shift)
+
+
+@pytest.mark.parametrize("query, operation", QUERIES)
+def test_query_result_matches_its_parts(tool, frozen, query, operation):
+    tools = tool.Tools()
+    tools.valves.output_mode = "json"
+    parsed = tool.parse_query(query)
+    method = tools.calculate_time_addition if operation == "add" else tools.calculate_time_subtraction
+
+    from_query = json.loads(tools.calculate_time_from_query.sync(tools, query))
+    from_parts = json.loads(method.sync(tools, parsed.duration_text, parsed.base_text))
+    assert from_query["result"] == from_parts["result"]
+
+
+def test_parsed_query_is_immutable(tool):
+    parsed = tool.parse_query("2 hours from now")
+    with pytest.raises(AttributeError):
+        parsed.operation = "subtract"
+    assert parsed._replace(operation="subtract").operation == "subtract"
+
+
+PATHOLOGICAL = {
+    "digit run": "9" * 1_000_000,
+    "digits after 'it is'": "it is " + "1" * 1_000_000,
+    "repeated 'it is'": "it is " * 200_000,
+    "repeated 'time is'": "the time is " * 100_000,
+    "whitespace after a marker": "the current time is" + " " * 1_000_000 + "x",
+    "unit-like tokens": "1 m 2 h " * 150_000,
+}
+
+
+@pytest.mark.parametrize("kind", PATHOLOGICAL)
+def test_scan_window_bounds_the_text_each_pass_reads(tool, monkeypatch, kind):
+    query = PATHOLOGICAL[kind] + " what time is it 2 hours from now?"
+    window = 4096
+    base_scans, duration_scans = [], []
+
+    def find_base_time(text, find=tool.find_base_time):
+        base_scans.append(len(text))
+        return find(text)
+
+    def scan_duration_tokens(text, scan=tool.scan_duration_tokens):
+        duration_scans.append(len(text))
+        return scan(text)
+
+    monkeypatch.setattr(tool, "find_base_time", find_base_time)
+    monkeypatch.setattr(tool, "scan_duration_tokens", scan_duration_tokens)
+    parsed = tool.parse_query(query, scan_window=window)
+
+    assert duration_scans == [window]
+    assert all(start >= len(query) - window for start, _ in parsed.duration_spans)
+    assert parsed.duration_spans[-1] == (query.rindex("2 hours"), query.rindex("2 hours") + 7)
+    # The window itself, then at most one marker's worth of text per examined candidate
+    assert base_scans[0] == window
+    assert len(base_scans) <= 1 + tool._MAX_BASE_TIME_CANDIDATES
+    assert max(base_scans[1:], default=0) <= 12 + 8 + 2 * tool.MAX_BASE_TIME_CHARS
+    if parsed.base_span is not None:
+        start, end = parsed.base_span
+        assert query[start:end].lower() == parsed.base_text
+
+
+@pytest.mark.parametrize("kind", PATHOLOGICAL)
+def test_full_scans_of_pathological_input_stay_linear(tool, kind):
+    query = PATHOLOGICAL[kind][:200_000]
+    started = time.perf_counter()
+    tool.parse_query(query)
+    # A quadratic scan of 200,000 characters takes minutes; a linear one a fraction of a second
+    assert time.perf_counter() - started < 5
@@ -0,0 +1,102 @@
+"""
+Recurrence expansion: compiled rules land on the right days, and iter_occurrences jumps
+straight to the period containing `after` with the same results as walking from the start.
+"""
+
+import datetime
+import itertools
+import json
+
+import pytest
+
+
+def occurrences(tool, rule, start, after=None, count=6):
+    return list(itertools.islice(tool.iter_occurrences(tool.compile_recurrence(rule), start, after), count))
+
+
+def test_last_weekday_of_each_month(tool):
+    listed = occurrences(tool, "the last weekday of each month", datetime.datetime(2024, 1, 1, 9), count=12)
+    for occurrence in listed:
+        following = occurrence + datetime.timedelta(days=1)
+        assert occurrence.weekday() < 5
+        # No working day remains in the month after it
+        while following.month == occurrence.month:
+            assert following.weekday() >= 5
+            following += datetime.timedelta(days=1)
+    assert [occurrence.day for occurrence in listed[:6]] == [31, 29, 29, 30, 31, 28]
+    assert {occurrence.hour for occurrence in listed} == {9}
+
+
+def test_the_31st_clamps_to_the_end_of_short_months(tool):
+    listed = occurrences(tool, "every month on the 31st", datetime.datetime(2024, 1, 15))
+    assert [occurrence.date() for occurrence in listed] == [
+        datetime.date(2024, 1, 31), datetime.date(2024, 2, 29), datetime.date(2024, 3, 31),
+        datetime.date(2024, 4, 30), datetime.date(2024, 5, 31), datetime.date(2024, 6, 30),
+    ]
+    yearly = occurrences(tool, "every year on the 29th", datetime.datetime(2024, 2, 1), count=3)
+    assert [occurrence.date() for occurrence in yearly] == [
+        datetime.date(2024, 2, 29), datetime.date(2025, 2, 28), datetime.date(2026, 2, 28),
+    ]
+
+
+def test_every_other_tuesday_anchored_mid_week(tool):
+    # Like RFC 5545, the interval counts weeks from the week the schedule starts in,
+    # so a Wednesday start skips that week's Tuesday and the next one.
+    listed = occurrences(tool, "every other tuesday at 3pm", datetime.datetime(2024, 3, 13, 9), count=3)
+    assert listed == [datetime.datetime(2024, 3, 26, 15), datetime.datetime(2024, 4, 9, 15),
+                      datetime.datetime(2024, 4, 23, 15)]
+    late = occurrences(tool, "every other tuesday at 3pm", datetime.datetime(2024, 3, 12, 16), count=1)
+    assert late == [datetime.datetime(2024, 3, 26, 15)]
+
+
+@pytest.mark.parametrize("rule", [
+    "every other tuesday at 3pm",
+    "every 2 weeks on monday and thursday",
+    "every 3 days",
+    "every 2 days on weekdays",
+    "every weekday at 8am",
+    "the last weekday of each month",
+    "first monday of every year",
+    "every month on the 31st",
+    "every 90 minutes",
+    "every 5 hours",
+])
+@pytest.mark.parametrize("after", [
+    datetime.datetime(2024, 3, 13, 12),
+    datetime.datetime(2031, 7, 1, 0, 30),
+    datetime.datetime(2049, 12, 31, 23, 59),
+])
+def test_jumping_ahead_matches_walking_from_the_start(tool, rule, after):
+    start = datetime.datetime(2024, 3, 13, 10, 15)
+    walked = itertools.dropwhile(lambda occurrence: occurrence < after,
+                                 tool.iter_occurrences(tool.compile_recurrence(rule), start))
+    assert occurrences(tool, rule, start, after) == list(itertools.islice(walked, 6))
+
+
+def test_jumping_ahead_thousands_of_years(tool):
+    start = datetime.datetime(2024, 3, 13, 10, 15)
+    after = datetime.datetime(9000, 6, 1)  # a Sunday
+    period = datetime.timedelta(minutes=90)
+    first, second = occurrences(tool, "every 90 minutes", start, after, count=2)
+    assert after <= first < after + period and second == first + period
+    assert (first - start) % period == datetime.timedelta(0)
+    assert occurrences(tool, "every weekday", start, after, count=1) == [datetime.datetime(9000, 6, 2, 10, 15)]
+
+
+def test_daily_rules_whose_weekdays_never_come_up_end(tool):
+    # Every 7 days from a Wednesday is always a Wednesday, so the Monday filter never matches
+    assert occurrences(tool, "every 7 days on monday", datetime.datetime(2024, 3, 13)) == []
+    assert occurrences(tool, "every 14 days on wednesday", datetime.datetime(2024, 3, 13), count=2) == [
+        datetime.datetime(2024, 3, 13), datetime.datetime(2024, 3, 27),
+    ]
+
+
+def test_intervals_below_one_are_rejected(tool):
+    with pytest.raises(ValueError, match="at least 1"):
+        tool.compile_recurrence("every 0 days")
+    tools = tool.Tools()
+    tools.valves.output_mode = "json"
+    result = json.loads(tools.expand_recurrence.sync(tools, "every 0 weeks", "2024-03-13"))
+    assert result["error"] == "Error expanding recurrence: The recurrence interval must be at least 1"
+    result = json.loads(tools.expand_recurrence.sync(tools, "every 7 days on monday", "2024-03-13"))
+    assert result["error"] == 'No occurrences of "every 7 days on monday" in the requested range.'
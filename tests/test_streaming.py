@@ -0,0 +1,90 @@
+"""
+Streaming through Open WebUI's __event_emitter__: long tables reach the chat chunk by chunk
+and in order, the returned result matches the unstreamed one apart from the streamed rows,
+and an emitter that fails only stops the streaming, never the call.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+TIMESTAMPS = [f"2024-03-{day:02d} 09:00" for day in range(1, 9)]
+
+
+@pytest.fixture
+def tools(tool):
+    tools = tool.Tools()
+    tools.valves.output_mode = "json"
+    tools.valves.stream_chunk_rows = 3
+    return tools
+
+
+def run(tools, emitter, timestamps=TIMESTAMPS):
+    return asyncio.run(tools.calculate_batch_addition(timestamps, "2 hours", __event_emitter__=emitter))
+
+
+def emitter_failing_at(events, failing_event):
+    async def emitter(event):
+        events.append(event)
+        if len(events) == failing_event:
+            raise ConnectionError("the chat went away")
+    return emitter
+
+
+def streamed_rows(events):
+    return [json.loads(line) for event in events if event["type"] == "message"
+            for line in event["data"]["content"].splitlines()]
+
+
+def test_chunks_arrive_in_order(tools):
+    events = []
+    returned = json.loads(run(tools, emitter_failing_at(events, None)))
+    unstreamed = json.loads(tools.calculate_batch_addition.sync(tools, TIMESTAMPS, "2 hours"))
+
+    assert [event["type"] for event in events] == ["message", "status"] * 3
+    assert [event["data"].get("description") for event in events[1::2]] == [
+        "Shifted 3 of 8 timestamps", "Shifted 6 of 8 timestamps", "Streamed 8 rows",
+    ]
+    assert [len(event["data"]["content"].splitlines()) for event in events[::2]] == [3, 3, 2]
+    assert streamed_rows(events) == unstreamed.pop("results")
+    assert returned.pop("streamed_rows") == 8
+    assert returned == unstreamed
+
+
+@pytest.mark.parametrize("mode", ["markdown", "json", "compact"])
+def test_a_table_within_one_chunk_is_returned_whole(tools, mode):
+    tools.valves.output_mode = mode
+    events = []
+    returned = run(tools, emitter_failing_at(events, None), TIMESTAMPS[:3])
+    assert events == []
+    assert returned == tools.calculate_batch_addition.sync(tools, TIMESTAMPS[:3], "2 hours")
+
+
+@pytest.mark.parametrize("mode", ["markdown", "json", "compact"])
+def test_an_emitter_failing_at_once_returns_the_unstreamed_result(tools, mode):
+    tools.valves.output_mode = mode
+    events = []
+    returned = run(tools, emitter_failing_at(events, 1))
+    assert len(events) == 1
+    assert returned == tools.calculate_batch_addition.sync(tools, TIMESTAMPS, "2 hours")
+
+
+@pytest.mark.parametrize("failing_event", [2, 3, 5])
+def test_an_emitter_failing_midway_returns_the_rows_it_did_not_send(tools, failing_event):
+    events = []
+    returned = json.loads(run(tools, emitter_failing_at(events, failing_event)))
+    unstreamed = json.loads(tools.calculate_batch_addition.sync(tools, TIMESTAMPS, "2 hours"))
+
+    assert len(events) == failing_event
+    sent = streamed_rows(events if events[-1]["type"] == "status" else events[:-1])
+    assert returned.pop("streamed_rows") == len(sent)
+    assert sent + returned.pop("results") == unstreamed.pop("results")
+    assert returned == unstreamed
+
+
+def test_an_emitter_failing_on_the_final_status_keeps_the_result(tools):
+    events = []
+    returned = json.loads(run(tools, emitter_failing_at(events, 6)))
+    assert events[-1]["data"] == {"description": "Streamed 8 rows", "done": True}
+    assert returned["streamed_rows"] == 8 and "results" not in returned
@@ -0,0 +1,92 @@
+"""
+Interval algebra over half-open [start, end) ranges: touching ranges join but never overlap,
+nested ranges are absorbed, and empty ranges take up no time.
+"""
+
+import json
+
+import pytest
+
+# Ranges in hours since the epoch, converted to nanoseconds
+HOUR = 3600 * 10 ** 9
+
+
+def hours(*pairs):
+    return [(start * HOUR, end * HOUR) for start, end in pairs]
+
+
+@pytest.mark.parametrize("ranges, merged", [
+    ([(9, 10), (10, 11)], [(9, 11)]),
+    ([(9, 17), (10, 11), (12, 13)], [(9, 17)]),
+    ([(13, 14), (9, 10), (9.5, 11)], [(9, 11), (13, 14)]),
+    ([(9, 10), (10, 10), (12, 12)], [(9, 10), (12, 12)]),
+])
+def test_merge_joins_touching_and_nested_ranges(tool, ranges, merged):
+    assert tool.merge_ranges(hours(*ranges)) == hours(*merged)
+
+
+@pytest.mark.parametrize("ranges, min_count, covered", [
+    ([(9, 10), (10, 11)], 2, []),
+    ([(9, 10), (10, 11)], 1, [(9, 11)]),
+    ([(9, 17), (10, 11), (12, 13)], 2, [(10, 11), (12, 13)]),
+    ([(9, 17), (10, 15), (12, 13)], 3, [(12, 13)]),
+    ([(9, 17), (12, 12)], 2, []),
+    ([(9, 17), (12, 12)], 1, [(9, 17)]),
+])
+def test_covered_ranges(tool, ranges, min_count, covered):
+    assert tool.covered_ranges(hours(*ranges), min_count) == hours(*covered)
+
+
+@pytest.mark.parametrize("ranges, window, gaps", [
+    ([(9, 10), (11, 12)], (None, None), [(10, 11)]),
+    ([(9, 10), (10, 11)], (None, None), []),
+    ([(9, 10), (11, 12)], (8, 13), [(8, 9), (10, 11), (12, 13)]),
+    ([(9, 10), (11, 12)], (9.5, 11.5), [(10, 11)]),
+    ([(9, 17), (10, 11)], (12, 13), []),
+    ([(9, 10)], (12, 13), [(12, 13)]),
+    ([(12, 13)], (8, 10), [(8, 10)]),
+    ([(9, 10), (10.5, 10.5), (12, 13)], (None, None), [(10, 12)]),
+    ([], (8, 10), [(8, 10)]),
+])
+def test_gaps_within_a_window(tool, ranges, window, gaps):
+    start, end = (None if bound is None else bound * HOUR for bound in window)
+    assert tool.range_gaps(tool.merge_ranges(hours(*ranges)), start, end) == hours(*gaps)
+
+
+@pytest.mark.parametrize("ranges, length, window, slot", [
+    ([(9, 10), (11, 12)], 1, (9, None), (10, 11)),
+    ([(9, 10), (10.5, 12)], 1, (9, None), (12, 13)),
+    ([(9, 10), (10.5, 12)], 1, (8, None), (8, 9)),
+    ([(9, 10), (10.5, 10.5)], 1, (9, None), (10, 11)),
+    ([(9, 10), (10.5, 12)], 1, (9, 13), (12, 13)),
+    ([(9, 10), (10.5, 12)], 1, (9, 12.5), None),
+    ([(9, 17)], 1, (12, 17), None),
+    ([], 2, (9, 10), None),
+])
+def test_first_free_slot(tool, ranges, length, window, slot):
+    duration = tool.DurationVector(hours=length)
+    start, end = (None if bound is None else bound * HOUR for bound in window)
+    found = tool.first_free_slot(tool.merge_ranges(hours(*ranges)), duration, start, end)
+    assert found == (None if slot is None else hours(slot)[0])
+
+
+def test_free_slot_that_does_not_fit_before_the_window_end(tool):
+    tools = tool.Tools()
+    tools.valves.output_mode = "json"
+    busy = ["2024-03-10 09:00 - 10:00", "2024-03-10 10:30 - 12:00"]
+    result = json.loads(tools.find_free_slot.sync(tools, busy, "1 hour", "2024-03-10 09:00", "2024-03-10 12:30"))
+    assert result["error"] == "No free slot of 1 hour fits before the end of the window."
+    result = json.loads(tools.find_free_slot.sync(tools, busy, "1 hour", "2024-03-10 09:00", "2024-03-10 13:00"))
+    assert (result["start"], result["end"]) == ("2024-03-10T12:00:00", "2024-03-10T13:00:00")
+
+
+def test_windowed_gaps(tool):
+    tools = tool.Tools()
+    tools.valves.output_mode = "json"
+    busy = ["2024-03-10 09:00 - 10:00", "2024-03-10 09:30 - 09:45", "2024-03-10 10:00 - 11:00",
+            "2024-03-10 13:00 - 2024-03-10 13:00"]
+    result = json.loads(tools.find_time_gaps.sync(tools, busy, "2024-03-10 08:00", "2024-03-10 14:00"))
+    assert [(gap["start"], gap["end"]) for gap in result["gaps"]] == [
+        ("2024-03-10T08:00:00", "2024-03-10T09:00:00"), ("2024-03-10T11:00:00", "2024-03-10T14:00:00"),
+    ]
+    assert result["total_seconds"] == 4 * 3600
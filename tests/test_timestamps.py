@@ -0,0 +1,65 @@
+"""
+Timestamp sniffing: machine-generated timestamps are read by their shape alone, and
+anything that is not one is left to the natural-language grammar.
+"""
+
+import datetime
+
+import pytest
+
+UTC = datetime.timezone.utc
+INSTANT = datetime.datetime(2024, 3, 15, 10, 30, 45, tzinfo=UTC)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1710498645", INSTANT),
+    ("1710498645.5", INSTANT.replace(microsecond=500000)),
+    ("1710498645123", INSTANT.replace(microsecond=123000)),
+    ("1710498645123456", INSTANT.replace(microsecond=123456)),
+    ("1710498645123456789", INSTANT.replace(microsecond=123456)),
+    ("  1710498645  ", INSTANT),
+    ("-1710498645", datetime.datetime(1915, 10, 19, 13, 29, 15, tzinfo=UTC)),
+])
+def test_epoch_units_follow_from_the_magnitude(tool, text, expected):
+    assert tool.sniff_timestamp(text) == expected
+
+
+@pytest.mark.parametrize("text, expected, offset", [
+    ("2024-03-15T10:30:45Z", INSTANT, datetime.timedelta(0)),
+    ("2024-03-15T10:30:45z", INSTANT, datetime.timedelta(0)),
+    ("2024-03-15T16:00:45+05:30", INSTANT, datetime.timedelta(hours=5, minutes=30)),
+    ("2024-03-15T05:30:45-05:00", INSTANT, datetime.timedelta(hours=-5)),
+    ("2024-03-15 10:30:45.250", datetime.datetime(2024, 3, 15, 10, 30, 45, 250000), None),
+    ("2024-03-15", datetime.datetime(2024, 3, 15), None),
+])
+def test_iso_timestamps_keep_their_offset(tool, text, expected, offset):
+    sniffed = tool.sniff_timestamp(text)
+    assert sniffed == expected
+    assert sniffed.utcoffset() == offset
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("03/15/2024", datetime.datetime(2024, 3, 15)),
+    ("15.03.2024 09:30", datetime.datetime(2024, 3, 15, 9, 30)),
+])
+def test_numeric_dates(tool, text, expected):
+    assert tool.sniff_timestamp(text) == expected
+
+
+def test_an_eight_digit_date_is_not_read_as_epoch_seconds(tool, frozen):
+    # "20240315" could be a compact date or 1970-08-23 in epoch seconds, so it is not guessed
+    assert tool.sniff_timestamp("20240315") is None
+    with pytest.raises(ValueError, match="Could not understand date/time: 20240315"):
+        tool.parse_natural_datetime("20240315")
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("tomorrow", datetime.datetime(2024, 3, 16, 10, 30, 45)),
+    ("3 days ago", datetime.datetime(2024, 3, 12, 10, 30, 45)),
+    ("next friday at 3pm", datetime.datetime(2024, 3, 22, 15)),
+    ("2024-03-15 at 5pm", datetime.datetime(2024, 3, 15, 17)),
+    ("5 march 2025", datetime.datetime(2025, 3, 5)),
+])
+def test_natural_language_falls_through_to_the_grammar(tool, frozen, text, expected):
+    assert tool.sniff_timestamp(text) is None
+    assert tool.parse_natural_datetime(text) == expected
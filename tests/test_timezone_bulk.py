@@ -0,0 +1,38 @@
+"""
+Bulk timezone conversion reads offsets from precomputed per-year transition tables, which
+must agree with zoneinfo and cover the first and last years datetime supports.
+"""
+
+import datetime
+
+import pytest
+
+
+@pytest.mark.parametrize("zone_key, year", [
+    ("Europe/Paris", 2024), ("America/New_York", 1970), ("Australia/Lord_Howe", 2023),
+    ("America/Sao_Paulo", 2018), ("Asia/Kolkata", 1942), ("Pacific/Apia", 2011),
+])
+def test_offset_table_matches_zoneinfo(tool, zone_key, year):
+    zone = tool.get_zone(zone_key)
+    table = tool.ZoneOffsetTable(zone_key, year, year)
+    start = int(datetime.datetime(year, 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+    for seconds in range(start, start + 365 * 86400, 1800):
+        local = datetime.datetime.fromtimestamp(seconds, zone)
+        assert table.lookup(seconds) == (int(local.utcoffset().total_seconds()), local.tzname())
+
+
+@pytest.mark.parametrize("timestamp, zone, expected", [
+    ("0001-01-01 12:00", "Asia/Tokyo", "0001-01-01 21:18:59 LMT"),
+    ("0001-06-01 00:00", "America/New_York", "0001-05-31 19:03:58 LMT"),
+    ("9999-12-31 12:00", "America/New_York", "9999-12-31 07:00:00 EST"),
+    ("9999-06-01 00:00", "Asia/Tokyo", "9999-06-01 09:00:00 JST"),
+])
+def test_first_and_last_years_convert(tool, timestamp, zone, expected):
+    inputs, results = tool.convert_timestamps_bulk([timestamp], zone)
+    assert inputs == [f"{timestamp}:00 UTC"]
+    assert results == [expected]
+
+
+def test_results_past_the_last_year_are_a_clear_error(tool):
+    with pytest.raises(ValueError, match="outside the years 1-9999"):
+        tool.convert_timestamps_bulk(["9999-12-31 23:00"], "Asia/Tokyo")
@@ -0,0 +1,60 @@
+"""
+The process-wide Valves (cache sizes, the context TTL and the stats switch) are applied
+when an instance's Valves change, not on every call, so one instance's calls do not undo
+another's settings.
+"""
+
+import pytest
+
+
+@pytest.fixture
+def shared_state(tool):
+    """Restore the shared caches and stats switch after the test."""
+    yield
+    defaults = tool.Tools.Valves()
+    tool.PARSE_CACHE.resize(defaults.parse_cache_size)
+    tool.CONVERSATION_CONTEXTS.resize(defaults.context_store_size)
+    tool.CONVERSATION_CONTEXTS.ttl_seconds = defaults.context_ttl_seconds
+    tool.TOOL_STATS.enabled = defaults.enable_stats
+
+
+def call(tools):
+    return tools.calculate_time_addition.sync(tools, "1 hour", "2024-03-10 09:00")
+
+
+def test_shared_valves_apply_when_they_change(tool, shared_state):
+    first, second = tool.Tools(), tool.Tools()
+    first.valves.parse_cache_size = 50
+    first.valves.context_ttl_seconds = 60.0
+    call(first)
+    assert (tool.PARSE_CACHE.max_size, tool.CONVERSATION_CONTEXTS.ttl_seconds) == (50, 60.0)
+
+    second.valves.enable_stats = True
+    call(second)
+    assert (tool.PARSE_CACHE.max_size, tool.TOOL_STATS.enabled) == (1024, True)
+
+    # Unchanged Valves leave the newer settings alone
+    call(first)
+    assert (tool.PARSE_CACHE.max_size, tool.CONVERSATION_CONTEXTS.ttl_seconds) == (1024, 3600.0)
+    assert tool.TOOL_STATS.enabled
+
+    first.valves.parse_cache_size = 60
+    call(first)
+    assert (tool.PARSE_CACHE.max_size, tool.TOOL_STATS.enabled) == (60, False)
+
+
+def test_replaced_valves_apply(tool, shared_state):
+    tools = tool.Tools()
+    call(tools)
+    tools.valves = tool.Tools.Valves(context_store_size=10, enable_stats=True)
+    call(tools)
+    assert (tool.CONVERSATION_CONTEXTS.max_size, tool.TOOL_STATS.enabled) == (10, True)
+
+
+def test_invalid_valves_fail_every_call_until_fixed(tool, shared_state):
+    tools = tool.Tools()
+    tools.valves.date_order = "sideways"
+    assert "Unknown date_order 'sideways'" in call(tools)
+    assert "Unknown date_order 'sideways'" in call(tools)
+    tools.valves.date_order = "day_first"
+    assert call(tools).startswith("**Time Addition Result:**")
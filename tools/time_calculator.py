@@ -5,45 +5,603 @@ author_url: https://github.com/nicolasluckie/open-webui-tools
 version: 1.0.0
 """
 
+import array
+import bisect
+import contextlib
 import datetime
+import functools
+import itertools
+import operator
+import os
 import re
-import calendar
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+
+_clock = datetime.datetime.now
 
 
 def get_current_time() -> datetime.datetime:
     """
     Get the current time - centralized function for consistency across all time operations.
     """
-    return datetime.datetime.now()
+    return _clock()
+
+
+def set_clock(clock: Optional[Callable[[], datetime.datetime]] = None) -> None:
+    """
+    Replace the clock behind get_current_time. None restores datetime.datetime.now.
+    """
+    global _clock
+    _clock = clock or datetime.datetime.now
+
+
+@contextlib.contextmanager
+def frozen_clock(instant: datetime.datetime):
+    """
+    Context manager that pins get_current_time to a fixed instant, for deterministic
+    benchmarks and comparisons.
+    """
+    previous = _clock
+    set_clock(lambda: instant)
+    try:
+        yield instant
+    finally:
+        set_clock(previous)
+
+
+class LazyPattern:
+    """
+    A regular expression compiled on first use and then kept for the life of the module,
+    so loading the tool compiles nothing. The first access to a pattern method (search,
+    match, finditer...) compiles it and binds that method on the instance, so later
+    calls cost the same as on a compiled pattern.
+    """
+
+    def __init__(self, pattern: str, flags: int = 0):
+        self.pattern = pattern
+        self.flags = flags
+
+    def __getattr__(self, name: str):
+        value = getattr(re.compile(self.pattern, self.flags), name)
+        setattr(self, name, value)
+        return value
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU cache with hit/miss/eviction counters.
+    A max_size of 0 disables caching entirely.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max(0, max_size)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            if self.max_size == 0:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def resize(self, max_size: int) -> None:
+        max_size = max(0, max_size)
+        if max_size == self.max_size:
+            return
+        with self._lock:
+            self.max_size = max_size
+            while len(self._data) > max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def invalidate(self) -> None:
+        """Drop every entry, counting them as evictions; the counters are kept."""
+        with self._lock:
+            self.evictions += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Sentinel for cache lookups where None is a valid cached value.
+_MISSING = object()
+
+# Shared by parse_natural_datetime and parse_duration. Entries are keyed on the
+# raw input string and never depend on the clock, so they stay valid forever.
+PARSE_CACHE = LRUCache(1024)
+
+
+def get_parse_cache_stats() -> dict:
+    """
+    Return size, hit, miss and eviction counters for the parse cache.
+    """
+    return PARSE_CACHE.stats()
+
+
+class TTLCache(LRUCache):
+    """
+    LRUCache whose entries also expire once they have not been read or written for
+    ttl_seconds (0 keeps them until evicted). Reads refresh an entry, so the least recently
+    used end is also the stalest: writes drop expired entries from there, and reads drop
+    the one they find. Expired entries are counted separately from evictions.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 0.0):
+        super().__init__(max_size)
+        self.ttl_seconds = ttl_seconds
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if 0 < self.ttl_seconds < now - entry[0]:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data[key] = (now, entry[1])
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self.max_size == 0:
+                return
+            self._data[key] = (now, value)
+            self._data.move_to_end(key)
+            if self.ttl_seconds > 0:
+                while now - next(iter(self._data.values()))[0] > self.ttl_seconds:
+                    self._data.popitem(last=False)
+                    self.expirations += 1
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        super().clear()
+        self.expirations = 0
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats['expirations'] = self.expirations
+        stats['ttl_seconds'] = self.ttl_seconds
+        return stats
+
+
+class ConversationContext(NamedTuple):
+    """
+    What calculate_time_from_query remembers about one conversation: the base time the
+    user stated (resolved, so it carries its timezone), the text it was stated as, the
+    clock reading when it was stated, and the locale it was read in. Later calls in the
+    conversation read their time arguments against the user's clock, in its zone and
+    (under the 'auto' locale) with its locale as the fallback.
+    """
+    base: datetime.datetime
+    base_text: str
+    noted_at: datetime.datetime
+    locale: str
+
+    def base_now(self, now: datetime.datetime) -> datetime.datetime:
+        """The stated base time, moved forward by the time that has passed since."""
+        return self.base + (now - self.noted_at)
+
+
+# Keyed on conversation_key(); sized and timed by the context_store_size and
+# context_ttl_seconds Valves. Entries hold a few small objects, so even a full store of
+# ten thousand conversations stays in the low megabytes.
+CONVERSATION_CONTEXTS = TTLCache(10000, 3600.0)
+
+
+def conversation_key(metadata: Optional[dict], user: Optional[dict]) -> Optional[tuple]:
+    """
+    Store key for the conversation Open WebUI passed as __metadata__ and __user__: the
+    user id with the chat id (or the session id when there is no chat). None without either.
+    """
+    if not metadata:
+        return None
+    conversation = metadata.get('chat_id') or metadata.get('session_id')
+    if not conversation:
+        return None
+    return (user or {}).get('id') or metadata.get('user_id'), conversation
+
+
+def get_conversation_context_stats() -> dict:
+    """
+    Return size, hit, miss, eviction and expiration counters for the conversation store.
+    """
+    return CONVERSATION_CONTEXTS.stats()
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram in the Prometheus layout: counts[i] holds the observations
+    <= bounds[i] (and above the previous bound); the last count is the +Inf bucket.
+    """
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile; None when empty or past the last bound."""
+        total = sum(self.counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self) -> dict:
+        cumulative = list(itertools.accumulate(self.counts))
+        return {
+            'count': cumulative[-1],
+            'sum': self.sum,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'buckets': {**{repr(bound): count for bound, count in zip(self.bounds, cumulative)}, '+Inf': cumulative[-1]},
+        }
+
+
+# Histogram bounds: Tools method latency in seconds, and input size in characters
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0)
+INPUT_SIZE_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Counter families and the name of the label that tells their series apart
+STAT_COUNTERS = {
+    'parse_branch': ('branch', "Date/time strings compiled, by the parser branch that handled them."),
+    'parse_failures': ('parser', "Inputs a parser could not understand."),
+    'fallbacks': ('reason', "Times the current time was used because no time was given or found."),
+    'method_failures': ('method', "Tools calls that returned an error message."),
+    'locale_translations': ('locale', "Inputs rewritten from another language by a locale pack."),
+}
+
+
+class ToolStats:
+    """
+    Optional instrumentation: per-method latency and input-size histograms plus parser
+    branch, failure and fallback counters. Off by default; every instrumentation point
+    checks `enabled` before doing anything, so the disabled cost is one attribute read.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._latency = {}
+            self._input_size = {}
+            self._counters = {family: {} for family in STAT_COUNTERS}
+
+    def count(self, family: str, label: str, amount: int = 1) -> None:
+        with self._lock:
+            series = self._counters[family]
+            series[label] = series.get(label, 0) + amount
+
+    def observe_call(self, method: str, seconds: float, input_chars: int) -> None:
+        with self._lock:
+            latency = self._latency.get(method)
+            if latency is None:
+                latency = self._latency[method] = Histogram(LATENCY_BUCKETS)
+                self._input_size[method] = Histogram(INPUT_SIZE_BUCKETS)
+            latency.observe(seconds)
+            self._input_size[method].observe(input_chars)
+
+    @property
+    def current_method(self) -> Optional[str]:
+        """Name of the Tools method running on this thread, while it is being timed."""
+        return getattr(self._local, 'method', None)
+
+    @current_method.setter
+    def current_method(self, name: Optional[str]) -> None:
+        self._local.method = name
+
+    def snapshot(self) -> dict:
+        """
+        All statistics as plain data (JSON-serializable), with the parse cache and conversation store counters.
+        """
+        with self._lock:
+            methods = {
+                name: {'latency_seconds': self._latency[name].snapshot(),
+                       'input_chars': self._input_size[name].snapshot()}
+                for name in sorted(self._latency)
+            }
+            counters = {family: dict(sorted(series.items())) for family, series in self._counters.items()}
+        return {'enabled': self.enabled, 'methods': methods, 'counters': counters,
+                'parse_cache': get_parse_cache_stats(), 'conversation_contexts': get_conversation_context_stats()}
+
+    def to_prometheus(self, prefix: str = "time_calculator") -> str:
+        """
+        All statistics in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for metric, key, description in (('method_latency_seconds', 'latency_seconds', "Tools method latency."),
+                                         ('method_input_chars', 'input_chars', "Characters of text passed to Tools methods.")):
+            lines += [f"# HELP {prefix}_{metric} {description}", f"# TYPE {prefix}_{metric} histogram"]
+            for method, histograms in snapshot['methods'].items():
+                histogram = histograms[key]
+                for bound, count in histogram['buckets'].items():
+                    lines.append(f'{prefix}_{metric}_bucket{{method="{method}",le="{bound}"}} {count}')
+                lines.append(f'{prefix}_{metric}_sum{{method="{method}"}} {histogram["sum"]!r}')
+                lines.append(f'{prefix}_{metric}_count{{method="{method}"}} {histogram["count"]}')
+        for family, (label, description) in STAT_COUNTERS.items():
+            lines += [f"# HELP {prefix}_{family}_total {description}", f"# TYPE {prefix}_{family}_total counter"]
+            for value, count in snapshot['counters'][family].items():
+                lines.append(f'{prefix}_{family}_total{{{label}="{value}"}} {count}')
+        for cache in ('parse_cache', 'conversation_contexts'):
+            for name, value in snapshot[cache].items():
+                if name in ('hits', 'misses', 'evictions', 'expirations'):
+                    lines += [f"# TYPE {prefix}_{cache}_{name}_total counter", f"{prefix}_{cache}_{name}_total {value}"]
+                else:
+                    lines += [f"# TYPE {prefix}_{cache}_{name} gauge", f"{prefix}_{cache}_{name} {value!r}"]
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every Tools instance in the process; enabled by the enable_stats Valve.
+TOOL_STATS = ToolStats()
+
+
+def get_tool_stats() -> dict:
+    """
+    Return the instrumentation snapshot (see ToolStats.snapshot).
+    """
+    return TOOL_STATS.snapshot()
+
+
+def _input_chars(args: tuple, kwargs: dict, limit: int = None) -> int:
+    """
+    Total length of the text arguments of a Tools call (strings, and strings in lists).
+    With a limit, counting stops as soon as the total reaches it.
+    """
+    total = 0
+    for value in itertools.chain(args, kwargs.values()):
+        if isinstance(value, str):
+            value = (value,)
+        elif not isinstance(value, (list, tuple)):
+            continue
+        for item in value:
+            if isinstance(item, str):
+                total += len(item)
+                if limit is not None and total >= limit:
+                    return total
+    return total
+
+
+def _instrumented(method):
+    """
+    Time a Tools method and record the size of its text input when TOOL_STATS is enabled.
+    The method's parse settings (set by _sync_valves) are dropped when it returns, so they
+    never leak into the caller or the next call on the same thread.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        outer_settings = _CALL_SETTINGS.settings
+        if not TOOL_STATS.enabled:
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                _CALL_SETTINGS.settings = outer_settings
+        outer = TOOL_STATS.current_method
+        TOOL_STATS.current_method = name
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            TOOL_STATS.observe_call(name, time.perf_counter() - start, _input_chars(args, kwargs))
+            TOOL_STATS.current_method = outer
+            _CALL_SETTINGS.settings = outer_settings
+
+    return wrapper
+
+
+# Unit spellings for each duration field, longest spelling first so the
+# alternation below never settles on a prefix ("mo" before "months").
+DURATION_UNIT_ALIASES = {
+    'years': ('years', 'year', 'yrs', 'yr', 'y'),
+    'months': ('months', 'month', 'mons', 'mon', 'mo'),
+    'weeks': ('weeks', 'week', 'wks', 'wk', 'w'),
+    'days': ('days', 'day', 'd'),
+    'hours': ('hours', 'hour', 'hrs', 'hr', 'h'),
+    'minutes': ('minutes', 'minute', 'mins', 'min', 'm'),
+    'seconds': ('seconds', 'second', 'secs', 'sec', 's'),
+}
+
+_UNIT_BY_ALIAS = {
+    alias: unit
+    for unit, aliases in DURATION_UNIT_ALIASES.items()
+    for alias in aliases
+}
+
+_UNIT_ALTERNATION = '|'.join(sorted(_UNIT_BY_ALIAS, key=len, reverse=True))
+
+# One alternation over every unit spelling. The negative lookahead stops a unit
+# from matching the start of an unrelated word ("2 hello", "1st"); the lookbehind
+# only lets a match start at the first digit of a number, which keeps the scan
+# linear on long digit runs.
+DURATION_TOKEN_RE = LazyPattern(r'(?<!\d)(\d+)\s*(' + _UNIT_ALTERNATION + r')(?![a-z])')
+
+
+class DurationToken(NamedTuple):
+    """A single "<number> <unit>" match found by scan_duration_tokens."""
+    value: int
+    unit: str
+    start: int
+    end: int
+
+
+def scan_duration_tokens(text: str) -> List[DurationToken]:
+    """
+    Scan text once and return every duration token with its span.
+    The text is expected to be lowercase already; spans index into it.
+    Example: "2 hours and 30 mins" -> [(2, 'hours', 0, 7), (30, 'minutes', 12, 19)]
+    """
+    return [
+        DurationToken(int(match.group(1)), _UNIT_BY_ALIAS[match.group(2)], match.start(), match.end())
+        for match in DURATION_TOKEN_RE.finditer(text)
+    ]
+
+
+class DurationVector(NamedTuple):
+    """
+    Fixed-layout duration with one integer field per unit, in DURATION_UNIT_ALIASES order.
+    """
+    years: int = 0
+    months: int = 0
+    weeks: int = 0
+    days: int = 0
+    hours: int = 0
+    minutes: int = 0
+    seconds: int = 0
+
+    @property
+    def total_months(self) -> int:
+        """Calendar part of the duration, in months."""
+        return self.years * 12 + self.months
+
+    @property
+    def delta(self) -> datetime.timedelta:
+        """Fixed-length part of the duration (weeks and smaller)."""
+        return datetime.timedelta(self.weeks * 7 + self.days, self.hours * 3600 + self.minutes * 60 + self.seconds)
+
+    @property
+    def nanoseconds(self) -> int:
+        """Fixed-length part of the duration (weeks and smaller), in nanoseconds."""
+        return (((self.weeks * 7 + self.days) * 24 + self.hours) * 3600 + self.minutes * 60 + self.seconds) * NS_PER_SECOND
+
+    def approximate_seconds(self) -> int:
+        """Total length in seconds, counting a month as 30 days and a year as 365 days."""
+        return (
+            (self.years * 365 + self.months * 30 + self.weeks * 7 + self.days) * 24 * 3600
+            + self.hours * 3600 + self.minutes * 60 + self.seconds
+        )
+
+
+_UNIT_INDEX = {unit: index for index, unit in enumerate(DurationVector._fields)}
+
+
+def duration_from_tokens(tokens: List[DurationToken]) -> Optional[DurationVector]:
+    """
+    Sum duration tokens into a DurationVector; None if there are no tokens.
+    """
+    if not tokens:
+        return None
+    values = [0] * len(DurationVector._fields)
+    for token in tokens:
+        values[_UNIT_INDEX[token.unit]] += token.value
+    return DurationVector(*values)
+
+
+_UNIT_INDEX_BY_ALIAS = {alias: _UNIT_INDEX[unit] for alias, unit in _UNIT_BY_ALIAS.items()}
+# A DurationVector from a list of all seven counts, without the NamedTuple constructor's argument handling
+_new_duration_vector = functools.partial(tuple.__new__, DurationVector)
+
+
+def duration_from_text(text: str) -> Optional[DurationVector]:
+    """
+    duration_from_tokens(scan_duration_tokens(text)), summed straight from the matches
+    for callers that have no use for the token spans.
+    """
+    values = None
+    for match in DURATION_TOKEN_RE.finditer(text):
+        if values is None:
+            values = [0] * len(_UNIT_INDEX)
+        values[_UNIT_INDEX_BY_ALIAS[match.group(2)]] += int(match.group(1))
+    return None if values is None else _new_duration_vector(values)
 
 
-def parse_duration(duration_str: str) -> dict:
+def parse_duration(duration_str: str) -> Optional[DurationVector]:
     """
-    Parse a natural language duration string into components.
+    Parse a natural language duration string into a DurationVector, or None if no
+    duration is found. Repeated units are summed, so "2 hours and 3 hours" gives 5 hours.
     Examples: "2 hours 30 minutes", "3 days", "1 year 2 months"
     """
-    duration_str = duration_str.lower().strip()
-    
-    # Define patterns for different time units
-    patterns = {
-        'years': r'(\d+)\s*(?:year|years|yr|yrs|y)',
-        'months': r'(\d+)\s*(?:month|months|mon|mons|mo)',
-        'weeks': r'(\d+)\s*(?:week|weeks|wk|wks|w)',
-        'days': r'(\d+)\s*(?:day|days|d)',
-        'hours': r'(\d+)\s*(?:hour|hours|hr|hrs|h)',
-        'minutes': r'(\d+)\s*(?:minute|minutes|min|mins|m)',
-        'seconds': r'(\d+)\s*(?:second|seconds|sec|secs|s)'
-    }
-    
-    result = {}
-    for unit, pattern in patterns.items():
-        match = re.search(pattern, duration_str)
-        if match:
-            result[unit] = int(match.group(1))
-    
+    # With the cache disabled (size 0) there is nothing to look up or store
+    key = ('duration', parse_settings(), duration_str) if PARSE_CACHE.max_size else None
+    result = _MISSING if key is None else PARSE_CACHE.get(key, _MISSING)
+    if result is _MISSING:
+        result = duration_from_text(localize_text(duration_str.lower()))
+        if key is not None:
+            PARSE_CACHE.put(key, result)
+    if result is None and TOOL_STATS.enabled:
+        TOOL_STATS.count('parse_failures', 'duration')
     return result
 
 
+def shift_datetime(dt: datetime.datetime, duration: DurationVector, sign: int = 1) -> datetime.datetime:
+    """
+    Add (sign=1) or subtract (sign=-1) a duration: months and years first, clamped to the
+    end of the month by add_months, then the fixed-length part.
+    """
+    try:
+        if duration.total_months:
+            dt = add_months(dt, sign * duration.total_months)
+        return dt + sign * duration.delta
+    except (OverflowError, ValueError):
+        # datetime stops at year 9999; report where the result would have landed instead
+        ns_to_datetime(shift_ns(datetime_to_ns(dt), sign * duration.total_months, sign * duration.nanoseconds))
+        raise
+
+
 def parse_time_string(time_str: str) -> datetime.time:
     """
     Parse a simple time string like "3pm", "15:30", "9:45 AM"
@@ -82,143 +640,1775 @@ def parse_time_string(time_str: str) -> datetime.time:
     return datetime.time(hour, 0)
 
 
+WEEKDAY_NAMES = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+
+# Locale packs: <code>.json files that teach the parsers another language. English needs no
+# pack. Each pack is read and compiled into a LocalePack the first time its locale is used.
+_DEFAULT_LOCALE_DIR = (os.path.join(os.path.dirname(os.path.abspath(__file__)), 'locales')
+                       if '__file__' in globals() else '')
+_ENGLISH_UNITS = ('year', 'month', 'week', 'day', 'hour', 'minute', 'second')
+_NUMERIC_DATE_IN_TEXT_RE = LazyPattern(r'(?<![\d./])(\d{1,2})[./](\d{1,2})[./](\d{4})(?![\d./])')
+_AGO_MARKER = 'agoprefix'
+_AGO_PREFIX_RE = LazyPattern(
+    _AGO_MARKER + r'((?:\s*(?:,|and)?\s*\d+\s*(?:' + '|'.join(_ENGLISH_UNITS) + r')\b)+)'
+)
+_NOUN_THEN_ADJECTIVE_RE = LazyPattern(
+    r'(?<!\d )\b(' + '|'.join(WEEKDAY_NAMES) + r'|week|month|year)\s+(next|last|this)\b'
+)
+_DAY_THEN_MONTH_RE = LazyPattern(
+    r'\b(\d{1,2})\.?\s+(january|february|march|april|may|june|july|august|september|october|november|december)\b'
+)
+
+
+def _phrase_alternation(phrases) -> str:
+    """
+    One regex alternation over phrases, longest first, each matching whole words only
+    (a phrase ending in an apostrophe, like "l'", may run into the next word).
+    """
+    return '|'.join(
+        r'(?<!\w)' + re.escape(phrase) + (r'(?!\w)' if phrase[-1].isalnum() else '')
+        for phrase in sorted(phrases, key=len, reverse=True)
+    )
+
+
+class LocalePack:
+    """
+    A compiled locale pack. translate() rewrites lowercase text in the pack's language into
+    the English vocabulary the date, time and duration parsers understand: "dans 2 heures"
+    becomes "in 2 hour", "vor 3 Tagen" becomes "3 day ago". Every word and phrase of the
+    pack is matched by one regex alternation, so a translation is a single pass over the text.
+    """
+
+    def __init__(self, pack: dict):
+        self.code = pack['locale']
+        self.name = pack.get('name', self.code)
+        self.day_first = pack.get('date_order', 'mdy') == 'dmy'
+        replacements = {}
+
+        def add(target: str, phrases) -> None:
+            for phrase in phrases:
+                phrase = phrase.lower()
+                if replacements.setdefault(phrase, target) != target:
+                    raise ValueError(f"Locale pack '{self.code}' maps '{phrase}' to both "
+                                     f"'{replacements[phrase]}' and '{target}'")
+
+        for unit in _ENGLISH_UNITS:
+            add(unit, pack['units'].get(unit, ()))
+        for word, value in pack.get('numbers', {}).items():
+            add(str(value), (word,))
+        for target, phrases in pack.get('words', {}).items():
+            add(target, phrases)
+        for marker in ('am', 'pm'):
+            add(marker, pack.get('meridiem', {}).get(marker, ()))
+        add(_AGO_MARKER, pack.get('ago_prefix', ()))
+        for number, names in enumerate(pack.get('weekdays', ())):
+            add(WEEKDAY_NAMES[number], names)
+        for number, names in enumerate(pack.get('months', ())):
+            add(_MONTH_NAMES[number + 1].lower(), names)
+        self._replacements = replacements
+        self._phrase_re = re.compile(_phrase_alternation(replacements))
+        self._ago = bool(pack.get('ago_prefix'))
+        self._adjective_after_noun = bool(pack.get('adjective_after_noun'))
+        
+        # 24-hour clock spellings: "15 Uhr", "15:30 Uhr", "15 Uhr 30" are always times;
+        # "15h30" is a time, and a bare "15h" or "15 heures" only after "at" ("à 15h")
+        clock_suffixes = [suffix.lower() for suffix in pack.get('clock_suffixes', ())]
+        hour_suffixes = [suffix.lower() for suffix in pack.get('hour_suffixes', ())]
+        self._clock_re = self._hour_re = self._at_hour_re = None
+        if clock_suffixes:
+            self._clock_re = re.compile(r'(?<![\d:])(\d{1,2})(?::(\d{2}))?\s*(?:'
+                                        + '|'.join(map(re.escape, clock_suffixes)) + r')(?:\s*(\d{2}))?(?!\w)')
+        if hour_suffixes:
+            suffixes = '|'.join(map(re.escape, hour_suffixes))
+            self._hour_re = re.compile(r'(?<![\d:])(\d{1,2})\s*(?:' + suffixes + r')\s*(\d{2})(?!\w)')
+            self._at_hour_re = re.compile(r'\bat\s+(\d{1,2})\s*(?:' + suffixes + r'|hour)(?!\w)')
+
+    def translate(self, text: str) -> str:
+        text = text.replace('’', "'")
+        # 15/01/2024 and 15.01.2024 are read in the pack's date order and rewritten as ISO dates
+        text = _NUMERIC_DATE_IN_TEXT_RE.sub(
+            lambda m: numeric_date(int(m.group(1)), int(m.group(2)), int(m.group(3)), self.day_first).isoformat(), text)
+        replacements = self._replacements
+        text = self._phrase_re.sub(lambda m: replacements[m.group()], text)
+        if self._clock_re is not None:
+            text = self._clock_re.sub(lambda m: f"{m.group(1)}:{m.group(2) or m.group(3) or '00'}", text)
+        if self._hour_re is not None:
+            text = self._hour_re.sub(r'\1:\2', text)
+            text = self._at_hour_re.sub(r'at \1:00', text)
+        if self._ago:
+            # "il y a 3 jours" / "vor 3 Tagen" / "hace 3 días": the duration moves in front of "ago";
+            # a prefix with no duration after it ("vor Montag") means "before"
+            text = _AGO_PREFIX_RE.sub(r'\1 ago', text).replace(_AGO_MARKER, 'before')
+        if self._adjective_after_noun:
+            text = _NOUN_THEN_ADJECTIVE_RE.sub(r'\2 \1', text)
+        if self.day_first:
+            text = _DAY_THEN_MONTH_RE.sub(r'\2 \1', text)
+        return ' '.join(text.split())
+
+
+DATE_ORDERS = ('auto', 'month_first', 'day_first')
+
+
+class ParseSettings(NamedTuple):
+    """
+    Language settings the parsers read: the locale ('en', a pack code or 'auto'), the
+    directory of locale packs, the order of numeric dates, and the locale 'auto' falls back
+    to when it detects none. Part of every parse cache key.
+    """
+    locale: str = 'en'
+    locale_dir: str = _DEFAULT_LOCALE_DIR
+    date_order: str = 'auto'
+    fallback_locale: str = 'en'
+
+
+@functools.lru_cache(maxsize=64)
+def make_parse_settings(locale: str = 'en', locale_dir: str = '', date_order: str = 'auto') -> ParseSettings:
+    """
+    Normalized ParseSettings. An empty locale_dir means the locales folder next to the tool.
+    """
+    date_order = date_order.strip().lower() or 'auto'
+    if date_order not in DATE_ORDERS:
+        raise ValueError(f"Unknown date_order '{date_order}'. Use one of: {', '.join(DATE_ORDERS)}")
+    return ParseSettings(locale.strip().lower() or 'en', locale_dir or _DEFAULT_LOCALE_DIR, date_order)
+
+
+# Process-wide defaults for module-level callers; a Tools call uses its own Valves instead
+_default_parse_settings = ParseSettings()
+
+
+class _CallSettings(threading.local):
+    # A class default, so threads outside a Tools call read None without a failed lookup
+    settings = None
+
+
+_CALL_SETTINGS = _CallSettings()
+
+
+def parse_settings() -> ParseSettings:
+    """The settings of the Tools call running on this thread, else the process-wide defaults."""
+    return _CALL_SETTINGS.settings or _default_parse_settings
+
+
+def set_locale(locale: str, locale_dir: str = '') -> None:
+    """
+    Select the default language the parsers accept: 'en', the code of a pack in locale_dir
+    (empty means the locales folder next to the tool), or 'auto' to detect it per input.
+    Tools methods ignore it and read the locale Valves of their own instance.
+    """
+    global _default_parse_settings
+    _default_parse_settings = make_parse_settings(locale, locale_dir, _default_parse_settings.date_order)
+
+
+@functools.lru_cache(maxsize=None)
+def load_locale_pack(locale: str, locale_dir: str) -> LocalePack:
+    """
+    Read <locale_dir>/<locale>.json and compile it. Done once per locale and directory.
+    """
+    if not locale_dir:
+        raise ValueError(f"Set the locale_dir Valve to use the '{locale}' locale")
+    path = os.path.join(locale_dir, f"{locale}.json")
+    if not os.path.isfile(path):
+        raise ValueError(f"Locale pack not found: {path}")
+    import json
+    with open(path, encoding='utf-8') as handle:
+        return LocalePack(json.load(handle))
+
+
+@functools.lru_cache(maxsize=None)
+def _locale_detector(locale_dir: str) -> Tuple[Optional[re.Pattern], Tuple[str, ...]]:
+    """
+    Build the auto-detection regex from the "detect" words of every pack in locale_dir:
+    one named group per locale. Only the word lists are kept; packs are compiled when used.
+    """
+    if not locale_dir or not os.path.isdir(locale_dir):
+        return None, ()
+    import json
+    codes, groups = [], []
+    for filename in sorted(os.listdir(locale_dir)):
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(locale_dir, filename), encoding='utf-8') as handle:
+            words = [word.lower() for word in json.load(handle).get('detect', ())]
+        if words:
+            groups.append(f"(?P<l{len(codes)}>{_phrase_alternation(words)})")
+            codes.append(filename[:-5])
+    return (re.compile('|'.join(groups)) if groups else None), tuple(codes)
+
+
+def detect_locale(text: str, locale_dir: str) -> Optional[str]:
+    """
+    Code of the first locale pack with one of its "detect" words in text, or None (English).
+    """
+    pattern, codes = _locale_detector(locale_dir)
+    match = pattern.search(text.replace('’', "'")) if pattern is not None else None
+    return codes[int(match.lastgroup[1:])] if match else None
+
+
+def effective_locale(text: str) -> str:
+    """The locale text is read in under the current settings: 'auto' detects it, else uses the fallback."""
+    settings = parse_settings()
+    if settings.locale == 'auto':
+        return detect_locale(text, settings.locale_dir) or settings.fallback_locale
+    return settings.locale
+
+
+def localize_text(text: str) -> str:
+    """
+    Rewrite lowercase text in the selected locale into the English the parsers understand.
+    English input, and 'auto' input with no language detected and an English fallback, is
+    returned unchanged.
+    """
+    # parse_settings(), inlined since every parser starts here
+    locale, locale_dir, _, fallback = _CALL_SETTINGS.settings or _default_parse_settings
+    if locale == 'en':
+        return text
+    if locale == 'auto':
+        locale = detect_locale(text, locale_dir) or fallback
+        if locale == 'en':
+            return text
+    translated = load_locale_pack(locale, locale_dir).translate(text)
+    if TOOL_STATS.enabled:
+        TOOL_STATS.count('locale_translations', locale)
+    return translated
+
+
+# Proleptic Gregorian calendar tables, indexed by [is_leap][month] with month 1..12.
+_DAYS_IN_MONTH = (
+    (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31),
+    (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31),
+)
+# Days before the first of each month; entry 13 is the length of the year.
+_DAYS_BEFORE_MONTH = tuple(
+    tuple(sum(lengths[1:month]) for month in range(14))
+    for lengths in _DAYS_IN_MONTH
+)
+_DAYS_PER_400_YEARS = 146097
+# Days before year k of a 400-year cycle (k = 0..400), with the cycle starting on a year 1 mod 400.
+_DAYS_BEFORE_YEAR_IN_CYCLE = [0]
+for _year in range(1, 401):
+    _DAYS_BEFORE_YEAR_IN_CYCLE.append(
+        _DAYS_BEFORE_YEAR_IN_CYCLE[-1] + 365 + (_year % 4 == 0 and (_year % 100 != 0 or _year % 400 == 0))
+    )
+del _year
+
+
+def is_leap_year(year: int) -> bool:
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def days_in_month(year: int, month: int) -> int:
+    return _DAYS_IN_MONTH[is_leap_year(year)][month]
+
+
+def date_to_ordinal(year: int, month: int, day: int) -> int:
+    """
+    Proleptic Gregorian ordinal (0001-01-01 is day 1, like date.toordinal) for any integer year.
+    """
+    cycles, year_in_cycle = divmod(year - 1, 400)
+    return (
+        cycles * _DAYS_PER_400_YEARS
+        + _DAYS_BEFORE_YEAR_IN_CYCLE[year_in_cycle]
+        + _DAYS_BEFORE_MONTH[is_leap_year(year)][month]
+        + day
+    )
+
+
+def ordinal_to_date(ordinal: int) -> Tuple[int, int, int]:
+    """
+    Inverse of date_to_ordinal: (year, month, day) for any integer ordinal.
+    """
+    cycles, day_in_cycle = divmod(ordinal - 1, _DAYS_PER_400_YEARS)
+    year_in_cycle = bisect.bisect_right(_DAYS_BEFORE_YEAR_IN_CYCLE, day_in_cycle) - 1
+    year = cycles * 400 + year_in_cycle + 1
+    day_in_year = day_in_cycle - _DAYS_BEFORE_YEAR_IN_CYCLE[year_in_cycle]
+    month_table = _DAYS_BEFORE_MONTH[is_leap_year(year)]
+    month = bisect.bisect_right(month_table, day_in_year, 1, 13) - 1
+    return year, month, day_in_year - month_table[month] + 1
+
+
 def add_months(dt: datetime.datetime, months: int) -> datetime.datetime:
     """
     Add months to a datetime, handling month overflow correctly
     """
-    month = dt.month - 1 + months
-    year = dt.year + month // 12
-    month = month % 12 + 1
-    day = min(dt.day, calendar.monthrange(year, month)[1])
+    year, month = divmod(dt.year * 12 + dt.month - 1 + months, 12)
+    month += 1
+    day = min(dt.day, _DAYS_IN_MONTH[is_leap_year(year)][month])
     return dt.replace(year=year, month=month, day=day)
 
 
-def parse_natural_datetime(date_str: str) -> datetime.datetime:
+class CalendarSpan(NamedTuple):
+    """Exact calendar breakdown of an interval, as produced by calendar_breakdown."""
+    years: int
+    months: int
+    days: int
+    hours: int
+    minutes: int
+    seconds: int
+
+
+def calendar_breakdown(start: datetime.datetime, end: datetime.datetime) -> CalendarSpan:
     """
-    Parse a natural language date/time string into a datetime object.
-    Handles various formats like "next Friday", "in 2 hours", "tomorrow at 3pm", etc.
+    Break the interval between two datetimes into whole calendar years and months
+    (counted from start, with add_months clamping), then days, hours, minutes and seconds.
+    The interval is measured from the earlier to the later datetime.
+    Example: 2024-01-31 -> 2024-03-01 is 1 month, 1 day (Jan 31 + 1 month = Feb 29).
     """
-    date_str = date_str.lower().strip()
-    now = get_current_time()
+    if end < start:
+        start, end = end, start
+    months = (end.year - start.year) * 12 + end.month - start.month
+    anchor = add_months(start, months)
+    if anchor > end:
+        months -= 1
+        anchor = add_months(start, months)
     
-    # Handle "in X duration" patterns (e.g., "in 2 hours", "in 30 minutes")
-    if date_str.startswith('in '):
-        duration_part = date_str[3:].strip()  # Remove "in " prefix
-        duration_components = parse_duration(duration_part)
-        
-        if duration_components:
-            result_dt = now
-            
-            # Add years and months using helper function
-            if 'years' in duration_components:
-                result_dt = add_months(result_dt, duration_components['years'] * 12)
-            if 'months' in duration_components:
-                result_dt = add_months(result_dt, duration_components['months'])
-            
-            # Add other time units using timedelta
-            delta = datetime.timedelta(
-                weeks=duration_components.get('weeks', 0),
-                days=duration_components.get('days', 0),
-                hours=duration_components.get('hours', 0),
-                minutes=duration_components.get('minutes', 0),
-                seconds=duration_components.get('seconds', 0)
-            )
-            result_dt = result_dt + delta
-            return result_dt
-    
-    # Handle simple time strings (assume today's date)
-    if re.match(r'^\d{1,2}:\d{2}\s*(?:am|pm)$', date_str) or re.match(r'^\d{1,2}\s*(?:am|pm)$', date_str):
-        try:
-            parsed_time = parse_time_string(date_str)
-            return datetime.datetime.combine(now.date(), parsed_time)
-        except:
-            pass
-    
-    # Handle relative terms
-    if 'now' in date_str:
-        return now
-    elif 'today' in date_str:
-        if 'at' in date_str:
-            time_part = date_str.split('at')[1].strip()
-            try:
-                parsed_time = parse_time_string(time_part)
-                return datetime.datetime.combine(now.date(), parsed_time)
-            except:
-                return now.replace(hour=0, minute=0, second=0, microsecond=0)
-        # If no specific time is mentioned, use the current time
-        return now
-    elif 'tomorrow' in date_str:
-        tomorrow = now + datetime.timedelta(days=1)
-        if 'at' in date_str:
-            time_part = date_str.split('at')[1].strip()
-            try:
-                parsed_time = parse_time_string(time_part)
-                return datetime.datetime.combine(tomorrow.date(), parsed_time)
-            except:
-                return tomorrow.replace(hour=0, minute=0, second=0, microsecond=0)
-        # If no specific time is mentioned, use the same time as now but tomorrow
-        return tomorrow
-    elif 'yesterday' in date_str:
-        yesterday = now - datetime.timedelta(days=1)
-        # If no specific time is mentioned, use the same time as now but yesterday
-        return yesterday
-    
-    # Try to parse simple date formats
-    try:
-        # Handle YYYY-MM-DD format
-        if re.match(r'\d{4}-\d{2}-\d{2}', date_str):
-            return datetime.datetime.strptime(date_str, '%Y-%m-%d')
-        # Handle MM/DD/YYYY format
-        elif re.match(r'\d{1,2}/\d{1,2}/\d{4}', date_str):
-            return datetime.datetime.strptime(date_str, '%m/%d/%Y')
-        # Handle DD/MM/YYYY format
-        elif re.match(r'\d{1,2}/\d{1,2}/\d{4}', date_str):
-            return datetime.datetime.strptime(date_str, '%d/%m/%Y')
-    except:
-        pass
-    
-    # If all else fails, return current time
-    return now
+    remainder = int((end - anchor).total_seconds())
+    days, remainder = divmod(remainder, 86400)
+    hours, remainder = divmod(remainder, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    years, months = divmod(months, 12)
+    return CalendarSpan(years, months, days, hours, minutes, seconds)
 
 
-def extract_base_time_from_query(query: str) -> str:
+def calendar_units_between(start: datetime.datetime, end: datetime.datetime, unit_months: int) -> float:
     """
-    Extract base time information from a user query.
-    Looks for patterns like "current time is X", "the time is X", "it's X", etc.
+    Exact number of calendar units of unit_months months (1 = months, 12 = years) from start
+    to end: whole units counted with add_months, plus the elapsed fraction of the next unit.
     """
-    query = query.lower().strip()
-    
-    # Pattern 1: "current time is X" or "the current time is X"
-    match = re.search(r'(?:the\s+)?current\s+time\s+is\s+([^.!?]+)', query)
-    if match:
-        return match.group(1).strip()
-    
-    # Pattern 2: "the time is X" or "time is X"
-    match = re.search(r'(?:the\s+)?time\s+is\s+([^.!?]+)', query)
-    if match:
-        return match.group(1).strip()
-    
-    # Pattern 3: "it's X" or "it is X" (when referring to time)
-    match = re.search(r'it(?:\'s|\s+is)\s+([^.!?]+)', query)
-    if match:
-        time_part = match.group(1).strip()
-        # Only consider it a time if it looks like a time format
-        if re.search(r'\d+(?::\d+)?\s*(?:am|pm|AM|PM)', time_part) or re.search(r'\d{1,2}:\d{2}', time_part):
-            return time_part
-    
-    return None
+    sign = 1
+    if end < start:
+        start, end, sign = end, start, -1
+    whole = ((end.year - start.year) * 12 + end.month - start.month) // unit_months
+    unit_start = add_months(start, whole * unit_months)
+    if unit_start > end:
+        whole -= 1
+        unit_start = add_months(start, whole * unit_months)
+    unit_end = add_months(start, (whole + 1) * unit_months)
+    fraction = (end - unit_start).total_seconds() / (unit_end - unit_start).total_seconds()
+    return sign * (whole + fraction)
 
 
-def format_duration(total_seconds: int) -> str:
+# Common abbreviations and spellings, mapped to the IANA zone people usually mean by them.
+TIMEZONE_ALIASES = {
+    'utc': 'UTC', 'gmt': 'UTC', 'z': 'UTC', 'zulu': 'UTC',
+    'et': 'America/New_York', 'est': 'America/New_York', 'edt': 'America/New_York', 'eastern': 'America/New_York',
+    'ct': 'America/Chicago', 'cst': 'America/Chicago', 'cdt': 'America/Chicago', 'central': 'America/Chicago',
+    'mt': 'America/Denver', 'mst': 'America/Denver', 'mdt': 'America/Denver', 'mountain': 'America/Denver',
+    'pt': 'America/Los_Angeles', 'pst': 'America/Los_Angeles', 'pdt': 'America/Los_Angeles',
+    'pacific': 'America/Los_Angeles',
+    'akst': 'America/Anchorage', 'hst': 'Pacific/Honolulu',
+    'bst': 'Europe/London', 'wet': 'Europe/Lisbon', 'cet': 'Europe/Paris', 'cest': 'Europe/Paris',
+    'eet': 'Europe/Athens', 'eest': 'Europe/Athens', 'msk': 'Europe/Moscow',
+    'ist': 'Asia/Kolkata', 'pkt': 'Asia/Karachi', 'sgt': 'Asia/Singapore', 'hkt': 'Asia/Hong_Kong',
+    'jst': 'Asia/Tokyo', 'kst': 'Asia/Seoul',
+    'aest': 'Australia/Sydney', 'aedt': 'Australia/Sydney', 'acst': 'Australia/Adelaide',
+    'awst': 'Australia/Perth', 'nzst': 'Pacific/Auckland', 'nzdt': 'Pacific/Auckland',
+    'new york': 'America/New_York', 'nyc': 'America/New_York', 'san francisco': 'America/Los_Angeles',
+    'sf': 'America/Los_Angeles', 'washington': 'America/New_York', 'boston': 'America/New_York',
+    'seattle': 'America/Los_Angeles', 'dallas': 'America/Chicago', 'houston': 'America/Chicago',
+    'beijing': 'Asia/Shanghai', 'mumbai': 'Asia/Kolkata', 'delhi': 'Asia/Kolkata', 'new delhi': 'Asia/Kolkata',
+    'bangalore': 'Asia/Kolkata', 'munich': 'Europe/Berlin', 'frankfurt': 'Europe/Berlin',
+    'barcelona': 'Europe/Madrid', 'milan': 'Europe/Rome', 'geneva': 'Europe/Zurich',
+    'osaka': 'Asia/Tokyo', 'kyoto': 'Asia/Tokyo', 'hanoi': 'Asia/Bangkok', 'abu dhabi': 'Asia/Dubai',
+}
+
+# Zones shown by get_world_clock when no list is given.
+DEFAULT_WORLD_CLOCK_ZONES = (
+    'Pacific/Honolulu', 'America/Los_Angeles', 'America/Denver', 'America/Chicago', 'America/New_York',
+    'America/Sao_Paulo', 'UTC', 'Europe/London', 'Europe/Paris', 'Africa/Johannesburg', 'Europe/Moscow',
+    'Asia/Dubai', 'Asia/Kolkata', 'Asia/Singapore', 'Asia/Shanghai', 'Asia/Tokyo', 'Australia/Sydney',
+    'Pacific/Auckland',
+)
+
+_UTC_OFFSET_RE = LazyPattern(r'(?:(?:utc|gmt)\s*([+-])(\d{1,2})(?::?(\d{2}))?|([+-])(\d{2}):(\d{2}))')
+_TZ_IN_SUFFIX_RE = LazyPattern(r'^(.+?)\s+in\s+([a-z][a-z_/ .\'-]*)$')
+_TZ_TOKEN_SUFFIX_RE = LazyPattern(r'^(.+?)\s+(\S+)$')
+
+
+def _import_zoneinfo():
     """
-    Format a duration in seconds into a human-readable string.
+    Import zoneinfo on demand so timezone support costs nothing until it is used.
     """
-    if total_seconds < 0:
-        sign = "-"
-        total_seconds = abs(total_seconds)
+    try:
+        import zoneinfo
+    except ImportError:
+        raise ValueError("Timezone support requires Python 3.9+ (zoneinfo)")
+    return zoneinfo
+
+
+@functools.lru_cache(maxsize=1)
+def _zone_name_index() -> Tuple[dict, dict]:
+    """
+    Build (lowercase IANA key -> key, lowercase city -> key) from the installed tz database.
+    """
+    zoneinfo = _import_zoneinfo()
+    by_key, by_city = {}, {}
+    for key in sorted(zoneinfo.available_timezones()):
+        by_key[key.lower()] = key
+        city = key.rsplit('/', 1)[-1].replace('_', ' ').lower()
+        if '/' in key and not key.startswith('Etc/'):
+            by_city.setdefault(city, key)
+    return by_key, by_city
+
+
+@functools.lru_cache(maxsize=512)
+def resolve_timezone_name(name: str) -> Optional[str]:
+    """
+    Resolve an IANA name, abbreviation, city or UTC offset ("Tokyo", "PST", "UTC+5:30")
+    to a canonical zone key, or None if it is not recognized.
+    """
+    name = ' '.join(name.strip().lower().split())
+    if not name:
+        return None
+    if name in TIMEZONE_ALIASES:
+        return TIMEZONE_ALIASES[name]
+    
+    match = _UTC_OFFSET_RE.fullmatch(name)
+    if match:
+        sign, hours, minutes = match.group(1, 2, 3) if match.group(1) else match.group(4, 5, 6)
+        if int(hours) > 14 or int(minutes or 0) >= 60:
+            return None
+        return f"UTC{sign}{int(hours):02d}:{minutes or '00'}"
+    
+    by_key, by_city = _zone_name_index()
+    return by_key.get(name) or by_city.get(name)
+
+
+@functools.lru_cache(maxsize=512)
+def get_zone(zone_key: str) -> datetime.tzinfo:
+    """
+    Return the tzinfo for a canonical zone key from resolve_timezone_name.
+    """
+    if zone_key.startswith(('UTC+', 'UTC-')):
+        hours, minutes = zone_key[4:].split(':')
+        offset = datetime.timedelta(hours=int(hours), minutes=int(minutes))
+        return datetime.timezone(offset if zone_key[3] == '+' else -offset, zone_key)
+    return _import_zoneinfo().ZoneInfo(zone_key)
+
+
+def parse_timezone(name: str) -> datetime.tzinfo:
+    """
+    Resolve a user-supplied timezone to a tzinfo, raising ValueError if it is unknown.
+    """
+    zone_key = resolve_timezone_name(name)
+    if zone_key is None:
+        raise ValueError(f"Unknown timezone: {name}")
+    return get_zone(zone_key)
+
+
+def split_timezone_suffix(date_str: str) -> Tuple[str, Optional[str]]:
+    """
+    Split a trailing timezone off a lowercase date/time string.
+    Recognizes "<time> in <place>" and a trailing abbreviation, IANA name or UTC offset.
+    Examples: "3pm in tokyo" -> ("3pm", "Asia/Tokyo"), "15:00 utc" -> ("15:00", "UTC")
+    """
+    if 'in' in date_str:
+        match = _TZ_IN_SUFFIX_RE.match(date_str)
+        if match:
+            zone_key = resolve_timezone_name(match.group(2))
+            if zone_key:
+                return match.group(1), zone_key
+    
+    # Only a last word that can name a zone is worth matching the whole string for
+    words = date_str.rsplit(None, 1)
+    token = words[-1] if len(words) == 2 else ''
+    if token in TIMEZONE_ALIASES or '/' in token or token[:1] in ('+', '-') or token.startswith(('utc', 'gmt')):
+        match = _TZ_TOKEN_SUFFIX_RE.match(date_str)
+        if match and (token in TIMEZONE_ALIASES or '/' in token or _UTC_OFFSET_RE.fullmatch(token)):
+            zone_key = resolve_timezone_name(token)
+            if zone_key:
+                return match.group(1), zone_key
+    
+    return date_str, None
+
+
+def format_datetime(dt: datetime.datetime) -> str:
+    """
+    Format a datetime as "YYYY-MM-DD HH:MM:SS", followed by the zone abbreviation when it is aware.
+    """
+    # strftime's %Y does not zero-pad years before 1000 on every platform
+    text = f"{dt.year:04d}-{dt:%m-%d %H:%M:%S}"
+    if dt.tzinfo is not None:
+        text += f" {dt.tzname()}"
+    return text
+
+
+def format_utc_offset(dt: datetime.datetime) -> str:
+    """
+    Format the UTC offset of an aware datetime as "UTC+05:30".
+    """
+    total_minutes = int(dt.utcoffset().total_seconds()) // 60
+    sign = '+' if total_minutes >= 0 else '-'
+    hours, minutes = divmod(abs(total_minutes), 60)
+    return f"UTC{sign}{hours:02d}:{minutes:02d}"
+
+
+_DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+_UNIX_EPOCH_ORDINAL = 719163
+_MONTH_NAMES = ('', 'January', 'February', 'March', 'April', 'May', 'June',
+                'July', 'August', 'September', 'October', 'November', 'December')
+
+
+class DateTimeFields(NamedTuple):
+    """
+    Calendar fields of a datetime, extracted once by datetime_fields.
+    Every textual form a result needs (display, ISO, 12-hour, day name...) is sliced or
+    looked up from these fields instead of calling strftime on the datetime again.
+    """
+    iso: str
+    year: int
+    month: int
+    hour: int
+    minute: int
+    second: int
+    ordinal: int
+    timestamp: int
+    zone: Optional[str]
+    utc_offset: Optional[int]
+    dst: Optional[bool]
+
+    @property
+    def _date_end(self) -> int:
+        """Index of the 'T' in iso: 10, or more for years past 9999 (see ns_fields)."""
+        return 10 if self.iso[10] == 'T' else self.iso.index('T')
+
+    @property
+    def date_text(self) -> str:
+        return self.iso[:self._date_end]
+
+    @property
+    def datetime_text(self) -> str:
+        iso = self.iso
+        # Almost every result reads this, so _date_end is inlined
+        end = 10 if iso[10] == 'T' else iso.index('T')
+        return f"{iso[:end]} {iso[end + 1:end + 9]}"
+
+    @property
+    def display(self) -> str:
+        """Same text as format_datetime."""
+        iso = self.iso
+        end = 10 if iso[10] == 'T' else iso.index('T')
+        if self.zone is None:
+            return f"{iso[:end]} {iso[end + 1:end + 9]}"
+        return f"{iso[:end]} {iso[end + 1:end + 9]} {self.zone}"
+
+    @property
+    def offset_text(self) -> str:
+        """Same text as format_utc_offset."""
+        total_minutes = self.utc_offset // 60
+        sign = '+' if total_minutes >= 0 else '-'
+        hours, minutes = divmod(abs(total_minutes), 60)
+        return f"UTC{sign}{hours:02d}:{minutes:02d}"
+
+    @property
+    def time_12h(self) -> str:
+        end = self._date_end
+        return f"{self.hour % 12 or 12:02d}:{self.iso[end + 4:end + 9]} {'AM' if self.hour < 12 else 'PM'}"
+
+    @property
+    def weekday(self) -> int:
+        return (self.ordinal + 6) % 7
+
+    @property
+    def day_name(self) -> str:
+        return _DAY_NAMES[(self.ordinal + 6) % 7]
+
+    @property
+    def month_name(self) -> str:
+        return _MONTH_NAMES[self.month]
+
+    @property
+    def day_of_year(self) -> int:
+        return self.ordinal - date_to_ordinal(self.year, 1, 1) + 1
+
+    @property
+    def week_of_year(self) -> int:
+        """Sunday-based week number, as strftime('%U')."""
+        return (self.day_of_year + 6 - (self.weekday + 1) % 7) // 7
+
+
+# Builds a DateTimeFields from a tuple of all its fields, without the keyword handling of
+# the NamedTuple constructor; every result pays for at least one
+_new_datetime_fields = functools.partial(tuple.__new__, DateTimeFields)
+
+
+def datetime_fields(dt: datetime.datetime) -> DateTimeFields:
+    """
+    Break a datetime into its calendar fields in one pass.
+    """
+    if dt.tzinfo is None:
+        return _new_datetime_fields((dt.isoformat(), dt.year, dt.month, dt.hour, dt.minute, dt.second,
+                                     dt.toordinal(), int(dt.timestamp()), None, None, None))
+    offset = dt.utcoffset()
+    if offset is None:
+        return _new_datetime_fields((dt.isoformat(), dt.year, dt.month, dt.hour, dt.minute, dt.second,
+                                     dt.toordinal(), int(dt.timestamp()), dt.tzname(), None, None))
+    # Aware times: derive the timestamp from the fields rather than asking the zone again
+    offset_seconds = offset.days * 86400 + offset.seconds
+    ordinal = dt.toordinal()
+    dst = dt.dst()
+    timestamp = (ordinal - _UNIX_EPOCH_ORDINAL) * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second - offset_seconds
+    return _new_datetime_fields((
+        dt.isoformat(), dt.year, dt.month, dt.hour, dt.minute, dt.second, ordinal, timestamp,
+        dt.tzname(), offset_seconds, bool(dst) if dst is not None else None,
+    ))
+
+
+def format_datetime_as(dt: datetime.datetime, format_string: str) -> str:
+    """
+    Format dt as dt.strftime(format_string) does. datetime.strftime only adds %z, %Z, %f,
+    %:z and years before 1000 to time.strftime, and it looks time.strftime up on every call,
+    which costs more than the formatting; other formats go to time.strftime directly.
+    """
+    if (dt.year < 1000 or '%z' in format_string or '%Z' in format_string or '%f' in format_string
+            or '%:' in format_string):
+        return dt.strftime(format_string)
+    return time.strftime(format_string, dt.timetuple())
+
+
+# Epoch-nanosecond core. An instant is the wall-clock time in nanoseconds since
+# 1970-01-01T00:00:00 and a duration is a (months, nanoseconds) pair, so shifting and
+# differencing are integer math. Python ints do not overflow, so the range is limited only
+# by MAX_CORE_YEAR rather than by datetime's year 9999; datetimes are built when a result
+# is rendered, and only if its year fits.
+NS_PER_SECOND = 1_000_000_000
+NS_PER_DAY = 86_400 * NS_PER_SECOND
+MAX_CORE_YEAR = 999_999
+_CORE_MIN_NS = (1 - _UNIX_EPOCH_ORDINAL) * NS_PER_DAY
+_CORE_MAX_NS = (date_to_ordinal(MAX_CORE_YEAR + 1, 1, 1) - _UNIX_EPOCH_ORDINAL) * NS_PER_DAY - 1
+_DATETIME_MAX_NS = (date_to_ordinal(datetime.MAXYEAR + 1, 1, 1) - _UNIX_EPOCH_ORDINAL) * NS_PER_DAY - 1
+
+
+def datetime_to_ns(dt: datetime.datetime) -> int:
+    """
+    Wall-clock nanoseconds since the epoch for a datetime's fields (any UTC offset is ignored).
+    """
+    seconds = (dt.toordinal() - _UNIX_EPOCH_ORDINAL) * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second
+    return seconds * NS_PER_SECOND + dt.microsecond * 1000
+
+
+def instant_ns(dt: datetime.datetime) -> int:
+    """
+    Nanoseconds since the Unix epoch in UTC for an aware datetime; wall-clock for a naive one.
+    """
+    # datetime_to_ns, inlined since every difference reads two instants
+    seconds = (dt.toordinal() - _UNIX_EPOCH_ORDINAL) * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second
+    offset = dt.utcoffset()
+    if offset is not None:
+        seconds -= offset.days * 86400 + offset.seconds
+    return seconds * NS_PER_SECOND + dt.microsecond * 1000
+
+
+def ns_to_civil(ns: int) -> Tuple[int, int, int, int, int, int, int]:
+    """
+    Split wall-clock epoch nanoseconds into (year, month, day, hour, minute, second, nanosecond).
+    """
+    days, ns_of_day = divmod(ns, NS_PER_DAY)
+    year, month, day = ordinal_to_date(days + _UNIX_EPOCH_ORDINAL)
+    seconds, nanosecond = divmod(ns_of_day, NS_PER_SECOND)
+    hour, seconds = divmod(seconds, 3600)
+    minute, second = divmod(seconds, 60)
+    return year, month, day, hour, minute, second, nanosecond
+
+
+def format_ns(ns: int) -> str:
+    """
+    Format wall-clock epoch nanoseconds as "YYYY-MM-DD HH:MM:SS" for any year in range.
+    """
+    year, month, day, hour, minute, second, _ = ns_to_civil(ns)
+    return f"{year:04d}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:02d}"
+
+
+def check_ns_range(ns: int) -> int:
+    """
+    Return ns unchanged, or raise ValueError if it lies outside years 1 to MAX_CORE_YEAR.
+    """
+    if not _CORE_MIN_NS <= ns <= _CORE_MAX_NS:
+        direction = "before year 1" if ns < _CORE_MIN_NS else f"after year {MAX_CORE_YEAR:,}"
+        raise ValueError(f"The result falls {direction}; supported dates are years 1 to {MAX_CORE_YEAR:,}")
+    return ns
+
+
+def shift_ns(ns: int, months: int, nanoseconds: int) -> int:
+    """
+    Shift wall-clock epoch nanoseconds by a (months, nanoseconds) duration: months first,
+    with the day clamped to the end of the target month (like add_months), then the rest.
+    """
+    if months:
+        days, ns_of_day = divmod(ns, NS_PER_DAY)
+        year, month, day = ordinal_to_date(days + _UNIX_EPOCH_ORDINAL)
+        year, month = divmod(year * 12 + month - 1 + months, 12)
+        month += 1
+        if not 1 <= year <= MAX_CORE_YEAR:
+            check_ns_range(-1 if year < 1 else _CORE_MAX_NS + 1)
+        day = min(day, _DAYS_IN_MONTH[is_leap_year(year)][month])
+        ns = (date_to_ordinal(year, month, day) - _UNIX_EPOCH_ORDINAL) * NS_PER_DAY + ns_of_day
+    return check_ns_range(ns + nanoseconds)
+
+
+def ns_to_datetime(ns: int, tzinfo: Optional[datetime.tzinfo] = None) -> datetime.datetime:
+    """
+    Build the datetime for wall-clock epoch nanoseconds (truncated to microseconds),
+    raising ValueError with the date when its year is outside datetime's 1-9999.
+    """
+    if not _CORE_MIN_NS <= ns <= _DATETIME_MAX_NS:
+        raise ValueError(f"{format_ns(ns)} is outside the years {datetime.MINYEAR}-{datetime.MAXYEAR} "
+                         f"that Python datetimes and timezone rules cover")
+    dt = _NAIVE_EPOCH + datetime.timedelta(microseconds=ns // 1000)
+    return dt if tzinfo is None else dt.replace(tzinfo=tzinfo)
+
+
+def ns_fields(ns: int, tzinfo: Optional[datetime.tzinfo] = None) -> DateTimeFields:
+    """
+    DateTimeFields for wall-clock epoch nanoseconds. Years datetime supports go through
+    datetime_fields, so the text matches every other result; later years (naive only) are
+    built from the integer fields, with the Unix timestamp taken as if the time were UTC.
+    """
+    if ns <= _DATETIME_MAX_NS or tzinfo is not None:
+        return datetime_fields(ns_to_datetime(ns, tzinfo))
+    year, month, day, hour, minute, second, nanosecond = ns_to_civil(ns)
+    iso = f"{year:04d}-{month:02d}-{day:02d}T{hour:02d}:{minute:02d}:{second:02d}"
+    if nanosecond >= 1000:
+        iso += f".{nanosecond // 1000:06d}"
+    return DateTimeFields(iso, year, month, hour, minute, second, date_to_ordinal(year, month, day),
+                          ns // NS_PER_SECOND, None, None, None)
+
+
+_UTC_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_NAIVE_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+# Zone offsets are probed between these UTC instants, a day inside years 1 and 9999, where
+# every local time still fits in a datetime
+_ZONE_PROBE_MIN = (date_to_ordinal(datetime.MINYEAR, 1, 2) - _UNIX_EPOCH_ORDINAL) * 86400
+_ZONE_PROBE_MAX = (date_to_ordinal(datetime.MAXYEAR, 12, 31) - _UNIX_EPOCH_ORDINAL) * 86400
+
+
+@functools.lru_cache(maxsize=1024)
+def _zone_year_transitions(zone_key: str, year: int) -> Tuple[Tuple[int, int, str], ...]:
+    """
+    UTC-offset transition table for one zone and year: (utc_seconds, offset_seconds, abbreviation)
+    entries, the first starting at the beginning of the year. Transitions are located by
+    probing weekly and bisecting to the second, so offset periods shorter than a week are merged.
+    """
+    zone = get_zone(zone_key)
+    start = (date_to_ordinal(year, 1, 1) - _UNIX_EPOCH_ORDINAL) * 86400
+    end = (date_to_ordinal(year + 1, 1, 1) - _UNIX_EPOCH_ORDINAL) * 86400
+    
+    def probe(seconds):
+        local = datetime.datetime.fromtimestamp(min(max(seconds, _ZONE_PROBE_MIN), _ZONE_PROBE_MAX), zone)
+        return int(local.utcoffset().total_seconds()), local.tzname()
+    
+    current = probe(start)
+    table = [(start,) + current]
+    cursor = start
+    while cursor < end:
+        step_end = min(cursor + 7 * 86400, end)
+        if probe(step_end) != current:
+            low, high = cursor, step_end
+            while high - low > 1:
+                middle = (low + high) // 2
+                if probe(middle) == current:
+                    low = middle
+                else:
+                    high = middle
+            current = probe(high)
+            table.append((high,) + current)
+            cursor = high
+        else:
+            cursor = step_end
+    return tuple(table)
+
+
+class ZoneOffsetTable:
+    """
+    Precomputed UTC-offset periods of one zone over a span of years, for bulk conversions.
+    Lookups are a bisect over the period start times instead of a per-value zone resolution.
+    """
+
+    def __init__(self, zone_key: str, first_year: int, last_year: int):
+        entries = [
+            entry
+            for year in range(first_year, last_year + 1)
+            for entry in _zone_year_transitions(zone_key, year)
+        ]
+        self.starts = [entry[0] for entry in entries]
+        self.offsets = [entry[1] for entry in entries]
+        self.names = [entry[2] for entry in entries]
+
+    def lookup(self, utc_seconds: int) -> Tuple[int, str]:
+        """Return (offset_seconds, abbreviation) in effect at a UTC instant."""
+        index = max(0, bisect.bisect_right(self.starts, utc_seconds) - 1)
+        return self.offsets[index], self.names[index]
+
+    def local_to_utc(self, local_seconds: int) -> int:
+        """Map a local wall time (seconds since the naive epoch) to UTC, preferring the earlier offset."""
+        guess = local_seconds - self.lookup(local_seconds)[0]
+        return local_seconds - self.lookup(guess)[0]
+
+
+def convert_timestamps_bulk(timestamps: List[str], target_key: str, source_key: str = 'UTC') -> tuple:
+    """
+    Convert many timestamps into the target zone using precomputed offset tables.
+    Naive inputs are read as wall times in the source zone; inputs with an explicit offset
+    keep it. Returns (inputs, results) as lists of strings.
+    """
+    instants = []
+    for item in timestamps:
+        instants.append(sniff_timestamp(item) or parse_natural_datetime(item))
+    
+    # A year either side covers local times whose UTC instant falls in the next or previous year
+    years = [dt.year for dt in instants]
+    first_year, last_year = max(min(years) - 1, datetime.MINYEAR), min(max(years) + 1, datetime.MAXYEAR)
+    source = ZoneOffsetTable(source_key, first_year, last_year)
+    target = source if target_key == source_key else ZoneOffsetTable(target_key, first_year, last_year)
+    
+    inputs, results = [], []
+    for item, dt in zip(timestamps, instants):
+        if dt.tzinfo is None:
+            local_seconds = (dt - _NAIVE_EPOCH) // datetime.timedelta(seconds=1)
+            utc_seconds = source.local_to_utc(local_seconds)
+            inputs.append(f"{format_datetime(dt)} {source.lookup(utc_seconds)[1]}")
+        else:
+            utc_seconds = (dt - _UTC_EPOCH) // datetime.timedelta(seconds=1)
+            inputs.append(format_datetime(dt))
+        offset, name = target.lookup(utc_seconds)
+        try:
+            local = _NAIVE_EPOCH + datetime.timedelta(seconds=utc_seconds + offset)
+        except OverflowError:
+            raise ValueError(f"{item} in {target_key} is outside the years "
+                             f"{datetime.MINYEAR}-{datetime.MAXYEAR}") from None
+        results.append(f"{format_datetime(local)} {name}")
+    return inputs, results
+
+
+class DateTimeExpr(NamedTuple):
+    """
+    Clock-independent structure of a parsed date/time expression.
+    anchor is 'now', 'today', 'tomorrow', 'yesterday', 'day after tomorrow',
+    'day before yesterday' or 'absolute'. The anchor is resolved first, then the calendar
+    rule (weekday, start/end of a period, day of a month) moves it to another day, then
+    time_of_day replaces the clock time, then the offset is added.
+    zone is a canonical zone key; when set, the expression is read as wall time there.
+    """
+    anchor: str
+    absolute: Optional[datetime.datetime] = None
+    offset: Optional[DurationVector] = None
+    time_of_day: Optional[datetime.time] = None
+    zone: Optional[str] = None
+    rule: Optional[tuple] = None
+
+
+_ANCHOR_DAY_SHIFT = {
+    'now': 0, 'today': 0, 'tomorrow': 1, 'yesterday': -1, 'day after tomorrow': 2, 'day before yesterday': -2,
+}
+_ANCHOR_EXPRS = {anchor: DateTimeExpr(anchor) for anchor in _ANCHOR_DAY_SHIFT}
+
+
+# Bare numbers with fewer digits ("15", "2024") are days, hours or years, not epoch times
+EPOCH_MIN_DIGITS = 9
+_NUMERIC_DATE_RE = LazyPattern(r'(\d{1,2})([/.-])(\d{1,2})\2(\d{4})(?:(?:\s+|[tT])(\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?))?')
+
+
+def set_date_order(order: str) -> None:
+    """
+    Select how numeric dates like 05/01/2024 are read by default: 'month_first', 'day_first',
+    or 'auto' (the locale pack's order, month-first for English, switching when that reading
+    is impossible, as in 15/01/2024). Tools methods read the date_order Valve instead.
+    """
+    global _default_parse_settings
+    _default_parse_settings = make_parse_settings(_default_parse_settings.locale,
+                                                  _default_parse_settings.locale_dir, order)
+
+
+def numeric_date(first: int, second: int, year: int, day_first: Optional[bool] = None) -> datetime.date:
+    """
+    Read the numeric date first/second/year with the date_order setting. day_first gives
+    the preferred order for 'auto' (default: the selected locale pack's).
+    """
+    locale, locale_dir, date_order, fallback = parse_settings()
+    if date_order != 'auto':
+        day_first = date_order == 'day_first'
+    else:
+        if day_first is None:
+            if locale == 'auto':
+                locale = fallback
+            day_first = locale != 'en' and load_locale_pack(locale, locale_dir).day_first
+        if (second if day_first else first) > 12 >= (first if day_first else second):
+            day_first = not day_first
+    day, month = (first, second) if day_first else (second, first)
+    try:
+        return datetime.date(year, month, day)
+    except ValueError:
+        order = 'day-first' if day_first else 'month-first'
+        raise ValueError(f"Invalid date {first}/{second}/{year} (read {order}; see the date_order Valve)")
+
+
+def parse_epoch(text: str) -> Optional[int]:
+    """
+    Epoch nanoseconds for a bare number of at least EPOCH_MIN_DIGITS integer digits, or
+    None. The unit follows from the magnitude: below 10^11 seconds, below 10^14 milliseconds,
+    below 10^17 microseconds, otherwise nanoseconds (each covers years 1973 to 5138).
+    """
+    negative = text[:1] == '-'
+    integer, dot, fraction = (text[1:] if text[:1] in '+-' else text).partition('.')
+    if len(integer) < EPOCH_MIN_DIGITS or not integer.isdigit() or (dot and not fraction.isdigit()):
+        return None
+    value = int(integer)
+    exponent = 9 if value < 10 ** 11 else 6 if value < 10 ** 14 else 3 if value < 10 ** 17 else 0
+    ns = value * 10 ** exponent
+    if fraction and exponent:
+        ns += int(fraction[:exponent].ljust(exponent, '0'))
+    return -ns if negative else ns
+
+
+def sniff_timestamp(text: str) -> Optional[datetime.datetime]:
+    """
+    Parse machine-generated timestamps by their shape alone, skipping the natural-language
+    chain: ISO 8601 dates and datetimes (with an optional offset or "Z") through
+    datetime.fromisoformat, epoch seconds, milliseconds, microseconds or nanoseconds
+    (parse_epoch; returned in UTC), and numeric dates such as 01/15/2024 or 15.01.2024 09:30
+    (numeric_date). Returns None for anything else, after a few character checks.
+    """
+    text = text.strip()
+    first = text[:1]
+    if not first.isdigit() and (first not in ('+', '-') or not text[1:2].isdigit()):
+        return None
+    if text[4:5] == '-' and text[7:8] == '-':
+        try:
+            return datetime.datetime.fromisoformat(text[:-1] + '+00:00' if text[-1] in 'zZ' else text)
+        except ValueError:
+            # A date followed by words ("2024-03-10 at 5pm") goes through the grammar
+            return None
+    if len(text) >= EPOCH_MIN_DIGITS:
+        ns = parse_epoch(text)
+        if ns is not None:
+            return ns_to_datetime(ns, datetime.timezone.utc)
+    if text[1:2] in ('/', '.', '-') or text[2:3] in ('/', '.', '-'):
+        match = _NUMERIC_DATE_RE.fullmatch(text)
+        if match:
+            date = numeric_date(int(match.group(1)), int(match.group(3)), int(match.group(4)))
+            clock = match.group(5)
+            if clock is None:
+                return datetime.datetime(date.year, date.month, date.day)
+            clock_time = datetime.time.fromisoformat(clock.zfill(len(clock) + (clock.index(':') == 1)))
+            return datetime.datetime.combine(date, clock_time)
+    return None
+
+
+def compile_natural_datetime(date_str: str) -> DateTimeExpr:
+    """
+    Parse a natural language date/time string into a DateTimeExpr without reading the clock.
+    A trailing timezone ("3pm in Tokyo", "15:00 UTC") is split off and recorded on the expression.
+    """
+    date_str = localize_text(date_str.lower().strip())
+    # The commonest shapes never end in a timezone, so they are tried before looking for one
+    expr = _compile_common_shape(date_str)
+    if expr is not None:
+        return expr
+    local_str, zone_key = split_timezone_suffix(date_str)
+    if not zone_key:
+        return _compile_local_datetime(local_str)
+    expr = _compile_common_shape(local_str) or _compile_local_datetime(local_str)
+    return expr._replace(zone=zone_key)
+
+
+_DATE_WORD_RE = LazyPattern(r'\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{4}|\d{1,2}:\d{2}(?::\d{2})?|\d+(?:st|nd|rd|th)?|[a-z]+')
+
+_MONTH_WORDS = (
+    ('january', 'jan'), ('february', 'feb'), ('march', 'mar'), ('april', 'apr'), ('may',), ('june', 'jun'),
+    ('july', 'jul'), ('august', 'aug'), ('september', 'sep', 'sept'), ('october', 'oct'),
+    ('november', 'nov'), ('december', 'dec'),
+)
+_WEEKDAY_WORDS = (
+    ('monday', 'mon'), ('tuesday', 'tue', 'tues'), ('wednesday', 'weds'), ('thursday', 'thu', 'thur', 'thurs'),
+    ('friday', 'fri'), ('saturday',), ('sunday',),
+)
+# Single words and multi-word phrases of the relative-date grammar, with the lexeme each produces.
+_DATE_PHRASES = {
+    'now': ('anchor', 'now'), 'right now': ('anchor', 'now'),
+    'today': ('anchor', 'today'), 'tomorrow': ('anchor', 'tomorrow'), 'yesterday': ('anchor', 'yesterday'),
+    'day after tomorrow': ('anchor', 'day after tomorrow'), 'day before yesterday': ('anchor', 'day before yesterday'),
+    'next': ('rel', 'next'), 'coming': ('rel', 'next'), 'last': ('rel', 'last'), 'previous': ('rel', 'last'),
+    'past': ('rel', 'last'), 'this': ('rel', 'this'),
+    'day': ('period', 'day'), 'week': ('period', 'week'), 'month': ('period', 'month'), 'year': ('period', 'year'),
+    'start of': ('boundary', 'start'), 'beginning of': ('boundary', 'start'), 'end of': ('boundary', 'end'),
+    'first': ('ordinal', 1), 'second': ('ordinal', 2), 'third': ('ordinal', 3), 'fourth': ('ordinal', 4),
+    'fifth': ('ordinal', 5),
+    'noon': ('time', datetime.time(12, 0)), 'midday': ('time', datetime.time(12, 0)),
+    'midnight': ('time', datetime.time(0, 0)),
+    'from': ('connector', 1), 'after': ('connector', 1), 'before': ('connector', -1),
+    'from now': ('later', 1), 'later': ('later', 1), 'hence': ('later', 1), 'ago': ('later', -1),
+    'in': ('in', None), 'at': ('at', None), 'of': ('of', None), 'and': ('and', None),
+    'the': None, 'on': None,
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _date_word_trie() -> dict:
+    """
+    Build the word trie for the relative-date grammar: nested dicts keyed by word, with the
+    lexeme of a complete phrase stored under the None key. Built once, on first use.
+    """
+    phrases = dict(_DATE_PHRASES)
+    for number, words in enumerate(_MONTH_WORDS, 1):
+        phrases.update((word, ('month', number)) for word in words)
+    for number, words in enumerate(_WEEKDAY_WORDS):
+        phrases.update((word, ('weekday', number)) for word in words)
+        phrases[words[0] + 's'] = ('weekday', number)
+    
+    trie = {}
+    for phrase, lexeme in phrases.items():
+        node = trie
+        for word in phrase.split():
+            node = node.setdefault(word, {})
+        node[None] = lexeme
+    return trie
+
+
+def lex_datetime_words(text: str) -> List[Tuple[str, object]]:
+    """
+    Split a lowercase date/time string into (kind, value) lexemes.
+    Shapes (numbers, "15th", "3pm", "15:30", ISO and slash dates, "2 hours") are recognized
+    directly; words go through a longest-match walk of the phrase trie, so the cost per word
+    does not depend on how many phrases the grammar knows. Unknown words become ('word', w).
+    """
+    words = _DATE_WORD_RE.findall(text)
+    trie = _date_word_trie()
+    lexemes = []
+    append = lexemes.append
+    i, count = 0, len(words)
+    while i < count:
+        word = words[i]
+        following = words[i + 1] if i + 1 < count else None
+        # "2 hours", "a week": a number or article followed by a duration unit
+        if following in _UNIT_BY_ALIAS and (word.isdigit() or word in ('a', 'an')):
+            append(('duration', (_UNIT_BY_ALIAS[following], int(word) if word.isdigit() else 1)))
+            i += 2
+            continue
+        if word[0].isdigit():
+            if following == 'am' or following == 'pm':
+                append(('time', parse_time_string(f"{word} {following}")))
+                i += 2
+                continue
+            if ':' in word:
+                append(('time', parse_time_string(word)))
+            elif '-' in word:
+                append(('date', datetime.date.fromisoformat(word)))
+            elif '/' in word:
+                month_or_day, day_or_month, year = word.split('/')
+                append(('date', numeric_date(int(month_or_day), int(day_or_month), int(year))))
+            elif word.isdigit():
+                append(('number', int(word)))
+            else:
+                append(('ordinal', int(word[:-2])))
+            i += 1
+            continue
+        
+        node = trie.get(word)
+        if node is None:
+            append(('word', word))
+            i += 1
+            continue
+        # Longest phrase starting at this word: "day after tomorrow" wins over "day"
+        found, lexeme, end = None in node, node.get(None), i + 1
+        j = i + 1
+        while j < count and words[j] in node:
+            node = node[words[j]]
+            j += 1
+            if None in node:
+                found, lexeme, end = True, node[None], j
+        if not found:
+            append(('word', word))
+        elif lexeme is not None:
+            append(lexeme)
+        i = end
+    return lexemes
+
+
+_REL_SHIFT = {'next': 1, 'last': -1, 'this': 0}
+_PERIOD_UNIT = {'day': 'days', 'week': 'weeks', 'month': 'months', 'year': 'years'}
+# Appended to the lexemes while compiling so lookahead never runs off the end
+_LEXEME_PADDING = ((None, None),) * 4
+
+
+def _split_offset(lexemes: List[Tuple[str, object]]) -> Tuple[DurationVector, List[Tuple[str, object]]]:
+    """
+    Sum the duration lexemes into a signed offset and return it with the remaining lexemes.
+    A run like "2 hours and 30 minutes" is negative when followed by "ago" or "before",
+    positive after "in", before "from", "after" or "later", or on its own.
+    """
+    values = [0] * len(DurationVector._fields)
+    rest = []
+    i, count = 0, len(lexemes)
+    while i < count:
+        if lexemes[i][0] != 'duration':
+            rest.append(lexemes[i])
+            i += 1
+            continue
+        start = i
+        while i < count and lexemes[i][0] in ('duration', 'and'):
+            i += 1
+        run_end, sign = i, 1
+        if i < count and lexemes[i][0] in ('connector', 'later'):
+            sign = lexemes[i][1]
+            i += 1
+        for kind, value in lexemes[start:run_end]:
+            if kind == 'duration':
+                values[_UNIT_INDEX[value[0]]] += sign * value[1]
+        if rest and rest[-1][0] == 'in':
+            rest.pop()
+    return DurationVector(*values), rest
+
+
+def _month_reference(lexemes, i) -> Tuple[Optional[Tuple[int, Optional[int], Optional[int]]], int]:
+    """
+    Parse "of [the] [next|last|this] month" or "of <month name> [year]" at lexemes[i].
+    Returns ((month_shift, month, year), next index), or (None, i) when there is none.
+    """
+    if lexemes[i][0] != 'of':
+        return None, i
+    j, shift = i + 1, 0
+    if lexemes[j][0] == 'rel':
+        shift = _REL_SHIFT[lexemes[j][1]]
+        j += 1
+    if lexemes[j] == ('period', 'month'):
+        return (shift, None, None), j + 1
+    if lexemes[j][0] == 'month' and not shift:
+        year = lexemes[j + 1][1] if j + 1 < len(lexemes) and lexemes[j + 1][0] == 'number' else None
+        return (0, lexemes[j][1], year), j + (2 if year else 1)
+    return None, i
+
+
+def _compile_lexemes(lexemes: List[Tuple[str, object]], date_str: str) -> DateTimeExpr:
+    """
+    Compile date/time lexemes into a DateTimeExpr.
+    Durations attached to "in", "ago", "later", "from/after/before <anchor>" (or standing
+    alone) become the offset; the rest is read as an anchor day, a calendar rule and a time
+    of day. Words the grammar does not know are ignored, but at least one must be understood.
+    """
+    offset = None
+    for kind, _ in lexemes:
+        if kind == 'duration':
+            offset, lexemes = _split_offset(lexemes)
+            break
+    
+    anchor, absolute, rule, time_of_day = 'now', None, None, None
+    period_shift = None
+    understood = offset is not None
+    rest = lexemes + list(_LEXEME_PADDING)
+    i, count = 0, len(lexemes)
+    while i < count:
+        kind, value = rest[i]
+        next_kind, next_value = rest[i + 1]
+        if kind == 'anchor':
+            anchor = value
+        elif kind == 'date':
+            anchor, absolute = 'absolute', datetime.datetime.combine(value, datetime.time(0, 0))
+        elif kind == 'time':
+            time_of_day = value
+        elif kind == 'at' and next_kind == 'number' and next_value < 24:
+            time_of_day = datetime.time(next_value, 0)
+            i += 1
+        elif kind == 'boundary':
+            j, shift = i + 1, 0
+            if rest[j][0] == 'rel':
+                shift = _REL_SHIFT[rest[j][1]]
+                j += 1
+            if rest[j][0] == 'period':
+                rule = ('boundary', value, rest[j][1], shift)
+            elif rest[j][0] == 'anchor':
+                # "end of today", "start of tomorrow"
+                anchor = rest[j][1]
+                rule = ('boundary', value, 'day', 0)
+            else:
+                i += 1
+                continue
+            if time_of_day is None:
+                time_of_day = datetime.time(0, 0) if value == 'start' else datetime.time(23, 59, 59)
+            i = j
+        elif kind == 'rel' and value == 'last' and next_kind in ('weekday', 'period') and rest[i + 2][0] == 'of':
+            # "last friday of the month", "last day of next month"
+            reference, end = _month_reference(rest, i + 2)
+            if reference is None:
+                i += 1
+                continue
+            if next_kind == 'weekday':
+                rule = ('nth_weekday', -1, next_value) + reference
+            else:
+                rule = ('month_day', -1) + reference
+            i = end - 1
+        elif kind == 'rel' and next_kind == 'weekday':
+            rule = ('weekday', next_value, value, 0)
+            i += 1
+        elif kind == 'rel' and next_kind == 'period':
+            # "next week", "last month": move by one period
+            if value != 'this':
+                unit = _PERIOD_UNIT[next_value]
+                period_shift = period_shift or DurationVector()
+                period_shift = period_shift._replace(**{unit: getattr(period_shift, unit) + _REL_SHIFT[value]})
+            i += 1
+        elif kind == 'weekday':
+            rule = ('weekday', value, 'upcoming', 0)
+            # "friday next week", "monday last week"
+            if next_kind == 'rel' and rest[i + 2] == ('period', 'week'):
+                rule = ('weekday', value, 'this', _REL_SHIFT[next_value])
+                i += 2
+        elif kind in ('ordinal', 'number') and next_kind == 'weekday' or kind == 'ordinal' and next_value == 'day':
+            # "second tuesday of next month", "first day of march"
+            reference, end = _month_reference(rest, i + 2)
+            reference = reference or (0, None, None)
+            if next_kind == 'weekday':
+                rule = ('nth_weekday', value, next_value) + reference
+            else:
+                rule = ('month_day', value) + reference
+            i = max(i + 1, end - 1)
+        elif kind in ('number', 'ordinal') and next_kind == 'month':
+            # "5 march", "5th of march 2025" (the "of" is consumed below)
+            year = rest[i + 2][1] if rest[i + 2][0] == 'number' else None
+            rule = ('month_day', value, 0, next_value, year)
+            i += 2 if year else 1
+        elif kind == 'ordinal':
+            # "the 15th", "the 3rd of next month", "5th of march"
+            if next_kind == 'of' and rest[i + 2][0] == 'month':
+                year = rest[i + 3][1] if rest[i + 3][0] == 'number' else None
+                rule = ('month_day', value, 0, rest[i + 2][1], year)
+                i += 3 if year else 2
+            else:
+                reference, end = _month_reference(rest, i + 1)
+                rule = ('month_day', value) + (reference or (0, None, None))
+                i = max(i, end - 1)
+        elif kind == 'month' and next_kind in ('number', 'ordinal'):
+            # "march 5", "march 5th 2025"
+            year = rest[i + 2][1] if rest[i + 2][0] == 'number' else None
+            rule = ('month_day', next_value, 0, value, year)
+            i += 2 if year else 1
+        else:
+            i += 1
+            continue
+        understood = True
+        i += 1
+    
+    if not understood:
+        raise ValueError(f"Could not understand date/time: {date_str}")
+    if period_shift is not None:
+        offset = period_shift if offset is None else DurationVector(*(a + b for a, b in zip(offset, period_shift)))
+    if rule is not None and time_of_day is None:
+        # A day named without a time means its start, as with "2025-03-05"
+        time_of_day = datetime.time(0, 0)
+    if anchor == 'now' and (rule is not None or time_of_day is not None):
+        anchor = 'today'
+    return DateTimeExpr(anchor, absolute, offset, time_of_day, rule=rule)
+
+
+# A clock time, alone or after an anchor word: "9:45 am", "15:30", "tomorrow at 3pm"
+_ANCHOR_AT_CLOCK_RE = LazyPattern(
+    r'(?:(now|today|tomorrow|yesterday)\s+at\s+)?(\d{1,2})(?::(\d{2})(?::\d{2})?)?\s*([ap]m)?'
+)
+
+
+# "in <duration>" with nothing but duration tokens after the "in": "in 3 weeks", "in 2h30m"
+_IN_DURATION_RE = LazyPattern(r'in\s+((?:\d+\s*(?:' + _UNIT_ALTERNATION + r')(?![a-z])\s*)+)')
+
+
+def _compile_common_shape(date_str: str) -> Optional[DateTimeExpr]:
+    """
+    Compile the commonest arguments (an anchor word, a clock time, "in <duration>") to what
+    the grammar gives them without lexing them. None for anything else.
+    """
+    expr = _ANCHOR_EXPRS.get(date_str)
+    if expr is not None:
+        return expr
+    
+    match = _ANCHOR_AT_CLOCK_RE.fullmatch(date_str)
+    if match:
+        anchor, hour, minute, meridiem = match.groups()
+        # A bare number is not a clock time
+        if minute or meridiem:
+            # Read as parse_time_string reads it, seconds dropped
+            hour = int(hour)
+            if meridiem == 'pm' and hour != 12:
+                hour += 12
+            elif meridiem == 'am' and hour == 12:
+                hour = 0
+            time_of_day = datetime.time(hour, int(minute) if minute else 0)
+            return DateTimeExpr('today' if anchor in (None, 'now') else anchor, time_of_day=time_of_day)
+    match = _IN_DURATION_RE.fullmatch(date_str)
+    if match:
+        return DateTimeExpr('now', offset=duration_from_text(match.group(1)))
+    return None
+
+
+def _compile_local_datetime(date_str: str) -> DateTimeExpr:
+    """
+    Compile a lowercase date/time string with no timezone suffix that is not one of the
+    common shapes.
+    """
+    if date_str[:1].isdigit():
+        # Timestamps left once a timezone suffix or locale words are taken off ("2024-03-10 09:00 in tokyo")
+        absolute = sniff_timestamp(date_str)
+        if absolute is not None:
+            return DateTimeExpr('absolute', absolute)
+    
+    return _compile_lexemes(lex_datetime_words(date_str), date_str)
+
+
+def _resolve_date_rule(rule: tuple, ordinal: int) -> int:
+    """
+    Apply a calendar rule from the relative-date grammar to a day (as an ordinal) and
+    return the resulting day's ordinal.
+    """
+    kind = rule[0]
+    day = datetime.date.fromordinal(ordinal)
+    year, month, weekday = day.year, day.month, day.weekday()
+    if kind == 'weekday':
+        _, target, mode, week_shift = rule
+        if mode == 'upcoming':
+            delta = (target - weekday) % 7
+        elif mode == 'next':
+            delta = (target - weekday) % 7 or 7
+        elif mode == 'last':
+            delta = -((weekday - target) % 7 or 7)
+        else:
+            delta = target - weekday
+        return ordinal + delta + 7 * week_shift
+    
+    if kind == 'boundary':
+        _, edge, period, shift = rule
+        if period == 'day':
+            return ordinal + shift
+        if period == 'week':
+            monday = ordinal - weekday + 7 * shift
+            return monday if edge == 'start' else monday + 6
+        if period == 'year':
+            return date_to_ordinal(year + shift, 1, 1) if edge == 'start' else date_to_ordinal(year + shift, 12, 31)
+        year, month = divmod(year * 12 + month - 1 + shift, 12)
+        month += 1
+        return date_to_ordinal(year, month, 1 if edge == 'start' else days_in_month(year, month))
+    
+    # Month-relative rules: ('month_day', day, ...) and ('nth_weekday', n, weekday, ...)
+    month_shift, named_month, named_year = rule[-3:]
+    if named_month is not None:
+        year, month = named_year or year, named_month
+    else:
+        year, month = divmod(year * 12 + month - 1 + month_shift, 12)
+        month += 1
+    if kind == 'month_day':
+        day = rule[1]
+        length = days_in_month(year, month)
+        if day == -1:
+            day = length
+        if not 1 <= day <= length:
+            raise ValueError(f"{year}-{month:02d} has no day {day}")
+        return date_to_ordinal(year, month, day)
+    day = _nth_weekday_of_month(year, month, rule[1], rule[2])
+    if day is None:
+        raise ValueError(f"{year}-{month:02d} has no {WEEKDAY_NAMES[rule[2]].capitalize()} number {rule[1]}")
+    return date_to_ordinal(year, month, day)
+
+
+def resolve_datetime_expr(expr: DateTimeExpr, now: datetime.datetime) -> datetime.datetime:
+    """
+    Resolve a DateTimeExpr against the given current time.
+    """
+    zone = get_zone(expr.zone) if expr.zone else None
+    if expr.anchor == 'absolute':
+        result = expr.absolute if zone is None else expr.absolute.replace(tzinfo=zone)
+    else:
+        result = now if zone is None else now.astimezone(zone)
+        day_shift = _ANCHOR_DAY_SHIFT[expr.anchor]
+        if day_shift:
+            result = result + datetime.timedelta(days=day_shift)
+    
+    if expr.rule is not None:
+        day = datetime.date.fromordinal(_resolve_date_rule(expr.rule, result.toordinal()))
+        result = result.replace(year=day.year, month=day.month, day=day.day)
+    if expr.time_of_day is not None:
+        result = datetime.datetime.combine(result.date(), expr.time_of_day, tzinfo=result.tzinfo)
+    if expr.offset is not None:
+        result = shift_datetime(result, expr.offset)
+    return result
+
+
+def compile_natural_datetime_cached(date_str: str) -> DateTimeExpr:
+    """
+    compile_natural_datetime through the shared parse cache. Strings shaped like
+    machine-generated timestamps (ISO dates, long numbers) are tried with sniff_timestamp
+    first and are not cached, since every distinct one would evict a reusable entry.
+    """
+    if date_str[4:5] == '-' or (len(date_str) >= EPOCH_MIN_DIGITS and date_str[-1:].isdigit()):
+        absolute = sniff_timestamp(date_str)
+        if absolute is not None:
+            if TOOL_STATS.enabled:
+                TOOL_STATS.count('parse_branch', 'timestamp')
+            return DateTimeExpr('absolute', absolute)
+    key = ('datetime', parse_settings(), date_str) if PARSE_CACHE.max_size else None
+    expr = None if key is None else PARSE_CACHE.get(key)
+    if expr is None:
+        try:
+            expr = compile_natural_datetime(date_str)
+        except ValueError:
+            if TOOL_STATS.enabled:
+                TOOL_STATS.count('parse_failures', 'datetime')
+            raise
+        if key is not None:
+            PARSE_CACHE.put(key, expr)
+    if TOOL_STATS.enabled:
+        TOOL_STATS.count('parse_branch', _parse_branch(expr))
+    return expr
+
+
+def _parse_branch(expr: DateTimeExpr) -> str:
+    """
+    Name the parser branch a compiled expression came from, for the parse_branch counters:
+    a bare anchor word, an absolute date, or the relative-date grammar; "+zone" when a
+    timezone suffix was split off.
+    """
+    if expr.anchor == 'absolute' and expr.rule is None and expr.offset is None and expr.time_of_day is None:
+        branch = 'absolute'
+    elif expr.rule is None and expr.offset is None and expr.time_of_day is None:
+        branch = 'anchor'
+    else:
+        branch = 'grammar'
+    return branch + '+zone' if expr.zone else branch
+
+
+def parse_natural_datetime(date_str: str) -> datetime.datetime:
+    """
+    Parse a natural language date/time string into a datetime object.
+    Handles various formats like "next Friday", "in 2 hours", "tomorrow at 3pm", etc.
+    The parsed structure is cached; only the final resolution reads the clock.
+    """
+    return resolve_datetime_expr(compile_natural_datetime_cached(date_str), get_current_time())
+
+
+_CURRENT_TIME_WORDS = ('now', 'current time', '')
+
+
+def resolve_time_argument(time_str: Optional[str],
+                          context: Optional['ConversationContext'] = None) -> Tuple[datetime.datetime, str]:
+    """
+    Resolve a time argument to (datetime, description). None, "now", "current time"
+    and "" all mean the current time. With the context of a conversation in which the user
+    stated their clock, the current time is that clock, relative times are read against it,
+    and times without a zone take its zone.
+    """
+    now = get_current_time()
+    if context is not None:
+        now = context.base_now(now)
+    if time_str is None or time_str.lower() in _CURRENT_TIME_WORDS:
+        if TOOL_STATS.enabled and not time_str:
+            TOOL_STATS.count('fallbacks', 'no_time_argument')
+        if context is not None:
+            return now, f"{context.base_text}, stated earlier in this conversation"
+        return now, "current time"
+    result = resolve_datetime_expr(compile_natural_datetime_cached(time_str), now)
+    if result.tzinfo is None and now.tzinfo is not None:
+        result = result.replace(tzinfo=now.tzinfo)
+    return result, time_str
+
+
+# A stated base time runs to the end of its sentence, capped at MAX_BASE_TIME_CHARS so
+# a long unpunctuated paste cannot become a megabyte-long cache key.
+MAX_BASE_TIME_CHARS = 120
+_CURRENT_TIME_IS_RE = LazyPattern(r'(?:the\s+)?current\s+time\s+is\s+([^.!?]{1,%d})' % MAX_BASE_TIME_CHARS)
+_TIME_IS_RE = LazyPattern(r'(?:the\s+)?time\s+is\s+([^.!?]{1,%d})' % MAX_BASE_TIME_CHARS)
+_IT_IS_RE = LazyPattern(r'it(?:\'s|\s+is)\s+([^.!?]{1,%d})' % MAX_BASE_TIME_CHARS)
+_LOOKS_LIKE_TIME_RE = LazyPattern(r'(?<!\d)\d+(?::\d+)?\s*(?:am|pm)|\d{1,2}:\d{2}')
+_BASE_TIME_MARKER_RE = LazyPattern(r'time\s+is|it(?:\'s|\s+is)')
+_MAX_BASE_TIME_CANDIDATES = 32
+
+
+def find_base_time(query_lower: str) -> Optional[Tuple[str, int, int]]:
+    """
+    Find a stated base time in a lowercase query.
+    Returns (text, start, end) with the span of the stripped time text, or None.
+    """
+    # Pattern 1: "current time is X" or "the current time is X"
+    match = _CURRENT_TIME_IS_RE.search(query_lower)
+    
+    # Pattern 2: "the time is X" or "time is X"
+    if not match:
+        match = _TIME_IS_RE.search(query_lower)
+    
+    # Pattern 3: "it's X" or "it is X" (when referring to time)
+    if not match:
+        match = _IT_IS_RE.search(query_lower)
+        # Only consider it a time if it looks like a time format
+        if match and not _LOOKS_LIKE_TIME_RE.search(match.group(1)):
+            match = None
+    
+    if not match:
+        return None
+    
+    raw = match.group(1)
+    text = raw.strip()
+    start = match.start(1) + (len(raw) - len(raw.lstrip()))
+    return text, start, start + len(text)
+
+
+def find_last_base_time(query: str, end: int, window: int) -> Optional[Tuple[str, int, int]]:
+    """
+    Find the stated base time closest to (but before) end in a long query, scanning
+    backwards one window at a time so the text is read at most once, and lowercasing only
+    the window being scanned. Spans index into query. Only the last _MAX_BASE_TIME_CANDIDATES
+    markers are examined, so text full of "it is" phrases costs no more than plain text.
+    """
+    # Windows overlap by enough for a marker and its time text to straddle a boundary
+    overlap = MAX_BASE_TIME_CHARS + 32
+    window = max(window, overlap)
+    candidates = _MAX_BASE_TIME_CANDIDATES
+    while end > 0 and candidates > 0:
+        check_cancelled()
+        start = max(0, end - window)
+        text = query[start:min(len(query), end + overlap)].lower()
+        markers = [match.span() for match in _BASE_TIME_MARKER_RE.finditer(text) if start + match.start() < end]
+        for marker, marker_end in reversed(markers[-candidates:]):
+            candidates -= 1
+            # Look at the marker alone, plus a few characters before it for "the current time is"
+            lead = max(0, marker - 12)
+            found = find_base_time(text[lead:marker_end + 8 + MAX_BASE_TIME_CHARS])
+            if found and lead + found[1] >= marker:
+                time_text, found_start, found_end = found
+                return time_text, start + lead + found_start, start + lead + found_end
+        end = start
+    return None
+
+
+def extract_base_time_from_query(query: str) -> str:
+    """
+    Extract base time information from a user query.
+    Looks for patterns like "current time is X", "the time is X", "it's X", etc.
+    """
+    found = find_base_time(query.lower())
+    return found[0] if found else None
+
+
+_SUBTRACT_WORDS_RE = LazyPattern(r'subtract|minus|before|ago|earlier')
+
+
+class ParsedQuery(NamedTuple):
+    """
+    One-pass parse of a conversational time query.
+    base is None when the query states no base time (use the current time).
+    Spans index into the original query string.
+    """
+    base: Optional[DateTimeExpr]
+    base_text: Optional[str]
+    base_span: Optional[Tuple[int, int]]
+    duration: Optional[DurationVector]
+    duration_text: str
+    duration_spans: Tuple[Tuple[int, int], ...]
+    operation: str
+
+
+def parse_query(query: str, scan_window: int = 0, known_base: bool = False) -> ParsedQuery:
+    """
+    Parse a conversational query into its base time, duration and operation.
+    Example: "what time is it 2 hours from now? the current time is 12:55 pm"
+    With scan_window > 0, a longer query is only scanned in its last scan_window characters
+    for the duration and operation; the base time is looked for there first, then before
+    it, one window at a time, nearest the end first. Spans always index into query.
+    With known_base (the conversation already has a base time), the base time is only
+    extracted when the scanned text restates one ("time is", "it is").
+    """
+    offset = len(query) - scan_window if 0 < scan_window < len(query) else 0
+    query_lower = query[offset:].lower()
+    
+    found = None
+    if not known_base or _BASE_TIME_MARKER_RE.search(query_lower):
+        found = find_base_time(query_lower)
+        if found:
+            found = (found[0], found[1] + offset, found[2] + offset)
+        elif offset and not known_base:
+            found = find_last_base_time(query, offset, scan_window)
+    
+    tokens = scan_duration_tokens(query_lower)
+    
+    base_text, base_span, base = None, None, None
+    if found:
+        base_text, start, end = found
+        # The base time clause ends where the query's duration begins ("it is 3pm, add 2 hours"),
+        # so the duration is not also read as an offset of the base time
+        for token in tokens:
+            if start <= token.start + offset < end:
+                base_text = base_text[:token.start + offset - start].rstrip(" ,;:-")
+                end = start + len(base_text)
+                break
+        base_span = (start, end)
+        try:
+            base = compile_natural_datetime_cached(base_text)
+        except ValueError:
+            # Not a time after all ("the time is right", "time is it in 2 hours"): use the current time
+            base_text, base_span = None, None
+            if TOOL_STATS.enabled:
+                TOOL_STATS.count('fallbacks', 'query_base_time_not_understood')
+    elif TOOL_STATS.enabled and not known_base:
+        TOOL_STATS.count('fallbacks', 'query_without_base_time')
+    
+    return ParsedQuery(
+        base=base,
+        base_text=base_text,
+        base_span=base_span,
+        duration=duration_from_tokens(tokens),
+        duration_text=" ".join(query_lower[token.start:token.end] for token in tokens),
+        duration_spans=tuple((token.start + offset, token.end + offset) for token in tokens),
+        operation="subtract" if _SUBTRACT_WORDS_RE.search(query_lower) else "add",
+    )
+
+
+class TimeMention(NamedTuple):
+    """
+    A date, time or duration expression found in a document.
+    kind is 'datetime' (value is a datetime) or 'duration' (value is a DurationVector);
+    start and end index into the whole document.
+    """
+    kind: str
+    text: str
+    start: int
+    end: int
+    value: object
+
+
+# Characters kept from the end of one chunk and scanned again with the next, so an
+# expression cut by a chunk boundary is seen whole. Mentions are capped at this length.
+MAX_MENTION_CHARS = 120
+# Chunk size extract_time_expressions feeds to iter_time_mentions
+EXTRACTION_CHUNK_CHARS = 65536
+# Words that can sit inside an expression ("friday at 3pm", "end of the month") but do
+# not start or end one
+_MENTION_JOINERS = frozenset(('the', 'on', 'at', 'of', 'and', 'in', 'from', 'after', 'before', 'a', 'an'))
+_MENTION_ANCHOR_KINDS = frozenset(('anchor', 'weekday', 'time', 'date', 'boundary', 'later'))
+_MENTION_KIND_LABELS = {'datetime': "Date/time", 'duration': "Duration"}
+
+
+def _mention_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """
+    Yield the (start, end) spans of candidate expressions in lowercase text: runs of words
+    the date grammar knows (shapes, lexicon words, duration units), joined by joiner words
+    and separated only by spaces or commas. Joiners are trimmed from both ends, except a
+    leading "in" or "a" before a duration ("in 2 hours", "a week from today").
+    """
+    trie = _date_word_trie()
+    words = []
+    for match in itertools.chain(_DATE_WORD_RE.finditer(text), (None,)):
+        if match is not None:
+            word = match.group()
+            known = (word in _MENTION_JOINERS or word in trie or word == 'am' or word == 'pm'
+                     or word[0].isdigit() and len(word) <= 10
+                     # Unit spellings include single letters ("it's", "I'm"), so only count them after a number
+                     or word in _UNIT_BY_ALIAS and words and (words[-1][0][0].isdigit() or words[-1][0] in ('a', 'an')))
+            if words and known and not text[words[-1][2]:match.start()].strip(' ,') and \
+                    match.end() - words[0][1] <= MAX_MENTION_CHARS:
+                words.append((word, match.start(), match.end()))
+                continue
+        
+        # The run ended: trim joiners and yield it
+        while words and words[-1][0] in _MENTION_JOINERS:
+            words.pop()
+        while words and words[0][0] in _MENTION_JOINERS and not (
+                words[0][0] in ('in', 'a', 'an') and len(words) > 1
+                and (words[1][0][0].isdigit() or words[1][0] in _UNIT_BY_ALIAS)):
+            words.pop(0)
+        if words:
+            yield words[0][1], words[-1][2]
+        words = [(word, match.start(), match.end())] if match is not None and known else []
+
+
+def _classify_mention(text: str, now: datetime.datetime) -> Optional[Tuple[str, object]]:
+    """
+    Resolve one candidate span with the date grammar; returns (kind, value), or None when
+    the span is not a date, time or duration expression.
+    """
+    try:
+        lexemes = lex_datetime_words(text)
+    except ValueError:
+        return None
+    kinds = [kind for kind, _ in lexemes]
+    
+    if kinds and all(kind in ('duration', 'and') for kind in kinds):
+        # A bare "2 hours" is a duration; "a week" on its own is usually not ("once a week")
+        if not text[0].isdigit():
+            return None
+        return 'duration', parse_duration(text)
+    
+    # Lexicon words alone ("second", "may", "day") are too common in prose to count
+    if not any(kind in _MENTION_ANCHOR_KINDS for kind in kinds) and not any(
+            kind == 'rel' and following in ('period', 'weekday')
+            or kind == 'month' and following in ('number', 'ordinal')
+            or kind == 'in' and following == 'duration'
+            for kind, following in zip(kinds, kinds[1:])):
+        return None
+    try:
+        return 'datetime', resolve_datetime_expr(compile_natural_datetime_cached(text), now)
+    except ValueError:
+        return None
+
+
+def iter_time_mentions(chunks, now: Optional[datetime.datetime] = None) -> Iterator[TimeMention]:
+    """
+    Yield every date, time and duration expression in a document given as an iterable of
+    text chunks (a string is a single chunk), in document order.
+    Only the current chunk and a MAX_MENTION_CHARS tail of the previous one are held, so
+    memory stays bounded however long the document is. Relative expressions resolve against
+    now (default: the current time, read once for the whole document).
+    """
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+    if now is None:
+        now = get_current_time()
+    
+    carry, carry_offset = "", 0
+    for chunk in itertools.chain(chunks, (None,)):
+        final = chunk is None
+        buffer = carry if final else carry + chunk
+        if not buffer:
+            continue
+        lower = buffer.lower()
+        # Spans reaching into the tail may continue in the next chunk; rescan them with it
+        limit = len(buffer) if final else max(len(buffer) - MAX_MENTION_CHARS, 0)
+        resume = limit
+        for start, end in _mention_spans(lower):
+            if end >= limit and not final:
+                resume = max(min(resume, start), limit - MAX_MENTION_CHARS)
+                break
+            found = _classify_mention(lower[start:end], now)
+            if found is not None:
+                yield TimeMention(found[0], buffer[start:end], carry_offset + start, carry_offset + end, found[1])
+        if not final:
+            # Never resume inside a word
+            while resume > 0 and resume > limit - MAX_MENTION_CHARS and lower[resume - 1].isalnum():
+                resume -= 1
+            carry, carry_offset = buffer[resume:], carry_offset + resume
+
+
+# No calendar month is shorter than 28 days
+_SHORTEST_MONTH_SECONDS = 28 * 24 * 3600
+# The units convert_duration converts to: fixed units by their length in seconds, calendar
+# units by their length in months and their approximate (legacy mode) length in seconds
+_FIXED_UNIT_SECONDS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400, 'week': 7 * 86400}
+_CALENDAR_UNITS = {'month': (1, 30 * 86400), 'year': (12, 365 * 86400)}
+
+
+def format_duration(total_seconds: int, start: Optional[datetime.datetime] = None) -> str:
+    """
+    Format a duration in seconds into a human-readable string.
+    With start, years and months are exact calendar units counted from start (see
+    calendar_breakdown); without it a month is 30 days and a year is 365 days.
+    """
+    if total_seconds < 0:
+        sign = "-"
+        total_seconds = abs(total_seconds)
     else:
         sign = ""
     
+    # No calendar month is shorter than 28 days, so shorter durations break down the same either way
+    if start is not None and total_seconds >= _SHORTEST_MONTH_SECONDS:
+        years, months, days, hours, minutes, seconds = calendar_breakdown(
+            start, start + datetime.timedelta(seconds=total_seconds)
+        )
+        return sign + _join_duration_parts(years, months, days, hours, minutes, seconds)
+    
     years = total_seconds // (365 * 24 * 3600)
     total_seconds %= (365 * 24 * 3600)
     
@@ -234,6 +2424,10 @@ def format_duration(total_seconds: int) -> str:
     minutes = total_seconds // 60
     seconds = total_seconds % 60
     
+    return sign + _join_duration_parts(years, months, days, hours, minutes, seconds)
+
+
+def _join_duration_parts(years: int, months: int, days: int, hours: int, minutes: int, seconds: int) -> str:
     parts = []
     if years > 0:
         parts.append(f"{years} year{'s' if years != 1 else ''}")
@@ -248,61 +2442,1380 @@ def format_duration(total_seconds: int) -> str:
     if seconds > 0 or not parts:
         parts.append(f"{seconds} second{'s' if seconds != 1 else ''}")
     
-    return sign + ", ".join(parts)
+    return ", ".join(parts)
+
+
+def parse_weekday_set(text: str) -> frozenset:
+    """
+    Parse a comma-separated list of weekday names or abbreviations ("sat,sun") into
+    weekday numbers (Monday is 0).
+    """
+    days = set()
+    for part in text.split(','):
+        part = part.strip().lower()
+        if not part:
+            continue
+        matches = [index for index, name in enumerate(WEEKDAY_NAMES) if name.startswith(part[:3])]
+        if len(part) < 3 or not matches:
+            raise ValueError(f"Unknown weekday: {part}")
+        days.add(matches[0])
+    return frozenset(days)
+
+
+def load_holiday_file(path: str) -> frozenset:
+    """
+    Load a holiday calendar file: one YYYY-MM-DD date per line, optionally followed by a
+    description. Blank lines and lines starting with # are ignored. Returns date ordinals.
+    """
+    holidays = set()
+    with open(path, encoding='utf-8') as handle:
+        for line_number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                year, month, day = (int(part) for part in line.split()[0].split('-'))
+                if not (1 <= month <= 12 and 1 <= day <= days_in_month(year, month)):
+                    raise ValueError
+                holidays.add(date_to_ordinal(year, month, day))
+            except ValueError:
+                raise ValueError(f"Invalid date on line {line_number} of {path}: {line}")
+    return frozenset(holidays)
+
+
+class BusinessCalendar:
+    """
+    Business-day index for one holiday calendar. Each indexed year is a bitset of its
+    business days plus a prefix-sum array over that bitset, and a running total across
+    years gives O(1) business-day counts between any two indexed dates. Years are indexed
+    lazily as queries reach them.
+    """
+
+    def __init__(self, holidays: frozenset = frozenset(), weekend: frozenset = frozenset({5, 6})):
+        if len(weekend) >= 7:
+            raise ValueError("At least one weekday must be a working day")
+        self.holidays = holidays
+        self.weekend = weekend
+        self._first_year = None
+        self._bitsets = []
+        self._prefixes = []
+        self._cumulative = [0]
+        self._lock = threading.RLock()
+
+    def _index_year(self, year: int) -> Tuple[int, array.array]:
+        first = date_to_ordinal(year, 1, 1)
+        weekday = (first - 1) % 7
+        bits, count = 0, 0
+        prefix = array.array('H', [0])
+        for day in range(366 if is_leap_year(year) else 365):
+            if (weekday + day) % 7 not in self.weekend and first + day not in self.holidays:
+                bits |= 1 << day
+                count += 1
+            prefix.append(count)
+        return bits, prefix
+
+    def _ensure_years(self, first_year: int, last_year: int) -> None:
+        if self._first_year is None:
+            self._first_year = first_year
+        current_last = self._first_year + len(self._bitsets) - 1
+        if first_year >= self._first_year and last_year <= current_last:
+            return
+        
+        before = [self._index_year(year) for year in range(first_year, self._first_year)]
+        after = [self._index_year(year) for year in range(current_last + 1, last_year + 1)]
+        self._first_year = min(first_year, self._first_year)
+        self._bitsets = [bits for bits, _ in before] + self._bitsets + [bits for bits, _ in after]
+        self._prefixes = [prefix for _, prefix in before] + self._prefixes + [prefix for _, prefix in after]
+        cumulative = [0]
+        for prefix in self._prefixes:
+            cumulative.append(cumulative[-1] + prefix[-1])
+        self._cumulative = cumulative
+
+    def _locate(self, ordinal: int) -> Tuple[int, int]:
+        """(year index, day of year) of an ordinal, indexing its year if needed."""
+        year = ordinal_to_date(ordinal)[0]
+        self._ensure_years(year, year)
+        return year - self._first_year, ordinal - date_to_ordinal(year, 1, 1)
+
+    def _rank(self, ordinal: int) -> int:
+        """Number of indexed business days strictly before the ordinal."""
+        index, day = self._locate(ordinal)
+        return self._cumulative[index] + self._prefixes[index][day]
+
+    def is_business_day(self, ordinal: int) -> bool:
+        with self._lock:
+            index, day = self._locate(ordinal)
+            return bool(self._bitsets[index] >> day & 1)
+
+    def count(self, start_ordinal: int, end_ordinal: int) -> int:
+        """
+        Business days in [start, end); negative when end is before start.
+        """
+        with self._lock:
+            self._ensure_years(ordinal_to_date(min(start_ordinal, end_ordinal))[0],
+                               ordinal_to_date(max(start_ordinal, end_ordinal))[0])
+            return self._rank(end_ordinal) - self._rank(start_ordinal)
+
+    def add(self, ordinal: int, days: int) -> int:
+        """
+        Ordinal of the days-th business day after (or, if negative, before) the given day.
+        """
+        with self._lock:
+            if days == 0:
+                return ordinal
+            if days > 0:
+                target = self._rank(ordinal + 1) + days - 1
+                while target >= self._cumulative[-1]:
+                    last_year = self._first_year + len(self._bitsets) - 1
+                    self._ensure_years(last_year, last_year + max(1, (target - self._cumulative[-1]) // 200 + 1))
+            else:
+                target = self._rank(ordinal) + days
+                while target < 0:
+                    years_back = max(1, -target // 200 + 1)
+                    self._ensure_years(self._first_year - years_back, self._first_year)
+                    target += self._cumulative[years_back]
+            
+            index = bisect.bisect_right(self._cumulative, target) - 1
+            day = bisect.bisect_right(self._prefixes[index], target - self._cumulative[index]) - 1
+            return date_to_ordinal(self._first_year + index, 1, 1) + day
+
+
+_BUSINESS_CALENDARS = {}
+_BUSINESS_CALENDARS_LOCK = threading.Lock()
+
+
+def get_business_calendar(name: Optional[str], calendar_dir: str, weekend: frozenset) -> BusinessCalendar:
+    """
+    Return the memoized BusinessCalendar for a holiday calendar name. The holidays are read
+    from <calendar_dir>/<name>.txt; an empty name means weekends only. A calendar is rebuilt
+    when its file changes.
+    """
+    path, mtime = None, None
+    if name:
+        if not calendar_dir:
+            raise ValueError("Set the holiday_calendar_dir Valve to use holiday calendars")
+        path = os.path.join(calendar_dir, f"{name}.txt")
+        if not os.path.isfile(path):
+            raise ValueError(f"Holiday calendar not found: {path}")
+        mtime = os.path.getmtime(path)
+    
+    key = (path, mtime, weekend)
+    with _BUSINESS_CALENDARS_LOCK:
+        business_calendar = _BUSINESS_CALENDARS.get(key)
+        if business_calendar is None:
+            holidays = load_holiday_file(path) if path else frozenset()
+            business_calendar = _BUSINESS_CALENDARS[key] = BusinessCalendar(holidays, weekend)
+        return business_calendar
+
+
+_BUSINESS_WORDS_RE = LazyPattern(r'\b(?:business|working|work)\s+')
+_SIGNED_INTEGER_RE = LazyPattern(r'[+-]?\d+')
+
+
+def parse_business_days(duration_str: str, workdays_per_week: int) -> int:
+    """
+    Parse "5 business days", "2 weeks" or a bare number into a count of business days.
+    A week counts as workdays_per_week business days.
+    """
+    text = duration_str.strip().lower()
+    if _SIGNED_INTEGER_RE.fullmatch(text):
+        return int(text)
+    duration = parse_duration(_BUSINESS_WORDS_RE.sub('', text))
+    if duration is None or duration.total_months or duration.hours or duration.minutes or duration.seconds:
+        raise ValueError(f"Could not parse business days: {duration_str}. Use days or weeks, e.g. '5 business days'")
+    return duration.days + duration.weeks * workdays_per_week
+
+
+def working_seconds_between(
+    business_calendar: BusinessCalendar,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    day_start: datetime.time,
+    day_end: datetime.time,
+) -> int:
+    """
+    Seconds of working time between two datetimes, counting only the [day_start, day_end)
+    window of business days. Negative when end is before start. O(1) after indexing.
+    """
+    if end < start:
+        return -working_seconds_between(business_calendar, end, start, day_start, day_end)
+    
+    window_start = day_start.hour * 3600 + day_start.minute * 60
+    window = day_end.hour * 3600 + day_end.minute * 60 - window_start
+    if window <= 0:
+        raise ValueError("The working day must end after it starts")
+    
+    def worked_before(dt):
+        seconds = dt.hour * 3600 + dt.minute * 60 + dt.second - window_start
+        return min(max(seconds, 0), window)
+    
+    start_ordinal, end_ordinal = start.toordinal(), end.toordinal()
+    if start_ordinal == end_ordinal:
+        if not business_calendar.is_business_day(start_ordinal):
+            return 0
+        return worked_before(end) - worked_before(start)
+    
+    total = business_calendar.count(start_ordinal + 1, end_ordinal) * window
+    if business_calendar.is_business_day(start_ordinal):
+        total += window - worked_before(start)
+    if business_calendar.is_business_day(end_ordinal):
+        total += worked_before(end)
+    return total
+
+
+_ORDINAL_WORDS = {
+    'first': 1, '1st': 1, 'second': 2, '2nd': 2, 'third': 3, '3rd': 3,
+    'fourth': 4, '4th': 4, 'fifth': 5, '5th': 5, 'last': -1,
+}
+_WEEKDAY_WORD = r'(?:mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun)(?:day)?s?'
+_WEEKDAY_WORD_RE = LazyPattern(r'\b(' + _WEEKDAY_WORD + r')\b')
+_RECURRENCE_TIME_RE = LazyPattern(r'\bat\s+(\d{1,2}(?::\d{2})?\s*(?:am|pm)?|noon|midnight)\b')
+_RECURRENCE_INTERVAL_RE = LazyPattern(
+    r'\bevery\s+(?:(other)|(\d+)|(second|third|fourth))?\s*'
+    r'(minute|hour|day|week|month|year|' + _WEEKDAY_WORD + r')s?\b'
+)
+_RECURRENCE_NTH_RE = LazyPattern(
+    r'\b(first|1st|second|2nd|third|3rd|fourth|4th|fifth|5th|last)\s+(weekday|day|' + _WEEKDAY_WORD + r')\s+of\b'
+)
+_RECURRENCE_MONTH_DAY_RE = LazyPattern(r'\b(?:on\s+)?(?:the\s+|day\s+)(\d{1,2})(?:st|nd|rd|th)?\b')
+_RECURRENCE_ADVERB_RE = LazyPattern(r'\b(hourly|daily|weekly|monthly|yearly|annually)\b')
+_RECURRENCE_WEEKDAYS_RE = LazyPattern(r'\bweekdays?\b')
+_RECURRENCE_WEEKENDS_RE = LazyPattern(r'\bweekends?\b')
+_RECURRENCE_YEARLY_RE = LazyPattern(r'\bof\s+(?:each|every|the)\s+year\b')
+_FREQUENCY_WORDS = {
+    'minute': 'minutely', 'hour': 'hourly', 'day': 'daily', 'week': 'weekly', 'month': 'monthly', 'year': 'yearly',
+    'hourly': 'hourly', 'daily': 'daily', 'weekly': 'weekly', 'monthly': 'monthly', 'yearly': 'yearly',
+    'annually': 'yearly',
+}
+
+
+def _weekday_number(word: str) -> int:
+    return next(index for index, name in enumerate(WEEKDAY_NAMES) if name.startswith(word[:3]))
+
+
+class RecurrenceRule(NamedTuple):
+    """
+    Compiled recurrence rule.
+    freq is 'minutely', 'hourly', 'daily', 'weekly', 'monthly' or 'yearly'; interval is the
+    step in units of freq. weekdays filters daily rules and lists the days of weekly rules.
+    Monthly rules fall on month_day (negative counts from the end of the month), on the
+    nth_weekday (ordinal, weekday) where weekday -1 means "a weekday", or on the start's day.
+    time_of_day overrides the start's time of day.
+    """
+    freq: str
+    interval: int = 1
+    weekdays: Tuple[int, ...] = ()
+    month_day: Optional[int] = None
+    nth_weekday: Optional[Tuple[int, int]] = None
+    time_of_day: Optional[datetime.time] = None
+
+    def describe(self) -> str:
+        unit = {'minutely': 'minute', 'hourly': 'hour', 'daily': 'day', 'weekly': 'week',
+                'monthly': 'month', 'yearly': 'year'}[self.freq]
+        text = f"every {unit}" if self.interval == 1 else f"every {self.interval} {unit}s"
+        if self.freq == 'daily' and self.interval == 1 and self.weekdays in ((0, 1, 2, 3, 4), (5, 6)):
+            text = "every weekday" if self.weekdays == (0, 1, 2, 3, 4) else "every weekend day"
+        elif self.weekdays:
+            text += " on " + ", ".join(WEEKDAY_NAMES[day].capitalize() for day in self.weekdays)
+        if self.nth_weekday:
+            ordinal, weekday = self.nth_weekday
+            ordinal_word = 'last' if ordinal == -1 else {1: '1st', 2: '2nd', 3: '3rd'}.get(ordinal, f"{ordinal}th")
+            day_word = 'weekday' if weekday == -1 else WEEKDAY_NAMES[weekday].capitalize()
+            text += f" on the {ordinal_word} {day_word}"
+        if self.month_day is not None:
+            text += " on the last day" if self.month_day == -1 else f" on day {self.month_day}"
+        if self.time_of_day is not None:
+            text += f" at {self.time_of_day.strftime('%H:%M')}"
+        return text
+
+
+def compile_recurrence(rule_str: str) -> RecurrenceRule:
+    """
+    Compile a natural language recurrence rule.
+    Examples: "every other Tuesday at 3pm", "the last weekday of each month",
+    "every 2 weeks on monday and thursday", "every month on the 15th", "every 90 minutes"
+    """
+    text = ' '.join(rule_str.lower().split())
+    
+    time_of_day = None
+    match = _RECURRENCE_TIME_RE.search(text)
+    if match:
+        spoken = match.group(1)
+        time_of_day = {'noon': datetime.time(12, 0), 'midnight': datetime.time(0, 0)}.get(spoken) or parse_time_string(spoken)
+        text = text[:match.start()] + text[match.end():]
+    
+    weekdays = tuple(sorted({_weekday_number(word) for word in _WEEKDAY_WORD_RE.findall(text)}))
+    if _RECURRENCE_WEEKDAYS_RE.search(text) and not _RECURRENCE_NTH_RE.search(text):
+        weekdays = (0, 1, 2, 3, 4)
+    elif _RECURRENCE_WEEKENDS_RE.search(text):
+        weekdays = (5, 6)
+    
+    match = _RECURRENCE_NTH_RE.search(text)
+    if match:
+        kind = match.group(2)
+        weekday = -1 if kind == 'weekday' else None if kind == 'day' else _weekday_number(kind)
+        ordinal = _ORDINAL_WORDS[match.group(1)]
+        if weekday is None:
+            return RecurrenceRule('monthly', month_day=ordinal, time_of_day=time_of_day)
+        interval = 12 if _RECURRENCE_YEARLY_RE.search(text) else 1
+        return RecurrenceRule('monthly', interval=interval, nth_weekday=(ordinal, weekday), time_of_day=time_of_day)
+    
+    interval, freq = 1, None
+    match = _RECURRENCE_INTERVAL_RE.search(text)
+    if match:
+        other, number, ordinal_word, unit = match.groups()
+        if other:
+            interval = 2
+        elif number:
+            interval = int(number)
+        elif ordinal_word:
+            interval = _ORDINAL_WORDS[ordinal_word]
+        freq = 'weekly' if _WEEKDAY_WORD_RE.fullmatch(unit) else _FREQUENCY_WORDS[unit.rstrip('s')]
+    else:
+        match = _RECURRENCE_ADVERB_RE.search(text)
+        if match:
+            freq = _FREQUENCY_WORDS[match.group(1)]
+    if freq is None:
+        if weekdays == (0, 1, 2, 3, 4) or weekdays == (5, 6):
+            freq = 'daily'
+        elif weekdays:
+            freq = 'weekly'
+        else:
+            raise ValueError(f"Could not understand recurrence rule: {rule_str}")
+    if interval < 1:
+        raise ValueError("The recurrence interval must be at least 1")
+    
+    month_day = None
+    if freq in ('monthly', 'yearly'):
+        match = _RECURRENCE_MONTH_DAY_RE.search(text)
+        if match:
+            month_day = int(match.group(1))
+            if not 1 <= month_day <= 31:
+                raise ValueError(f"Invalid day of month: {month_day}")
+        weekdays = ()
+    
+    return RecurrenceRule(freq, interval, weekdays, month_day, None, time_of_day)
+
+
+def compile_recurrence_cached(rule_str: str) -> RecurrenceRule:
+    """
+    compile_recurrence through the shared parse cache.
+    """
+    key = ('recurrence', parse_settings(), rule_str)
+    rule = PARSE_CACHE.get(key)
+    if rule is None:
+        try:
+            rule = compile_recurrence(rule_str)
+        except ValueError:
+            if TOOL_STATS.enabled:
+                TOOL_STATS.count('parse_failures', 'recurrence')
+            raise
+        PARSE_CACHE.put(key, rule)
+    return rule
+
+
+def _nth_weekday_of_month(year: int, month: int, ordinal: int, weekday: int) -> Optional[int]:
+    """
+    Day of month of the nth weekday (weekday -1 means any Monday-Friday); None if the month has none.
+    """
+    length = days_in_month(year, month)
+    first_weekday = (date_to_ordinal(year, month, 1) - 1) % 7
+    if weekday == -1:
+        working_days = [day for day in range(1, length + 1) if (first_weekday + day - 1) % 7 < 5]
+        if ordinal > len(working_days):
+            return None
+        return working_days[ordinal - 1 if ordinal > 0 else -1]
+    if ordinal == -1:
+        last_weekday = (first_weekday + length - 1) % 7
+        return length - (last_weekday - weekday) % 7
+    day = 1 + (weekday - first_weekday) % 7 + 7 * (ordinal - 1)
+    return day if day <= length else None
+
+
+def iter_occurrences(rule: RecurrenceRule, start: datetime.datetime,
+                     after: Optional[datetime.datetime] = None) -> Iterator[datetime.datetime]:
+    """
+    Lazily yield occurrences of a rule anchored at start, beginning with the first occurrence
+    at or after `after` (default: start). The generator jumps straight to the period that
+    contains `after` instead of iterating from start, so deep expansions stay cheap.
+    """
+    after = start if after is None or after < start else after
+    time_of_day = rule.time_of_day or start.timetz().replace(tzinfo=None)
+    
+    def at(year, month, day):
+        return datetime.datetime(year, month, day, time_of_day.hour, time_of_day.minute,
+                                 time_of_day.second, tzinfo=start.tzinfo)
+    
+    if rule.freq in ('minutely', 'hourly'):
+        period = datetime.timedelta(minutes=rule.interval) if rule.freq == 'minutely' else datetime.timedelta(hours=rule.interval)
+        first = start if rule.time_of_day is None else at(start.year, start.month, start.day)
+        step = max(0, -((first - after) // period))
+        occurrence = first + step * period
+        while True:
+            if occurrence >= after:
+                yield occurrence
+            occurrence += period
+    
+    start_ordinal = start.toordinal()
+    if rule.freq == 'daily':
+        index = max(0, (after.toordinal() - start_ordinal) // rule.interval)
+        misses = 0
+        while misses <= 7:
+            ordinal = start_ordinal + index * rule.interval
+            index += 1
+            if rule.weekdays and (ordinal - 1) % 7 not in rule.weekdays:
+                misses += 1
+                continue
+            misses = 0
+            occurrence = at(*ordinal_to_date(ordinal))
+            if occurrence >= after and occurrence >= start:
+                yield occurrence
+        return
+    
+    if rule.freq == 'weekly':
+        weekdays = rule.weekdays or ((start_ordinal - 1) % 7,)
+        first_monday = start_ordinal - (start_ordinal - 1) % 7
+        week = max(0, (after.toordinal() - first_monday) // 7 // rule.interval)
+        while True:
+            monday = first_monday + week * rule.interval * 7
+            week += 1
+            for weekday in weekdays:
+                occurrence = at(*ordinal_to_date(monday + weekday))
+                if occurrence >= after and occurrence >= start:
+                    yield occurrence
+    
+    step = rule.interval * (12 if rule.freq == 'yearly' else 1)
+    first_month = start.year * 12 + start.month - 1
+    index = max(0, (after.year * 12 + after.month - 1 - first_month) // step)
+    while True:
+        year, month = divmod(first_month + index * step, 12)
+        month += 1
+        index += 1
+        if rule.nth_weekday:
+            day = _nth_weekday_of_month(year, month, *rule.nth_weekday)
+            if day is None:
+                continue
+        elif rule.month_day == -1:
+            day = days_in_month(year, month)
+        else:
+            # Clamp to the end of short months, like add_months
+            day = min(rule.month_day or start.day, days_in_month(year, month))
+        occurrence = at(year, month, day)
+        if occurrence >= after and occurrence >= start:
+            yield occurrence
+
+
+def split_batch_input(values) -> List[str]:
+    """
+    Normalize a batch argument into a list of stripped strings.
+    Accepts a list, or a single string with one item per line (or comma-separated on one line).
+    """
+    if isinstance(values, str):
+        separator = '\n' if '\n' in values else ','
+        values = values.split(separator)
+    return [value for value in map(str.strip, map(str, values)) if value]
+
+
+def _import_numpy():
+    """
+    Import NumPy on demand; batch operations fall back to pure Python without it.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+# One ISO 8601 date or date-time per line, capturing its UTC offset suffix if it has one
+_ISO_LINES_RE = LazyPattern(r'^\d{4}-\d\d-\d\d(?:[T ]\d\d:\d\d(?::\d\d(?:\.\d{1,6})?)?)?(Z|[+-]\d\d:\d\d)?$', re.M)
+
+
+def _iso_offset_suffixes(items: List[str]) -> Optional[List[str]]:
+    """
+    The UTC offset suffix of every item ('' for none), or None unless all of them are ISO
+    dates. One regex pass over the joined lines checks the whole list.
+    """
+    suffixes = _ISO_LINES_RE.findall('\n'.join(items))
+    return suffixes if len(suffixes) == len(items) else None
+
+
+def _offset_minutes(suffix: str) -> int:
+    """Minutes east of UTC of an ISO offset suffix: 'Z', '+05:30' or '-02:00'."""
+    if suffix in ('', 'Z'):
+        return 0
+    minutes = int(suffix[1:3]) * 60 + int(suffix[4:6])
+    return -minutes if suffix[0] == '-' else minutes
+
+
+def _to_datetime64_array(np, items: List[str]) -> tuple:
+    """
+    Convert timestamp strings into (wall times, UTC offsets): a datetime64[us] array of
+    their wall-clock times, as the pure-Python path reads them, and a timedelta64[us]
+    array of their UTC offsets, or None when no item has one. Lists of ISO dates, with or
+    without offsets, are converted in one vectorized call; anything else is parsed item by item.
+    """
+    # NumPy misreads bare epoch numbers and converts offsets to UTC, so offsets are split off first
+    suffixes = _iso_offset_suffixes(items)
+    if suffixes is not None:
+        zoned = any(suffixes)
+        naive = [item[:len(item) - len(suffix)] for item, suffix in zip(items, suffixes)] if zoned else items
+        try:
+            values = np.array(naive, dtype='datetime64[us]')
+        except ValueError:
+            pass
+        else:
+            if not zoned:
+                return values, None
+            minutes = {suffix: _offset_minutes(suffix) for suffix in set(suffixes)}
+            offsets = np.array([minutes[suffix] for suffix in suffixes], dtype='timedelta64[m]')
+            return values, offsets.astype('timedelta64[us]')
+    
+    values = np.empty(len(items), dtype='datetime64[us]')
+    offsets = np.zeros(len(items), dtype='timedelta64[us]')
+    zoned = False
+    for index, item in enumerate(items):
+        check_cancelled()
+        dt = sniff_timestamp(item) or parse_natural_datetime(item)
+        values[index] = np.datetime64(datetime_to_ns(dt) // 1000, 'us')
+        offset = dt.utcoffset()
+        if offset:
+            offsets[index] = np.timedelta64(offset // datetime.timedelta(microseconds=1), 'us')
+            zoned = True
+    return values, offsets if zoned else None
+
+
+def add_months_array(np, values, months: int):
+    """
+    Vectorized add_months for a datetime64 array: days past the end of the
+    target month are clamped to its last day.
+    """
+    days = values.astype('datetime64[D]')
+    time_of_day = values - days
+    month_start = values.astype('datetime64[M]')
+    day_offset = days - month_start.astype('datetime64[D]')
+    
+    target_month = month_start + np.timedelta64(months, 'M')
+    target_start = target_month.astype('datetime64[D]')
+    last_day_offset = (target_month + np.timedelta64(1, 'M')).astype('datetime64[D]') - target_start - np.timedelta64(1, 'D')
+    return target_start + np.minimum(day_offset, last_day_offset) + time_of_day
+
+
+def _format_datetime64(np, values) -> List[str]:
+    """
+    Format a datetime64 array as 'YYYY-MM-DD HH:MM:SS' strings, like format_ns.
+    """
+    texts = np.datetime_as_string(values, unit='s')
+    # Swap the 'T' for a space in place, on the UTF-32 code points of the strings; it is
+    # the 11th character unless a year is outside 0000-9999
+    separators = texts.view(np.uint32).reshape(len(texts), texts.dtype.itemsize // 4)[:, 10]
+    if not (separators == ord('T')).all():
+        return np.char.replace(texts, 'T', ' ').tolist()
+    separators[:] = ord(' ')
+    return texts.tolist()
+
+
+def shift_timestamps(timestamps: List[str], duration: DurationVector, sign: int = 1) -> tuple:
+    """
+    Parse timestamps once and shift them all by the same duration.
+    Returns (inputs, results) as lists of 'YYYY-MM-DD HH:MM:SS' strings.
+    """
+    months = sign * duration.total_months
+    
+    np = _import_numpy()
+    if np is None:
+        nanoseconds = sign * duration.nanoseconds
+        inputs, results = [], []
+        for item in timestamps:
+            check_cancelled()
+            base_ns = datetime_to_ns(parse_natural_datetime(item))
+            inputs.append(format_ns(base_ns))
+            results.append(format_ns(shift_ns(base_ns, months, nanoseconds)))
+        return inputs, results
+    
+    # Shifts apply to wall-clock time, so the offsets are not needed
+    values, _ = _to_datetime64_array(np, timestamps)
+    shifted = add_months_array(np, values, months) if months else values
+    shifted = shifted + np.timedelta64(sign * duration.delta)
+    return (
+        _format_datetime64(np, values),
+        _format_datetime64(np, shifted),
+    )
+
+
+def pairwise_differences(starts: List[str], ends: List[str]) -> tuple:
+    """
+    Parse two equally long timestamp lists and return (starts, ends, seconds),
+    where seconds[i] is ends[i] - starts[i] in whole seconds (rounded down). Timestamps
+    are listed in their own wall time; differences between zoned ones are elapsed time.
+    """
+    np = _import_numpy()
+    if np is None:
+        start_dts = [parse_natural_datetime(item) for item in starts]
+        end_dts = [parse_natural_datetime(item) for item in ends]
+        return (
+            [format_ns(datetime_to_ns(dt)) for dt in start_dts],
+            [format_ns(datetime_to_ns(dt)) for dt in end_dts],
+            [(instant_ns(end) - instant_ns(start)) // NS_PER_SECOND for start, end in zip(start_dts, end_dts)],
+        )
+    
+    start_values, start_offsets = _to_datetime64_array(np, starts)
+    end_values, end_offsets = _to_datetime64_array(np, ends)
+    elapsed = end_values - start_values
+    if start_offsets is not None:
+        elapsed = elapsed + start_offsets
+    if end_offsets is not None:
+        elapsed = elapsed - end_offsets
+    seconds = elapsed.astype('timedelta64[s]').astype(np.int64)
+    return (
+        _format_datetime64(np, start_values),
+        _format_datetime64(np, end_values),
+        seconds.tolist(),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _duration_unit_texts() -> tuple:
+    """Texts of every month, day, hour, minute and second count format_duration can show."""
+    return tuple(
+        ('',) + tuple(f"{count} {unit}{'s' if count != 1 else ''}" for count in range(1, limit))
+        for unit, limit in (('month', 13), ('day', 30), ('hour', 24), ('minute', 60), ('second', 60))
+    )
+
+
+def format_durations(seconds: List[int]) -> List[str]:
+    """
+    format_duration of many signed second counts, with a '-' in front of negative ones.
+    With NumPy each distinct value is formatted once: the unit counts are split off in
+    vectorized steps and their texts come from lookup tables.
+    """
+    np = _import_numpy()
+    if np is None:
+        return [f"{'-' if value < 0 else ''}{format_duration(abs(value))}" for value in seconds]
+    
+    unique, inverse = np.unique(np.asarray(seconds, dtype=np.int64), return_inverse=True)
+    years, rest = np.divmod(np.abs(unique), 365 * 24 * 3600)
+    counts = []
+    for size in (30 * 24 * 3600, 24 * 3600, 3600, 60):
+        count, rest = np.divmod(rest, size)
+        counts.append(count.tolist())
+    counts.append(rest.tolist())
+    
+    tables = _duration_unit_texts()
+    texts = []
+    for value, year, *units in zip(unique.tolist(), years.tolist(), *counts):
+        parts = [table[count] for table, count in zip(tables, units) if count]
+        if year:
+            parts.insert(0, f"{year} year{'s' if year != 1 else ''}")
+        texts.append(('-' if value < 0 else '') + (", ".join(parts) or "0 seconds"))
+    return np.array(texts, dtype=object)[inverse].tolist()
+
+
+# Time ranges are half-open [start, end) pairs of epoch nanoseconds, so ranges that only
+# touch (9:00-10:00 and 10:00-11:00) never overlap. Every operation sorts once and sweeps.
+_ISO_RANGE_RE = LazyPattern(r'(\d{4}-\d{2}-\d{2}[^/]*?)\s*/\s*([^/]+)')
+_RANGE_PREFIX_RE = LazyPattern(r'(?:from|between)\s+')
+_RANGE_LENGTH_RE = LazyPattern(r'(.+?)\s+for\s+(.+)')
+_RANGE_SEPARATOR_RE = LazyPattern(r'\s+(?:to|until|till|through|-)\s+|\s*[–—]\s*')
+
+
+def split_time_range(text: str) -> Tuple[str, str, Optional[DurationVector]]:
+    """
+    Split a range such as "9am to 5pm", "2024-03-10 09:00 - 2024-03-10 17:30",
+    "between monday and friday", "tomorrow at 2pm for 90 minutes" or an ISO 8601
+    "start/end" into (start text, end text, length). Exactly one of end text and length is set.
+    """
+    text = text.strip().lower()
+    iso = _ISO_RANGE_RE.fullmatch(text)
+    if iso:
+        return iso.group(1), iso.group(2), None
+    prefix = _RANGE_PREFIX_RE.match(text)
+    between = prefix is not None and prefix.group().startswith('between')
+    if prefix:
+        text = text[prefix.end():]
+    length = _RANGE_LENGTH_RE.fullmatch(text)
+    if length:
+        duration = parse_duration(length.group(2))
+        if duration is not None:
+            return length.group(1), '', duration
+    parts = (text.split(' and ', 1) if between else None) or _RANGE_SEPARATOR_RE.split(text, 1)
+    if len(parts) != 2 or not parts[0].strip() or not parts[1].strip():
+        raise ValueError(f"Could not read a start and end in time range: {text}")
+    return parts[0].strip(), parts[1].strip(), None
+
+
+def _is_time_only(expr: DateTimeExpr) -> bool:
+    """True for a bare clock time ("5pm", "17:30"), which takes its date from context."""
+    return (expr.time_of_day is not None and expr.anchor == 'today' and expr.absolute is None
+            and expr.offset is None and expr.rule is None and expr.zone is None)
+
+
+def parse_time_range(text: str) -> Tuple[datetime.datetime, datetime.datetime]:
+    """
+    Parse a time range (see split_time_range) into (start, end) datetimes. An end that is
+    only a clock time is on the start's day, or the next day for an overnight range
+    ("22:00 to 06:00").
+    """
+    start_text, end_text, length = split_time_range(text)
+    start = parse_natural_datetime(start_text)
+    if length is not None:
+        return start, shift_datetime(start, length)
+    end_expr = compile_natural_datetime_cached(end_text)
+    if _is_time_only(end_expr):
+        time_of_day = end_expr.time_of_day
+        end = start.replace(hour=time_of_day.hour, minute=time_of_day.minute,
+                            second=time_of_day.second, microsecond=0)
+        if end <= start:
+            end += datetime.timedelta(days=1)
+    else:
+        end = resolve_datetime_expr(end_expr, get_current_time())
+    if end < start:
+        raise ValueError(f"Time range ends before it starts: {text}")
+    return start, end
+
+
+def datetimes_to_ns(datetimes: List[datetime.datetime]) -> Tuple[List[int], Optional[datetime.tzinfo]]:
+    """
+    Convert datetimes to comparable epoch nanoseconds, returning them with the zone to
+    display results in. All-local inputs stay wall-clock (zone None); once any input has a
+    timezone, local ones are read as system time and everything is compared as UTC
+    instants, displayed in the zone of the first zoned input.
+    """
+    zone = next((dt.tzinfo for dt in datetimes if dt.tzinfo is not None), None)
+    if zone is None:
+        return [datetime_to_ns(dt) for dt in datetimes], None
+    return [instant_ns(dt if dt.tzinfo is not None else dt.astimezone()) for dt in datetimes], zone
+
+
+def range_ns_fields(ns: int, zone: Optional[datetime.tzinfo]) -> DateTimeFields:
+    """DateTimeFields for a range endpoint from datetimes_to_ns."""
+    if zone is None:
+        return ns_fields(ns)
+    return datetime_fields(ns_to_datetime(ns, datetime.timezone.utc).astimezone(zone))
+
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Union of ranges: sorted, non-overlapping, with touching ranges joined. O(n log n).
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def covered_ranges(ranges: List[Tuple[int, int]], min_count: int) -> List[Tuple[int, int]]:
+    """
+    Stretches of time covered by at least min_count of the ranges; with min_count equal to
+    the number of ranges this is their intersection. One sweep over the sorted start and
+    end events, O(n log n). Empty ranges are ignored.
+    """
+    events = []
+    for start, end in ranges:
+        if end > start:
+            events.append((start, 1))
+            events.append((end, -1))
+    # At equal times ends (-1) sort before starts, so touching ranges do not overlap
+    events.sort()
+    stretches, depth, opened = [], 0, None
+    for instant, step in events:
+        depth += step
+        if step > 0 and depth == min_count:
+            if stretches and stretches[-1][1] == instant:
+                opened = stretches.pop()[0]
+            else:
+                opened = instant
+        elif step < 0 and depth == min_count - 1:
+            stretches.append((opened, instant))
+    return stretches
+
+
+def range_gaps(merged: List[Tuple[int, int]], window_start: Optional[int] = None,
+               window_end: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Free stretches between merged ranges, within [window_start, window_end) when given
+    (by default from the first start to the last end). Linear in the merged ranges.
+    """
+    if not merged and (window_start is None or window_end is None):
+        return []
+    low = merged[0][0] if window_start is None else window_start
+    high = merged[-1][1] if window_end is None else window_end
+    gaps, cursor = [], low
+    # Merged ranges are sorted by end too, so the first one that reaches the window is found by bisection
+    for start, end in itertools.islice(merged, bisect.bisect_right([end for _, end in merged], low), None):
+        if start >= high:
+            break
+        if start == end:
+            # An empty range takes up no time, so it does not split a gap
+            continue
+        if start > cursor:
+            gaps.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < high:
+        gaps.append((cursor, high))
+    return gaps
+
+
+def first_free_slot(merged: List[Tuple[int, int]], duration: DurationVector, window_start: int,
+                    window_end: Optional[int] = None) -> Optional[Tuple[int, int]]:
+    """
+    Earliest [start, end) of the given duration at or after window_start that overlaps no
+    merged range and ends by window_end (if given), or None. Empty ranges block nothing.
+    """
+    merged = [(start, end) for start, end in merged if end > start]
+    for start, end in range_gaps(merged, window_start, window_end):
+        slot_end = shift_ns(start, duration.total_months, duration.nanoseconds)
+        if slot_end <= end:
+            return start, slot_end
+    cursor = max(window_start, merged[-1][1]) if merged else window_start
+    slot_end = shift_ns(cursor, duration.total_months, duration.nanoseconds)
+    if window_end is None:
+        return cursor, slot_end
+    return None
+
+
+OUTPUT_MODES = ('markdown', 'json', 'compact')
+# Table cells are (value, text) pairs: JSON output uses the values, the other modes the texts
+_cell_value = operator.itemgetter(0)
+_cell_text = operator.itemgetter(1)
+
+
+class ToolResult:
+    """
+    Structured result shared by the Tools methods.
+    Fields are (key, label, value, text): markdown and compact output show the label and
+    text, JSON output maps the key to the machine-readable value. An optional table and
+    trailing note follow the fields.
+    """
+
+    __slots__ = ('kind', 'title', 'fields', 'data', 'columns', 'rows', 'note', 'streamed_rows')
+
+    def __init__(self, kind: str, title: str):
+        self.kind = kind
+        self.title = title
+        self.fields = []
+        self.data = {}
+        self.columns = None
+        self.rows = None
+        self.note = None
+        self.streamed_rows = 0
+
+    def add(self, key: str, label: str, value, text: str = None) -> 'ToolResult':
+        self.fields.append((key, label, value, str(value) if text is None else text))
+        return self
+
+    def add_datetime(self, key: str, label: str, fields: DateTimeFields, text: str = None) -> 'ToolResult':
+        self.fields.append((key, label, fields, fields.display if text is None else text))
+        return self
+
+    def extra(self, key: str, value) -> 'ToolResult':
+        """Add a value that only appears in JSON output."""
+        self.data[key] = value
+        return self
+
+    def table(self, key: str, columns: List[Tuple[str, str]], rows: List[List[Tuple[object, str]]]) -> 'ToolResult':
+        """
+        Attach a table. columns are (key, header) pairs; each row holds a (value, text) cell per column.
+        """
+        self.columns = (key, columns)
+        self.rows = rows
+        return self
+
+    def render(self, mode: str) -> str:
+        if mode == 'markdown':
+            return self._render_markdown()
+        if mode == 'json':
+            return self._render_json()
+        if mode == 'compact':
+            return self._render_compact()
+        raise ValueError(f"Unknown output_mode '{mode}'. Use one of: {', '.join(OUTPUT_MODES)}")
+
+    def render_rows(self, mode: str, rows: List[List[Tuple[object, str]]], first: bool) -> str:
+        """
+        Render a chunk of table rows on their own, for streaming: markdown rows (the first
+        chunk opens with the title and table header), compact lines, or one JSON object per line.
+        """
+        if mode == 'markdown':
+            head = f"**{self.title}:**\n\n{self._markdown_header()}\n" if first else ""
+            return head + "".join(self._markdown_row(row) + "\n" for row in rows)
+        if mode == 'json':
+            import json
+            keys = [key for key, _ in self.columns[1]]
+            return "".join(
+                json.dumps(dict(zip(keys, map(_cell_value, row))),
+                           ensure_ascii=False, separators=(',', ':')) + "\n"
+                for row in rows
+            )
+        return "".join([" | ".join(map(_cell_text, row)) + "\n" for row in rows])
+
+    def _markdown_header(self) -> str:
+        headers = [header for _, header in self.columns[1]]
+        return "| " + " | ".join(headers) + " |\n" \
+               "|" + "|".join('-' * (len(header) + 2) for header in headers) + "|"
+
+    @staticmethod
+    def _markdown_row(row: List[Tuple[object, str]]) -> str:
+        return "| " + " | ".join(map(_cell_text, row)) + " |"
+
+    def _render_markdown(self) -> str:
+        lines = [f"**{self.title}:**\n"]
+        for _, label, _, text in self.fields:
+            lines.append(f"• **{label}:** {text}")
+        text = "\n".join(lines)
+        if self.streamed_rows and not self.rows:
+            text += f"\n\n*The {self.streamed_rows:,} table rows were streamed to the chat.*"
+        elif self.columns is not None:
+            if self.streamed_rows:
+                text += f"\n\n*The first {self.streamed_rows:,} table rows were streamed to the chat; the rest follow.*"
+            text += "\n\n" + self._markdown_header() + "\n" + "\n".join([self._markdown_row(row) for row in self.rows])
+        if self.note:
+            text += f"\n\n*{self.note}*"
+        return text
+
+    def _render_json(self) -> str:
+        import json
+        payload = {'type': self.kind}
+        payload.update(
+            (key, value.iso if isinstance(value, DateTimeFields) else value) for key, _, value, _ in self.fields
+        )
+        payload.update(self.data)
+        if self.streamed_rows:
+            payload['streamed_rows'] = self.streamed_rows
+        if self.columns is not None and not (self.streamed_rows and not self.rows):
+            table_key, columns = self.columns
+            keys = [key for key, _ in columns]
+            payload[table_key] = [dict(zip(keys, map(_cell_value, row))) for row in self.rows]
+        if self.note:
+            payload['note'] = self.note
+        return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+    def _render_compact(self) -> str:
+        lines = ["; ".join(f"{label}: {text}" for _, label, _, text in self.fields)]
+        if self.streamed_rows and not self.rows:
+            lines.append(f"{self.streamed_rows:,} rows streamed to the chat")
+        elif self.columns is not None:
+            if self.streamed_rows:
+                lines.append(f"The first {self.streamed_rows:,} rows streamed to the chat; the rest follow")
+            lines.extend([" | ".join(map(_cell_text, row)) for row in self.rows])
+        if self.note:
+            lines.append(self.note)
+        return "\n".join(lines)
+
+
+class ResultStream:
+    """
+    Sends a result to Open WebUI's __event_emitter__ while a method is still producing it:
+    status events report progress and message events append table rows to the chat.
+    Methods run on an executor thread, so every event is handed to the event loop and
+    waited for; the producer never gets more than one chunk ahead of the chat. Once the
+    emitter fails (the chat went away), the stream sends nothing more and the rows it did
+    not send are returned with the result instead.
+    """
+
+    __slots__ = ('emitter', 'loop', 'chunk_rows', 'mode', 'sent_rows', 'closed', 'failed')
+
+    def __init__(self, emitter: Callable, loop, chunk_rows: int, mode: str):
+        self.emitter = emitter
+        self.loop = loop
+        self.chunk_rows = chunk_rows
+        self.mode = mode
+        self.sent_rows = 0
+        self.closed = False
+        self.failed = False
+
+    def emit(self, event_type: str, data: dict) -> bool:
+        """Send one event and return whether the emitter took it."""
+        if self.closed:
+            raise CallCancelled("the call was cancelled or timed out")
+        if self.failed:
+            return False
+        import asyncio
+        try:
+            asyncio.run_coroutine_threadsafe(self.emitter({'type': event_type, 'data': data}), self.loop).result()
+        except Exception:
+            self.failed = True
+            return False
+        return True
+
+    def status(self, description: str, done: bool = False) -> bool:
+        return self.emit('status', {'description': description, 'done': done})
+
+    def send_rows(self, result: 'ToolResult', rows: List[List[Tuple[object, str]]]) -> bool:
+        if not self.emit('message', {'content': result.render_rows(self.mode, rows, first=not self.sent_rows)}):
+            return False
+        self.sent_rows += len(rows)
+        return True
+
+
+class CallCancelled(Exception):
+    """Raised inside an offloaded call once its caller has stopped waiting for it."""
+
+
+class _ActiveCall(threading.local):
+    # Class defaults, so code running outside an offloaded call reads None without a failed lookup
+    cancel = None
+    stream = None
+
+
+# The stream and the cancel event of the call running on this thread
+_ACTIVE_CALL = _ActiveCall()
+
+
+class _Deadline:
+    """
+    The cancel event of a call run inline on the event loop, where nothing else can set
+    one: it reads as set once the call has run for its timeout.
+    """
+
+    __slots__ = ('expires', 'expired')
+
+    def __init__(self, seconds: float):
+        self.expires = time.monotonic() + seconds
+        self.expired = False
+
+    def is_set(self) -> bool:
+        self.expired = self.expired or time.monotonic() >= self.expires
+        return self.expired
+
+
+def current_stream() -> Optional[ResultStream]:
+    """The ResultStream of the call running on this thread, if it streams."""
+    return _ACTIVE_CALL.stream
+
+
+def check_cancelled() -> None:
+    """
+    Stop the call running on this thread if it timed out or was cancelled. Long loops
+    call this between rows, so an abandoned call frees its worker thread promptly.
+    """
+    cancel = _ACTIVE_CALL.cancel
+    if cancel is not None and cancel.is_set():
+        raise CallCancelled("the call was cancelled or timed out")
+
+
+def _collect_rows(rows, block: int = 1024) -> list:
+    """List rows, checking between blocks of them whether the call was cancelled."""
+    rows = iter(rows)
+    collected = []
+    while True:
+        check_cancelled()
+        count = len(collected)
+        collected.extend(itertools.islice(rows, block))
+        if len(collected) - count < block:
+            return collected
+
+
+def _call_on_thread(call: Callable, cancel: threading.Event, stream: Optional[ResultStream]) -> str:
+    _ACTIVE_CALL.cancel, _ACTIVE_CALL.stream = cancel, stream
+    try:
+        return call()
+    finally:
+        _ACTIVE_CALL.cancel = _ACTIVE_CALL.stream = None
+
+
+def _run_in_worker(method_name: str, valves_data: dict, args: tuple, kwargs: dict) -> str:
+    """
+    Entry point for process-pool workers: rebuild Tools with the caller's Valves and run
+    the synchronous method. Module-level so it pickles by reference.
+    """
+    tools = Tools()
+    tools.valves = Tools.Valves(**valves_data)
+    return tools._call_sync(method_name, args, kwargs)
+
+
+def _tool(method, streams: bool = False, offload: bool = False):
+    """
+    Turn a synchronous Tools method into the coroutine Open WebUI awaits (see
+    Tools._dispatch). The synchronous method stays available as the coroutine's `sync`
+    attribute. Streaming methods also ask for Open WebUI's __event_emitter__, which their
+    long tables are sent through. Methods marked offload always run on the executor, since
+    their cost follows their arguments' values rather than the length of their text.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, __event_emitter__=None, **kwargs):
+        return await self._dispatch(name, args, kwargs, __event_emitter__)
+
+    if streams:
+        # Open WebUI only passes __event_emitter__ to functions whose signature asks for it
+        import inspect
+        signature = inspect.signature(method)
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter('__event_emitter__', inspect.Parameter.KEYWORD_ONLY, default=None),
+        ])
+    wrapper.sync = method
+    wrapper.offload = offload
+    return wrapper
+
+
+def _offloaded_tool(method):
+    """_tool for methods that can be slow on short input (long date spans, many zones)."""
+    return _tool(method, offload=True)
+
+
+def _streaming_tool(method):
+    """_tool for methods that can stream a long table; their row count is unbounded, so they are offloaded."""
+    return _tool(method, streams=True, offload=True)
 
 
 class Tools:
+    class Valves(BaseModel):
+        parse_cache_size: int = Field(
+            default=1024,
+            description="Maximum number of parsed date/duration expressions kept in the LRU parse cache. "
+                        "Least recently used entries are evicted first; 0 disables the cache.",
+        )
+        context_store_size: int = Field(
+            default=10000,
+            description="Maximum number of conversations whose stated base time (from calculate_time_from_query) "
+                        "later calls remember. Least recently used are evicted first; 0 disables it.",
+        )
+        context_ttl_seconds: float = Field(
+            default=3600.0,
+            description="Forget a conversation's stated base time after this many seconds without a call; "
+                        "0 keeps it until evicted.",
+        )
+        offload_min_chars: int = Field(
+            default=2000,
+            description="Calls with less text than this run directly on Open WebUI's event loop; longer ones "
+                        "(large queries, documents) go to the executor. Methods that can be slow on short "
+                        "input (batches, ranges, recurrences, business days, world clocks) always do. "
+                        "0 offloads every call.",
+        )
+        executor_type: str = Field(
+            default="thread",
+            description="Executor for offloaded calls: 'thread' or 'process'. 'process' sidesteps the GIL for "
+                        "large batches but needs the fork start method; calls that stream or use the "
+                        "conversation store still run on threads.",
+        )
+        executor_max_workers: int = Field(
+            default=4,
+            description="Maximum number of workers in the executor.",
+        )
+        call_timeout_seconds: float = Field(
+            default=30.0,
+            description="Per-call timeout; 0 disables the timeout. A timed-out call returns an error and "
+                        "stops at the next row it produces.",
+        )
+        calendar_mode: str = Field(
+            default="exact",
+            description="'exact' counts real calendar months and years (leap years, uneven months); "
+                        "'approximate' keeps the legacy 30-day month and 365-day year.",
+        )
+        locale: str = Field(
+            default="en",
+            description="Language of date, time and duration arguments: 'en', a locale pack code "
+                        "('fr', 'de', 'es'), or 'auto' to detect it per input from the installed packs.",
+        )
+        locale_dir: str = Field(
+            default="",
+            description="Directory of locale packs (<code>.json). Empty uses the locales folder next to "
+                        "the tool file, when there is one.",
+        )
+        date_order: str = Field(
+            default="auto",
+            description="How numeric dates like 05/01/2024 are read: 'month_first', 'day_first', or 'auto' "
+                        "(the locale's order, month-first for English, switching when that reading is impossible).",
+        )
+        holiday_calendar_dir: str = Field(
+            default="",
+            description="Directory of holiday calendar files (<name>.txt, one YYYY-MM-DD date per line).",
+        )
+        default_holiday_calendar: str = Field(
+            default="",
+            description="Holiday calendar used when none is given; empty means weekends only.",
+        )
+        weekend_days: str = Field(
+            default="saturday,sunday",
+            description="Comma-separated non-working weekdays.",
+        )
+        work_day_start: str = Field(default="09:00", description="Start of the working day.")
+        work_day_end: str = Field(default="17:00", description="End of the working day.")
+        max_recurrence_occurrences: int = Field(
+            default=500,
+            description="Maximum number of occurrences a single recurrence expansion may return.",
+        )
+        max_extracted_expressions: int = Field(
+            default=500,
+            description="Maximum number of expressions extract_time_expressions lists (all are counted).",
+        )
+        max_listed_ranges: int = Field(
+            default=200,
+            description="Maximum number of ranges the time-range methods list (totals cover all of them).",
+        )
+        stream_chunk_rows: int = Field(
+            default=200,
+            description="Rows per chunk when an offloaded call streams a long table to the chat through Open WebUI's "
+                        "event emitter. Tables of up to one chunk are returned whole; 0 disables streaming.",
+        )
+        max_scan_chars: int = Field(
+            default=4096,
+            description="calculate_time_from_query only scans this many characters from the end of a query "
+                        "(and, for the base time, windows of this size before it). 0 scans everything.",
+        )
+        output_mode: str = Field(
+            default="markdown",
+            description="Result format: 'markdown' (readable), 'json' (machine-readable) or 'compact' (fewest tokens).",
+        )
+        enable_stats: bool = Field(
+            default=False,
+            description="Record per-method latency and input-size histograms and parser branch, failure and "
+                        "fallback counters, reported by get_tool_stats. Near-zero cost when off.",
+        )
+
     def __init__(self):
         self.citation = True
+        self.valves = self.Valves()
+        self._executor = None
+        self._executor_config = None
+        self._executor_lock = threading.Lock()
+        self._applied_valves = None
+        self._parse_settings = None
+
+    def _sync_valves(self) -> None:
+        """
+        Apply the current Valves. The language settings only hold for the call running on this
+        thread (see _instrumented); the cache sizes, the context TTL and the stats switch are
+        process-wide, since every instance shares the parse cache, the conversation store and
+        TOOL_STATS. Those are only written when this instance's Valves have changed since its
+        last call, so repeated calls neither touch the shared state nor undo another instance's
+        more recent change.
+        """
+        valves = self.valves
+        current = (valves.parse_cache_size, valves.context_store_size, valves.context_ttl_seconds,
+                   valves.enable_stats, valves.locale, valves.locale_dir, valves.date_order)
+        if current != self._applied_valves:
+            self._parse_settings = make_parse_settings(valves.locale, valves.locale_dir, valves.date_order)
+            PARSE_CACHE.resize(valves.parse_cache_size)
+            CONVERSATION_CONTEXTS.resize(valves.context_store_size)
+            CONVERSATION_CONTEXTS.ttl_seconds = valves.context_ttl_seconds
+            TOOL_STATS.enabled = valves.enable_stats
+            self._applied_valves = current
+        _CALL_SETTINGS.settings = self._parse_settings
+
+    def _render(self, result: ToolResult) -> str:
+        mode = self.valves.output_mode
+        # Markdown, the default, skips the dispatch in ToolResult.render
+        return result._render_markdown() if mode == 'markdown' else result.render(mode)
+
+    def _fail(self, message: str) -> str:
+        """
+        Render an error or "could not parse" message in the current output mode.
+        """
+        if TOOL_STATS.enabled:
+            TOOL_STATS.count('method_failures', TOOL_STATS.current_method or 'unknown')
+        if self.valves.output_mode == 'json':
+            import json
+            return json.dumps({'error': message}, ensure_ascii=False)
+        return message
+
+    def _table(self, result: ToolResult, key: str, columns: List[Tuple[str, str]], rows,
+               progress: Callable[[int], str] = None) -> int:
+        """
+        Attach a table built from an iterable of rows and return the number of rows.
+        When the call streams (see ResultStream), a table longer than one chunk is sent to
+        the chat chunk by chunk as the rows are produced, with a progress status after each
+        chunk, and the result only records how many rows were streamed. If the stream fails,
+        the rows it did not send stay in the result's table.
+        """
+        stream = current_stream()
+        if stream is None:
+            cancellable = _ACTIVE_CALL.cancel is not None
+            result.table(key, columns, _collect_rows(rows) if cancellable else list(rows))
+            return len(result.rows)
+        
+        result.table(key, columns, [])
+        chunk = []
+        for row in rows:
+            check_cancelled()
+            if len(chunk) == stream.chunk_rows and stream.send_rows(result, chunk):
+                if progress is not None:
+                    stream.status(progress(stream.sent_rows))
+                chunk = []
+            chunk.append(row)
+        if stream.sent_rows and stream.send_rows(result, chunk):
+            chunk = []
+        result.rows = chunk
+        result.streamed_rows = stream.sent_rows
+        return stream.sent_rows + len(chunk)
+
+    def _conversation_context(self, key: Optional[tuple]) -> Optional[ConversationContext]:
+        """
+        The stored context of a conversation (see conversation_key), if its user stated a
+        base time. Under the 'auto' locale, the locale that time was read in becomes this
+        call's fallback, so a later "12h55" is still read as French.
+        """
+        context = CONVERSATION_CONTEXTS.get(key) if key is not None else None
+        if context is not None and context.locale != 'en':
+            settings = parse_settings()
+            if settings.locale == 'auto':
+                _CALL_SETTINGS.settings = settings._replace(fallback_locale=context.locale)
+        return context
+
+    def _batch_size(self, count: int) -> int:
+        """
+        How many timestamps a batch method converts at a time: all of them, or one stream
+        chunk's worth while streaming, so the converted rows never pile up in memory.
+        """
+        stream = current_stream()
+        return count if stream is None else max(1, stream.chunk_rows)
 
-    def calculate_time_from_query(self, query: str) -> str:
+    @_tool
+    @_instrumented
+    def calculate_time_from_query(self, query: str, __metadata__: dict = None, __user__: dict = None) -> str:
         """
         Calculate time based on a natural language query that may contain both duration and base time.
         Examples: "calculate the time 2 hours from now. the current time is 12:55 PM."
+        A base time stated earlier in the same conversation is reused, moved forward by the time since.
         :param query: Natural language query containing time calculation request
         :return: The calculated time result
         """
         try:
-            # Extract base time from query if specified
-            base_time_str = extract_base_time_from_query(query)
-            
-            # Look for duration patterns in the query
-            duration_patterns = [
-                r'(\d+\s+(?:hours?|hrs?|h))',
-                r'(\d+\s+(?:minutes?|mins?|m))',
-                r'(\d+\s+(?:seconds?|secs?|s))',
-                r'(\d+\s+(?:days?|d))',
-                r'(\d+\s+(?:weeks?|wks?|w))',
-                r'(\d+\s+(?:months?|mos?))',
-                r'(\d+\s+(?:years?|yrs?))'
-            ]
+            self._sync_valves()
+            key = conversation_key(__metadata__, __user__)
+            context = self._conversation_context(key)
+            # Base time, duration and operation come out of a single parse; a follow-up turn
+            # only looks for a base time when it states one again
+            parsed = parse_query(query, self.valves.max_scan_chars, known_base=context is not None)
             
-            duration_str = ""
-            for pattern in duration_patterns:
-                matches = re.findall(pattern, query.lower())
-                if matches:
-                    duration_str += " ".join(matches) + " "
+            if parsed.duration is None:
+                return self._fail("Could not extract duration from query. Please specify a duration like '2 hours', '30 minutes', etc.")
             
-            duration_str = duration_str.strip()
-            
-            if not duration_str:
-                return "Could not extract duration from query. Please specify a duration like '2 hours', '30 minutes', etc."
-            
-            # Determine operation (addition is default)
-            operation = "add"
-            if any(word in query.lower() for word in ['subtract', 'minus', 'before', 'ago', 'earlier']):
-                operation = "subtract"
-            
-            # Use the appropriate calculation method
-            if operation == "subtract":
-                return self.calculate_time_subtraction(duration_str, base_time_str)
+            now = get_current_time()
+            if parsed.base_text in _CURRENT_TIME_WORDS:
+                base_dt, base_description = now, "current time"
+            elif parsed.base is not None:
+                # A newly stated base time, or the same one stated again: anchor to it afresh
+                base_dt = resolve_datetime_expr(parsed.base, now)
+                if base_dt.tzinfo is None and context is not None and context.base.tzinfo is not None:
+                    base_dt = base_dt.replace(tzinfo=context.base.tzinfo)
+                base_description = parsed.base_text
+                if key is not None:
+                    CONVERSATION_CONTEXTS.put(key, ConversationContext(base_dt, parsed.base_text, now,
+                                                                       effective_locale(parsed.base_text)))
+            elif context is not None:
+                # A follow-up turn: keep the user's clock running
+                base_dt = context.base_now(now)
+                base_description = f"{context.base_text}, stated earlier in this conversation"
             else:
-                return self.calculate_time_addition(duration_str, base_time_str)
+                base_dt, base_description = now, "current time"
+            
+            sign = -1 if parsed.operation == "subtract" else 1
+            return self._format_shift_result(base_dt, base_description, parsed.duration, parsed.duration_text, sign)
                 
         except Exception as e:
-            return f"Error processing query: {str(e)}"
+            return self._fail(f"Error processing query: {str(e)}")
 
-    def calculate_time_addition(self, duration_str: str, base_time: str = None) -> str:
+    @_tool
+    @_instrumented
+    def calculate_time_addition(self, duration_str: str, base_time: str = None,
+                                __metadata__: dict = None, __user__: dict = None) -> str:
         """
         Add a duration to a base time (current time if not specified).
         Examples: "Add 2 hours to now", "Add 3 days to tomorrow"
@@ -311,50 +3824,24 @@ class Tools:
         :return: The calculated time
         """
         try:
+            self._sync_valves()
+            context = self._conversation_context(conversation_key(__metadata__, __user__))
             # Parse the base time - use current time if not specified or implied
-            if base_time is None or base_time.lower() in ['now', 'current time', '']:
-                base_dt = get_current_time()
-                base_description = "current time"
-            else:
-                base_dt = parse_natural_datetime(base_time)
-                base_description = base_time
+            base_dt, base_description = resolve_time_argument(base_time, context)
             
-            # Parse the duration
-            duration_components = parse_duration(duration_str)
-            
-            if not duration_components:
-                return f"Could not parse duration: {duration_str}"
-            
-            # Apply the duration using standard library datetime operations
-            result_dt = base_dt
-            
-            # Add years and months using helper function
-            if 'years' in duration_components:
-                result_dt = add_months(result_dt, duration_components['years'] * 12)
-            if 'months' in duration_components:
-                result_dt = add_months(result_dt, duration_components['months'])
-            
-            # Add other time units using timedelta
-            delta = datetime.timedelta(
-                weeks=duration_components.get('weeks', 0),
-                days=duration_components.get('days', 0),
-                hours=duration_components.get('hours', 0),
-                minutes=duration_components.get('minutes', 0),
-                seconds=duration_components.get('seconds', 0)
-            )
-            result_dt = result_dt + delta
-            
-            return f"**Time Addition Result:**\n\n" \
-                   f"• **Base time:** {base_dt.strftime('%Y-%m-%d %H:%M:%S')} ({base_description})\n" \
-                   f"• **Duration added:** {duration_str}\n" \
-                   f"• **Result:** {result_dt.strftime('%Y-%m-%d %H:%M:%S')}\n" \
-                   f"• **Day of week:** {result_dt.strftime('%A')}\n" \
-                   f"• **Unix timestamp:** {int(result_dt.timestamp())}"
+            duration = parse_duration(duration_str)
+            if duration is None:
+                return self._fail(f"Could not parse duration: {duration_str}")
+            
+            return self._format_shift_result(base_dt, base_description, duration, duration_str, 1)
                    
         except Exception as e:
-            return f"Error calculating time addition: {str(e)}"
+            return self._fail(f"Error calculating time addition: {str(e)}")
 
-    def calculate_time_subtraction(self, duration_str: str, base_time: str = None) -> str:
+    @_tool
+    @_instrumented
+    def calculate_time_subtraction(self, duration_str: str, base_time: str = None,
+                                   __metadata__: dict = None, __user__: dict = None) -> str:
         """
         Subtract a duration from a base time (current time if not specified).
         Examples: "Subtract 3 days from today", "Subtract 2 hours from now"
@@ -363,50 +3850,46 @@ class Tools:
         :return: The calculated time
         """
         try:
+            self._sync_valves()
+            context = self._conversation_context(conversation_key(__metadata__, __user__))
             # Parse the base time - use current time if not specified or implied
-            if base_time is None or base_time.lower() in ['now', 'current time', '']:
-                base_dt = get_current_time()
-                base_description = "current time"
-            else:
-                base_dt = parse_natural_datetime(base_time)
-                base_description = base_time
+            base_dt, base_description = resolve_time_argument(base_time, context)
             
-            # Parse the duration
-            duration_components = parse_duration(duration_str)
-            
-            if not duration_components:
-                return f"Could not parse duration: {duration_str}"
-            
-            # Subtract the duration using standard library datetime operations
-            result_dt = base_dt
-            
-            # Subtract years and months using helper function
-            if 'years' in duration_components:
-                result_dt = add_months(result_dt, -duration_components['years'] * 12)
-            if 'months' in duration_components:
-                result_dt = add_months(result_dt, -duration_components['months'])
-            
-            # Subtract other time units using timedelta
-            delta = datetime.timedelta(
-                weeks=duration_components.get('weeks', 0),
-                days=duration_components.get('days', 0),
-                hours=duration_components.get('hours', 0),
-                minutes=duration_components.get('minutes', 0),
-                seconds=duration_components.get('seconds', 0)
-            )
-            result_dt = result_dt - delta
-            
-            return f"**Time Subtraction Result:**\n\n" \
-                   f"• **Base time:** {base_dt.strftime('%Y-%m-%d %H:%M:%S')} ({base_description})\n" \
-                   f"• **Duration subtracted:** {duration_str}\n" \
-                   f"• **Result:** {result_dt.strftime('%Y-%m-%d %H:%M:%S')}\n" \
-                   f"• **Day of week:** {result_dt.strftime('%A')}\n" \
-                   f"• **Unix timestamp:** {int(result_dt.timestamp())}"
+            duration = parse_duration(duration_str)
+            if duration is None:
+                return self._fail(f"Could not parse duration: {duration_str}")
+            
+            return self._format_shift_result(base_dt, base_description, duration, duration_str, -1)
                    
         except Exception as e:
-            return f"Error calculating time subtraction: {str(e)}"
+            return self._fail(f"Error calculating time subtraction: {str(e)}")
+
+    def _format_shift_result(
+        self, base_dt: datetime.datetime, base_description: str, duration: DurationVector, duration_text: str, sign: int
+    ) -> str:
+        """
+        Apply a duration to a base time and render the addition/subtraction result.
+        The shift is integer math on epoch nanoseconds, so results past year 9999 still render.
+        """
+        result_ns = shift_ns(datetime_to_ns(base_dt), sign * duration.total_months, sign * duration.nanoseconds)
+        label, verb = ("Addition", "added") if sign > 0 else ("Subtraction", "subtracted")
+        base = datetime_fields(base_dt)
+        result = ns_fields(result_ns, base_dt.tzinfo)
+        
+        return self._render(
+            ToolResult(f"time_{label.lower()}", f"Time {label} Result")
+            .add_datetime('base_time', "Base time", base, f"{base.display} ({base_description})")
+            .add('duration', f"Duration {verb}", duration_text)
+            .add_datetime('result', "Result", result)
+            .add('day_of_week', "Day of week", result.day_name)
+            .add('unix_timestamp', "Unix timestamp", result.timestamp)
+            .extra('base_description', base_description)
+        )
 
-    def calculate_time_difference(self, start_time: str, end_time: str) -> str:
+    @_tool
+    @_instrumented
+    def calculate_time_difference(self, start_time: str, end_time: str,
+                                  __metadata__: dict = None, __user__: dict = None) -> str:
         """
         Calculate the difference between two dates/times.
         :param start_time: Start time (e.g., "2024-01-01", "yesterday", "now")
@@ -414,42 +3897,53 @@ class Tools:
         :return: The time difference in various formats
         """
         try:
+            self._sync_valves()
+            context = self._conversation_context(conversation_key(__metadata__, __user__))
             # Parse both times - use current time if "now" is implied
-            if start_time.lower() in ['now', 'current time', '']:
-                start_dt = get_current_time()
-                start_description = "current time"
-            else:
-                start_dt = parse_natural_datetime(start_time)
-                start_description = start_time
-                
-            if end_time.lower() in ['now', 'current time', '']:
-                end_dt = get_current_time()
-                end_description = "current time"
-            else:
-                end_dt = parse_natural_datetime(end_time)
-                end_description = end_time
+            start_dt, start_description = resolve_time_argument(start_time, context)
+            end_dt, end_description = resolve_time_argument(end_time, context)
+            # Compare a zoned time against a local one by reading the local one as system time
+            if (start_dt.tzinfo is None) != (end_dt.tzinfo is None):
+                start_dt, end_dt = start_dt.astimezone(), end_dt.astimezone()
             
-            # Calculate the difference
-            diff = end_dt - start_dt
-            total_seconds = int(diff.total_seconds())
+            # Calculate the difference: elapsed time between the two instants, truncated to seconds.
+            # Subtracting two times in one zone ignores a DST change between them, so aware
+            # times are compared as instants; naive ones are wall-clock times either way
+            if start_dt.tzinfo is None:
+                diff = end_dt - start_dt
+                total_seconds = diff.days * 86400 + diff.seconds
+                if total_seconds < 0 and diff.microseconds:
+                    total_seconds += 1
+            else:
+                diff_ns = instant_ns(end_dt) - instant_ns(start_dt)
+                total_seconds = diff_ns // NS_PER_SECOND if diff_ns >= 0 else -(-diff_ns // NS_PER_SECOND)
             
-            # Format the difference
-            formatted_diff = format_duration(abs(total_seconds))
+            # Format the difference, with exact calendar months/years unless the legacy mode is on
+            anchor = min(start_dt, end_dt) if self._exact_calendar() else None
+            formatted_diff = format_duration(abs(total_seconds), anchor)
             direction = "later" if total_seconds >= 0 else "earlier"
+            start = datetime_fields(start_dt)
+            end = datetime_fields(end_dt)
             
-            return f"**Time Difference Calculation:**\n\n" \
-                   f"• **Start time:** {start_dt.strftime('%Y-%m-%d %H:%M:%S')} ({start_description})\n" \
-                   f"• **End time:** {end_dt.strftime('%Y-%m-%d %H:%M:%S')} ({end_description})\n" \
-                   f"• **Difference:** {formatted_diff}\n" \
-                   f"• **Direction:** End time is {formatted_diff} {direction} than start time\n" \
-                   f"• **Total seconds:** {total_seconds:,}\n" \
-                   f"• **Total minutes:** {total_seconds // 60:,}\n" \
-                   f"• **Total hours:** {total_seconds // 3600:,}\n" \
-                   f"• **Total days:** {total_seconds // 86400:,}"
+            return self._render(
+                ToolResult('time_difference', "Time Difference Calculation")
+                .add_datetime('start_time', "Start time", start, f"{start.display} ({start_description})")
+                .add_datetime('end_time', "End time", end, f"{end.display} ({end_description})")
+                .add('difference', "Difference", formatted_diff)
+                .add('direction', "Direction", direction, f"End time is {formatted_diff} {direction} than start time")
+                .add('total_seconds', "Total seconds", total_seconds, f"{total_seconds:,}")
+                .add('total_minutes', "Total minutes", total_seconds // 60, f"{total_seconds // 60:,}")
+                .add('total_hours', "Total hours", total_seconds // 3600, f"{total_seconds // 3600:,}")
+                .add('total_days', "Total days", total_seconds // 86400, f"{total_seconds // 86400:,}")
+                .extra('start_description', start_description)
+                .extra('end_description', end_description)
+            )
                    
         except Exception as e:
-            return f"Error calculating time difference: {str(e)}"
+            return self._fail(f"Error calculating time difference: {str(e)}")
 
+    @_tool
+    @_instrumented
     def convert_duration(self, duration_str: str, target_unit: str = "minutes") -> str:
         """
         Convert a duration to a specific unit.
@@ -459,49 +3953,72 @@ class Tools:
         :return: The converted duration
         """
         try:
+            self._sync_valves()
             # Parse the duration
-            duration_components = parse_duration(duration_str)
-            
-            if not duration_components:
-                return f"Could not parse duration: {duration_str}"
-            
-            # Convert to total seconds first
-            total_seconds = 0
-            total_seconds += duration_components.get('years', 0) * 365 * 24 * 3600
-            total_seconds += duration_components.get('months', 0) * 30 * 24 * 3600  # Approximate
-            total_seconds += duration_components.get('weeks', 0) * 7 * 24 * 3600
-            total_seconds += duration_components.get('days', 0) * 24 * 3600
-            total_seconds += duration_components.get('hours', 0) * 3600
-            total_seconds += duration_components.get('minutes', 0) * 60
-            total_seconds += duration_components.get('seconds', 0)
-            
-            # Convert to target unit
-            target_unit = target_unit.lower().rstrip('s')  # Remove plural 's'
-            
-            conversions = {
-                'second': total_seconds,
-                'minute': total_seconds / 60,
-                'hour': total_seconds / 3600,
-                'day': total_seconds / 86400,
-                'week': total_seconds / (7 * 86400),
-                'month': total_seconds / (30 * 86400),  # Approximate
-                'year': total_seconds / (365 * 86400)
-            }
+            duration = parse_duration(duration_str)
+            
+            if duration is None:
+                return self._fail(f"Could not parse duration: {duration_str}")
             
-            if target_unit not in conversions:
-                return f"Unknown target unit: {target_unit}. Supported units: {', '.join(conversions.keys())}"
+            # Read the target unit in the same language as the duration
+            target_unit = localize_text(target_unit.lower().strip()).rstrip('s')  # Remove plural 's'
             
-            result = conversions[target_unit]
+            # Convert to total seconds first. Exact mode measures calendar months and years
+            # from the current time; the legacy mode counts 30-day months and 365-day years.
+            # A duration shorter than any month, in fixed units, is the same length from every
+            # starting point, so it is not measured from the current time.
+            total_seconds = duration.approximate_seconds()
+            anchor = None
+            if self._exact_calendar() and (
+                duration.years or duration.months or target_unit in _CALENDAR_UNITS
+                or total_seconds >= _SHORTEST_MONTH_SECONDS
+            ):
+                anchor = get_current_time()
+                end = shift_datetime(anchor, duration)
+                total_seconds = int((end - anchor).total_seconds())
             
-            return f"**Duration Conversion:**\n\n" \
-                   f"• **Original:** {duration_str}\n" \
-                   f"• **Converted to {target_unit}s:** {result:,.2f}\n" \
-                   f"• **Total seconds:** {total_seconds:,}\n" \
-                   f"• **Breakdown:** {format_duration(total_seconds)}"
+            # Only the requested conversion is computed
+            if target_unit == 'second':
+                result = total_seconds
+            elif target_unit in _FIXED_UNIT_SECONDS:
+                result = total_seconds / _FIXED_UNIT_SECONDS[target_unit]
+            elif target_unit in _CALENDAR_UNITS:
+                unit_months, approximate_seconds = _CALENDAR_UNITS[target_unit]
+                if anchor is None:
+                    result = total_seconds / approximate_seconds
+                elif not duration.delta and duration.total_months % unit_months == 0:
+                    # Whole months and years come out whole, wherever they are measured from
+                    result = float(duration.total_months // unit_months)
+                else:
+                    result = calendar_units_between(anchor, end, unit_months)
+            else:
+                supported = ', '.join([*_FIXED_UNIT_SECONDS, *_CALENDAR_UNITS])
+                return self._fail(f"Unknown target unit: {target_unit}. Supported units: {supported}")
+            
+            if anchor is not None and not duration.delta:
+                # Whole months and years measured from the calendar break down into themselves
+                breakdown = _join_duration_parts(*divmod(duration.total_months, 12), 0, 0, 0, 0)
+            else:
+                breakdown = format_duration(total_seconds, anchor)
+            conversion = (
+                ToolResult('duration_conversion', "Duration Conversion")
+                .add('original', "Original", duration_str)
+                .add('converted', f"Converted to {target_unit}s", result, f"{result:,.2f}")
+                .add('total_seconds', "Total seconds", total_seconds, f"{total_seconds:,}")
+                .add('breakdown', "Breakdown", breakdown)
+                .extra('unit', f"{target_unit}s")
+            )
+            if anchor is not None:
+                measured_from = datetime_fields(anchor)
+                conversion.add_datetime('measured_from', "Calendar", measured_from,
+                                        f"exact, measured from {measured_from.display}")
+            return self._render(conversion)
                    
         except Exception as e:
-            return f"Error converting duration: {str(e)}"
+            return self._fail(f"Error converting duration: {str(e)}")
 
+    @_tool
+    @_instrumented
     def format_current_time(self, format_string: str = "%H:%M:%S") -> str:
         """
         Format the current time using a specified format.
@@ -509,19 +4026,27 @@ class Tools:
         :return: The formatted current time
         """
         try:
+            self._sync_valves()
             now = get_current_time()
-            formatted_time = now.strftime(format_string)
+            formatted_time = format_datetime_as(now, format_string)
+            fields = datetime_fields(now)
             
-            return f"**Current Time Formatting:**\n\n" \
-                   f"• **Current time:** {now.strftime('%Y-%m-%d %H:%M:%S')}\n" \
-                   f"• **Formatted as \"{format_string}\":** {formatted_time}\n" \
-                   f"• **Unix timestamp:** {int(now.timestamp())}\n" \
-                   f"• **Day of week:** {now.strftime('%A')}"
+            return self._render(
+                ToolResult('current_time_format', "Current Time Formatting")
+                .add_datetime('current_time', "Current time", fields, fields.datetime_text)
+                .add('formatted', f"Formatted as \"{format_string}\"", formatted_time)
+                .add('unix_timestamp', "Unix timestamp", fields.timestamp)
+                .add('day_of_week', "Day of week", fields.day_name)
+                .extra('format_string', format_string)
+            )
                    
         except Exception as e:
-            return f"Error formatting current time: {str(e)}"
+            return self._fail(f"Error formatting current time: {str(e)}")
 
-    def parse_to_timestamp(self, datetime_str: str) -> str:
+    @_tool
+    @_instrumented
+    def parse_to_timestamp(self, datetime_str: str,
+                           __metadata__: dict = None, __user__: dict = None) -> str:
         """
         Parse a natural language date/time string into a Unix timestamp.
         Examples: "tomorrow at 3pm", "next Friday", "in 2 hours"
@@ -529,59 +4054,836 @@ class Tools:
         :return: Unix timestamp and parsed datetime
         """
         try:
+            self._sync_valves()
+            context = self._conversation_context(conversation_key(__metadata__, __user__))
             # Handle implicit current time
-            if datetime_str.lower() in ['now', 'current time', '']:
-                parsed_dt = get_current_time()
-                input_description = "current time"
-            else:
-                parsed_dt = parse_natural_datetime(datetime_str)
-                input_description = datetime_str
+            parsed_dt, input_description = resolve_time_argument(datetime_str, context)
+            fields = datetime_fields(parsed_dt)
             
-            timestamp = int(parsed_dt.timestamp())
-            
-            return f"**Natural Language Date/Time Parsing:**\n\n" \
-                   f"• **Input:** \"{input_description}\"\n" \
-                   f"• **Parsed as:** {parsed_dt.strftime('%Y-%m-%d %H:%M:%S')}\n" \
-                   f"• **Day of week:** {parsed_dt.strftime('%A')}\n" \
-                   f"• **Unix timestamp:** {timestamp}\n" \
-                   f"• **ISO format:** {parsed_dt.isoformat()}"
+            return self._render(
+                ToolResult('timestamp_parse', "Natural Language Date/Time Parsing")
+                .add('input', "Input", input_description, f"\"{input_description}\"")
+                .add_datetime('parsed', "Parsed as", fields)
+                .add('day_of_week', "Day of week", fields.day_name)
+                .add('unix_timestamp', "Unix timestamp", fields.timestamp)
+                .add('iso_format', "ISO format", fields.iso)
+            )
                    
         except Exception as e:
-            return f"Error parsing datetime string: {str(e)}"
+            return self._fail(f"Error parsing datetime string: {str(e)}")
 
+    @_tool
+    @_instrumented
     def get_time_info(self, timezone: str = None) -> str:
         """
         Get comprehensive time information for current time.
-        Note: Timezone support requires additional setup in Open WebUI environment.
-        :param timezone: Timezone name (currently not supported without pytz)
+        :param timezone: Optional timezone (IANA name, city, abbreviation or UTC offset); defaults to local time
         :return: Comprehensive time information
         """
         try:
+            self._sync_valves()
             now = get_current_time()
+            if timezone:
+                now = now.astimezone(parse_timezone(timezone))
+            fields = datetime_fields(now)
             
+            info = ToolResult('time_info', f"Comprehensive Time Information ({timezone or 'Local time'})")
+            info.add_datetime('datetime', "Date/time", fields, fields.datetime_text)
             if timezone:
-                return f"**Time Information:**\n\n" \
-                       f"⚠️ **Note:** Timezone functionality requires additional Python packages (pytz) to be installed.\n\n" \
-                       f"**Current local time information:**\n" \
-                       f"• **Date/time:** {now.strftime('%Y-%m-%d %H:%M:%S')} (Local time)\n" \
-                       f"• **12-hour format:** {now.strftime('%I:%M:%S %p')}\n" \
-                       f"• **Day of week:** {now.strftime('%A')}\n" \
-                       f"• **Month:** {now.strftime('%B')}\n" \
-                       f"• **Week of year:** {now.strftime('%U')}\n" \
-                       f"• **Day of year:** {now.strftime('%j')}\n" \
-                       f"• **Unix timestamp:** {int(now.timestamp())}\n" \
-                       f"• **ISO format:** {now.isoformat()}\n\n" \
-                       f"💡 **Tip:** To use timezone features, install pytz: `pip install pytz`"
-            
-            return f"**Comprehensive Time Information (Local time):**\n\n" \
-                   f"• **Date/time:** {now.strftime('%Y-%m-%d %H:%M:%S')}\n" \
-                   f"• **12-hour format:** {now.strftime('%I:%M:%S %p')}\n" \
-                   f"• **Day of week:** {now.strftime('%A')}\n" \
-                   f"• **Month:** {now.strftime('%B')}\n" \
-                   f"• **Week of year:** {now.strftime('%U')}\n" \
-                   f"• **Day of year:** {now.strftime('%j')}\n" \
-                   f"• **Unix timestamp:** {int(now.timestamp())}\n" \
-                   f"• **ISO format:** {now.isoformat()}"
+                info.add('timezone', "Timezone", fields.zone, f"{fields.zone} ({fields.offset_text})")
+                info.add('dst', "Daylight saving time", bool(fields.dst), 'yes' if fields.dst else 'no')
+                info.extra('utc_offset_seconds', fields.utc_offset)
+            return self._render(
+                info.add('time_12h', "12-hour format", fields.time_12h)
+                .add('day_of_week', "Day of week", fields.day_name)
+                .add('month', "Month", fields.month_name)
+                .add('week_of_year', "Week of year", fields.week_of_year, f"{fields.week_of_year:02d}")
+                .add('day_of_year', "Day of year", fields.day_of_year, f"{fields.day_of_year:03d}")
+                .add('unix_timestamp', "Unix timestamp", fields.timestamp)
+                .add('iso_format', "ISO format", fields.iso)
+            )
+                   
+        except Exception as e:
+            return self._fail(f"Error getting time info: {str(e)}")
+
+    @_tool
+    @_instrumented
+    def convert_timezone(self, datetime_str: str, target_timezone: str, source_timezone: str = None,
+                         __metadata__: dict = None, __user__: dict = None) -> str:
+        """
+        Convert a date/time from one timezone to another.
+        Examples: "3pm in Tokyo" to "New York", "2024-03-10 09:00" from "UTC" to "Europe/Paris"
+        :param datetime_str: Date/time to convert; may carry its own zone (e.g., "15:00 UTC", "3pm in Tokyo")
+        :param target_timezone: Zone to convert to (IANA name, city, abbreviation or UTC offset)
+        :param source_timezone: Zone of datetime_str when it has none (defaults to local time)
+        :return: The converted date/time
+        """
+        try:
+            self._sync_valves()
+            # An explicit source zone wins over the zone of the conversation's stated clock
+            context = None if source_timezone else self._conversation_context(conversation_key(__metadata__, __user__))
+            target_zone = parse_timezone(target_timezone)
+            source_dt, input_description = resolve_time_argument(datetime_str, context)
+            if source_dt.tzinfo is None:
+                if source_timezone:
+                    source_dt = source_dt.replace(tzinfo=parse_timezone(source_timezone))
+                else:
+                    source_dt = source_dt.astimezone()
+            
+            source = datetime_fields(source_dt)
+            result = datetime_fields(source_dt.astimezone(target_zone))
+            
+            return self._render(
+                ToolResult('timezone_conversion', "Timezone Conversion")
+                .add('input', "Input", input_description, f"\"{input_description}\"")
+                .add_datetime('source_time', "Source time", source, f"{source.display} ({source.offset_text})")
+                .add_datetime('converted_time', "Converted time", result, f"{result.display} ({result.offset_text})")
+                .add('day_of_week', "Day of week", result.day_name)
+                .add('unix_timestamp', "Unix timestamp", result.timestamp)
+                .extra('target_zone', result.zone)
+            )
+                   
+        except Exception as e:
+            return self._fail(f"Error converting timezone: {str(e)}")
+
+    @_offloaded_tool
+    @_instrumented
+    def get_world_clock(self, timezones: List[str] = None) -> str:
+        """
+        Show the current time in many timezones at once.
+        Examples: "What time is it in Tokyo, London and New York?"
+        :param timezones: Zones to show (IANA names, cities or abbreviations); defaults to major world cities
+        :return: A table of current times, ordered by UTC offset
+        """
+        try:
+            self._sync_valves()
+            names = split_batch_input(timezones) if timezones else list(DEFAULT_WORLD_CLOCK_ZONES)
+            now_utc = get_current_time().astimezone(datetime.timezone.utc)
+            
+            clocks = [(name, datetime_fields(now_utc.astimezone(parse_timezone(name)))) for name in names]
+            clocks.sort(key=lambda clock: clock[1].utc_offset)
+            utc = datetime_fields(now_utc)
+            
+            rows = [
+                [(name, name), (local.iso, local.datetime_text[:16]), (local.day_name, local.day_name[:3]),
+                 (local.zone, local.zone), (local.utc_offset, local.offset_text)]
+                for name, local in clocks
+            ]
+            return self._render(
+                ToolResult('world_clock', "World Clock")
+                .add_datetime('utc', "UTC", utc, utc.datetime_text)
+                .table('clocks', [('zone', "Zone"), ('local_time', "Local time"), ('day', "Day"),
+                                  ('abbreviation', "Abbr"), ('utc_offset_seconds', "Offset")], rows)
+            )
+                   
+        except Exception as e:
+            return self._fail(f"Error building world clock: {str(e)}")
+
+    @_streaming_tool
+    @_instrumented
+    def convert_timezone_bulk(self, timestamps: List[str], target_timezone: str, source_timezone: str = "UTC") -> str:
+        """
+        Convert a list of timestamps to another timezone in one call.
+        Examples: convert a UTC server log to "America/New_York"
+        :param timestamps: List of timestamps (ISO format, optionally with offset), or one per line
+        :param target_timezone: Zone to convert to
+        :param source_timezone: Zone of timestamps without an explicit offset (defaults to UTC)
+        :return: A table of the original and converted timestamps
+        """
+        try:
+            self._sync_valves()
+            items = split_batch_input(timestamps)
+            if not items:
+                return self._fail("No timestamps provided.")
+            
+            target_key = resolve_timezone_name(target_timezone)
+            source_key = resolve_timezone_name(source_timezone)
+            if target_key is None or source_key is None:
+                return self._fail(f"Unknown timezone: {target_timezone if target_key is None else source_timezone}")
+            
+            def rows():
+                size = self._batch_size(len(items))
+                for offset in range(0, len(items), size):
+                    inputs, results = convert_timestamps_bulk(items[offset:offset + size], target_key, source_key)
+                    for index, (source, result) in enumerate(zip(inputs, results), offset + 1):
+                        yield [(index, str(index)), (source, source), (result, result)]
+            
+            conversion = (
+                ToolResult('bulk_timezone_conversion', "Bulk Timezone Conversion")
+                .add('target_timezone', "Target timezone", target_key)
+                .add('count', "Timestamps", len(items), f"{len(items):,}")
+            )
+            self._table(conversion, 'results', [('index', "#"), ('input', "Input"), ('converted', "Converted")],
+                        rows(), lambda done: f"Converted {done:,} of {len(items):,} timestamps")
+            return self._render(conversion)
+                   
+        except Exception as e:
+            return self._fail(f"Error converting timestamps: {str(e)}")
+
+    @_streaming_tool
+    @_instrumented
+    def calculate_batch_addition(self, timestamps: List[str], duration_str: str) -> str:
+        """
+        Add the same duration to every timestamp in a list.
+        Examples: shift an event log by "2 hours", move a list of deadlines by "1 month"
+        :param timestamps: List of timestamps (ISO format or natural language), or one per line
+        :param duration_str: Duration to add (e.g., "2 hours", "1 month 3 days")
+        :return: A table of the original and shifted timestamps
+        """
+        return self._calculate_batch_shift(timestamps, duration_str, 1)
+
+    @_streaming_tool
+    @_instrumented
+    def calculate_batch_subtraction(self, timestamps: List[str], duration_str: str) -> str:
+        """
+        Subtract the same duration from every timestamp in a list.
+        :param timestamps: List of timestamps (ISO format or natural language), or one per line
+        :param duration_str: Duration to subtract (e.g., "2 hours", "1 month 3 days")
+        :return: A table of the original and shifted timestamps
+        """
+        return self._calculate_batch_shift(timestamps, duration_str, -1)
+
+    def _calculate_batch_shift(self, timestamps, duration_str: str, sign: int) -> str:
+        label, verb = ("Addition", "added") if sign > 0 else ("Subtraction", "subtracted")
+        try:
+            self._sync_valves()
+            items = split_batch_input(timestamps)
+            if not items:
+                return self._fail("No timestamps provided.")
+            
+            # Parse the duration once for the whole batch
+            duration = parse_duration(duration_str)
+            if duration is None:
+                return self._fail(f"Could not parse duration: {duration_str}")
+            
+            def chunks():
+                size = self._batch_size(len(items))
+                for offset in range(0, len(items), size):
+                    inputs, results = shift_timestamps(items[offset:offset + size], duration, sign)
+                    indices = range(offset + 1, offset + 1 + len(inputs))
+                    # Rows are zipped column by column, so no Python code runs per row
+                    yield zip(zip(indices, map(str, indices)), zip(inputs, inputs), zip(results, results))
+            
+            shift = (
+                ToolResult(f"batch_time_{label.lower()}", f"Batch Time {label} Result")
+                .add('duration', f"Duration {verb}", duration_str)
+                .add('count', "Timestamps", len(items), f"{len(items):,}")
+            )
+            self._table(shift, 'results', [('index', "#"), ('input', "Input"), ('result', "Result")],
+                        itertools.chain.from_iterable(chunks()),
+                        lambda done: f"Shifted {done:,} of {len(items):,} timestamps")
+            return self._render(shift)
+                   
+        except Exception as e:
+            return self._fail(f"Error calculating batch time {label.lower()}: {str(e)}")
+
+    @_streaming_tool
+    @_instrumented
+    def calculate_pairwise_difference(self, starts: List[str], ends: List[str]) -> str:
+        """
+        Calculate the difference between each start and end timestamp pair.
+        Examples: durations of logged sessions, time between request and response stamps
+        :param starts: List of start timestamps (ISO format or natural language), or one per line
+        :param ends: List of end timestamps, same length as starts
+        :return: A table of the differences for every pair
+        """
+        try:
+            self._sync_valves()
+            start_items = split_batch_input(starts)
+            end_items = split_batch_input(ends)
+            if len(start_items) != len(end_items):
+                return self._fail(f"Start and end lists must be the same length (got {len(start_items)} and {len(end_items)}).")
+            if not start_items:
+                return self._fail("No timestamps provided.")
+            
+            totals = [0]
+            
+            def chunks():
+                size = self._batch_size(len(start_items))
+                for offset in range(0, len(start_items), size):
+                    start_strs, end_strs, seconds = pairwise_differences(
+                        start_items[offset:offset + size], end_items[offset:offset + size])
+                    totals[0] += sum(seconds)
+                    texts = format_durations(seconds)
+                    indices = range(offset + 1, offset + 1 + len(seconds))
+                    yield zip(zip(indices, map(str, indices)), zip(start_strs, start_strs), zip(end_strs, end_strs),
+                              zip(texts, texts), zip(seconds, map('{:,}'.format, seconds)))
+            
+            differences = ToolResult('pairwise_difference', "Pairwise Time Difference Result")
+            self._table(differences, 'results', [('index', "#"), ('start', "Start"), ('end', "End"),
+                                                 ('difference', "Difference"), ('seconds', "Seconds")],
+                        itertools.chain.from_iterable(chunks()),
+                        lambda done: f"Compared {done:,} of {len(start_items):,} pairs")
+            total = totals[0]
+            differences.add('pairs', "Pairs", len(start_items), f"{len(start_items):,}")
+            differences.add('total_seconds', "Total", total,
+                            f"{'-' if total < 0 else ''}{format_duration(abs(total))} ({total:,} seconds)")
+            return self._render(differences)
+                   
+        except Exception as e:
+            return self._fail(f"Error calculating pairwise differences: {str(e)}")
+
+    def _time_ranges(self, ranges, *times) -> tuple:
+        """
+        Parse range strings, plus optional date/time arguments, onto one nanosecond scale.
+        Returns (ranges, display zone, times), with None for the times not given.
+        """
+        items = split_batch_input(ranges)
+        if not items:
+            raise ValueError("No time ranges provided.")
+        datetimes = []
+        for item in items:
+            datetimes.extend(parse_time_range(item))
+        given = [parse_natural_datetime(value) for value in times if value]
+        values, zone = datetimes_to_ns(datetimes + given)
+        pairs = list(zip(values[0:len(datetimes):2], values[1:len(datetimes):2]))
+        given_ns = iter(values[len(datetimes):])
+        return pairs, zone, [next(given_ns) if value else None for value in times]
+
+    def _range_table(self, result: ToolResult, key: str, ranges: List[Tuple[int, int]],
+                     zone: Optional[datetime.tzinfo]) -> ToolResult:
+        """
+        Add ranges as a #/Start/End/Length table, capped by the max_listed_ranges Valve.
+        """
+        def rows():
+            for index, (start, end) in enumerate(ranges[:max(0, self.valves.max_listed_ranges)], 1):
+                start_fields, end_fields = range_ns_fields(start, zone), range_ns_fields(end, zone)
+                seconds = (end - start) // NS_PER_SECOND
+                yield [(index, str(index)), (start_fields.iso, start_fields.display),
+                       (end_fields.iso, end_fields.display), (seconds, format_duration(seconds))]
+        
+        listed = self._table(result, key, [('index', "#"), ('start', "Start"), ('end', "End"), ('seconds', "Length")],
+                             rows())
+        if len(ranges) > listed:
+            result.note = f"Showing the first {listed:,} of {len(ranges):,}."
+        return result
+
+    @_streaming_tool
+    @_instrumented
+    def merge_time_ranges(self, ranges: List[str]) -> str:
+        """
+        Merge overlapping time ranges and report the total time they cover.
+        Examples: total hours covered by a set of shifts, a person's busy blocks for the week
+        :param ranges: List of ranges such as "9am to 5pm", "2024-03-10 09:00 - 12:30", "monday 2pm for 90 minutes", or one per line
+        :return: The merged ranges with the total coverage and the double-booked time
+        """
+        try:
+            self._sync_valves()
+            pairs, zone, _ = self._time_ranges(ranges)
+            merged = merge_ranges(pairs)
+            covered = sum(end - start for start, end in merged) // NS_PER_SECOND
+            booked = sum(end - start for start, end in pairs) // NS_PER_SECOND
+            span = (merged[-1][1] - merged[0][0]) // NS_PER_SECOND
+            union = (
+                ToolResult('time_range_union', "Merged Time Ranges")
+                .add('ranges', "Ranges", len(pairs), f"{len(pairs):,}")
+                .add('merged', "Merged ranges", len(merged), f"{len(merged):,}")
+                .add('covered_seconds', "Total coverage", covered, f"{format_duration(covered)} ({covered:,} seconds)")
+                .add('overlap_seconds', "Overlapping time", booked - covered,
+                     f"{format_duration(booked - covered)} ({booked - covered:,} seconds)")
+                .add('span_seconds', "Span", span, f"{format_duration(span)} from first start to last end")
+            )
+            return self._render(self._range_table(union, 'merged_ranges', merged, zone))
+        
+        except Exception as e:
+            return self._fail(f"Error merging time ranges: {str(e)}")
+
+    @_streaming_tool
+    @_instrumented
+    def intersect_time_ranges(self, ranges: List[str], min_overlap: int = None) -> str:
+        """
+        Find when time ranges overlap: by default the time covered by all of them, or with
+        min_overlap the time covered by at least that many.
+        Examples: when all the proposed windows overlap, when at least 3 shifts are on at once
+        :param ranges: List of ranges such as "9am to 5pm", "2024-03-10 09:00 - 12:30", or one per line
+        :param min_overlap: Minimum number of ranges that must overlap (default: all of them)
+        :return: The overlapping stretches and their total length
+        """
+        try:
+            self._sync_valves()
+            pairs, zone, _ = self._time_ranges(ranges)
+            required = len(pairs) if min_overlap is None else min_overlap
+            if not 1 <= required <= len(pairs):
+                return self._fail(f"min_overlap must be between 1 and the number of ranges ({len(pairs)}).")
+            stretches = covered_ranges(pairs, required)
+            if not stretches:
+                return self._fail(f"No time is covered by {'all' if required == len(pairs) else f'at least {required}'} "
+                                  f"of the {len(pairs)} ranges.")
+            total = sum(end - start for start, end in stretches) // NS_PER_SECOND
+            overlap = (
+                ToolResult('time_range_overlap', "Overlapping Time Ranges")
+                .add('ranges', "Ranges", len(pairs), f"{len(pairs):,}")
+                .add('min_overlap', "Covered by at least", required, f"{required:,} of {len(pairs):,}")
+                .add('stretches', "Overlapping stretches", len(stretches), f"{len(stretches):,}")
+                .add('total_seconds', "Total overlap", total, f"{format_duration(total)} ({total:,} seconds)")
+            )
+            return self._render(self._range_table(overlap, 'overlaps', stretches, zone))
+        
+        except Exception as e:
+            return self._fail(f"Error intersecting time ranges: {str(e)}")
+
+    @_streaming_tool
+    @_instrumented
+    def find_time_gaps(self, ranges: List[str], window_start: str = None, window_end: str = None) -> str:
+        """
+        Find the free time between busy ranges.
+        Examples: when everyone is free given all their meetings, idle time between jobs
+        :param ranges: List of busy ranges such as "9am to 10:30am", "2024-03-10 13:00 - 14:00", or one per line
+        :param window_start: Optional start of the period to search (default: the first range's start)
+        :param window_end: Optional end of the period to search (default: the last range's end)
+        :return: The free stretches and their total length
+        """
+        try:
+            self._sync_valves()
+            pairs, zone, (start, end) = self._time_ranges(ranges, window_start, window_end)
+            if start is not None and end is not None and end <= start:
+                return self._fail("The window must end after it starts.")
+            gaps = range_gaps(merge_ranges(pairs), start, end)
+            if not gaps:
+                return self._fail("There is no free time between the ranges in that period.")
+            total = sum(gap_end - gap_start for gap_start, gap_end in gaps) // NS_PER_SECOND
+            free = (
+                ToolResult('time_gaps', "Free Time Between Ranges")
+                .add('ranges', "Busy ranges", len(pairs), f"{len(pairs):,}")
+                .add('stretches', "Free stretches", len(gaps), f"{len(gaps):,}")
+                .add('total_seconds', "Total free time", total, f"{format_duration(total)} ({total:,} seconds)")
+            )
+            return self._render(self._range_table(free, 'gaps', gaps, zone))
+        
+        except Exception as e:
+            return self._fail(f"Error finding time gaps: {str(e)}")
+
+    @_offloaded_tool
+    @_instrumented
+    def find_free_slot(self, ranges: List[str], duration_str: str, window_start: str = None,
+                       window_end: str = None) -> str:
+        """
+        Find the first free slot of a given length that avoids every busy range.
+        Examples: the first 1-hour slot when all attendees are free, the next 30-minute opening tomorrow
+        :param ranges: List of busy ranges such as "9am to 10:30am", "2024-03-10 13:00 - 14:00", or one per line
+        :param duration_str: Length of the slot (e.g., "1 hour", "30 minutes")
+        :param window_start: Earliest start for the slot (default: now)
+        :param window_end: Optional time by which the slot must end
+        :return: The first free slot
+        """
+        try:
+            self._sync_valves()
+            duration = parse_duration(duration_str)
+            if duration is None:
+                return self._fail(f"Could not parse duration: {duration_str}")
+            if duration.nanoseconds <= 0 and duration.total_months <= 0:
+                return self._fail("The slot length must be positive.")
+            pairs, zone, (start, end) = self._time_ranges(ranges, window_start or 'now', window_end)
+            slot = first_free_slot(merge_ranges(pairs), duration, start, end)
+            if slot is None:
+                return self._fail(f"No free slot of {duration_str} fits before the end of the window.")
+            slot_start, slot_end = range_ns_fields(slot[0], zone), range_ns_fields(slot[1], zone)
+            return self._render(
+                ToolResult('free_slot', "First Free Slot")
+                .add('duration', "Length", duration_str)
+                .add_datetime('start', "Start", slot_start)
+                .add_datetime('end', "End", slot_end)
+                .add('day_of_week', "Day of week", slot_start.day_name)
+                .add('ranges', "Busy ranges checked", len(pairs), f"{len(pairs):,}")
+            )
+        
+        except Exception as e:
+            return self._fail(f"Error finding a free slot: {str(e)}")
+
+    def _business_calendar(self, calendar_name: Optional[str]) -> BusinessCalendar:
+        name = calendar_name if calendar_name is not None else self.valves.default_holiday_calendar
+        return get_business_calendar(
+            name.strip(), self.valves.holiday_calendar_dir, parse_weekday_set(self.valves.weekend_days)
+        )
+
+    @_offloaded_tool
+    @_instrumented
+    def add_business_days(self, duration_str: str, start_time: str = None, calendar_name: str = None,
+                          __metadata__: dict = None, __user__: dict = None) -> str:
+        """
+        Add business days to a date, skipping weekends and holidays.
+        Examples: "5 business days after Friday", "10 working days from 2024-12-20"
+        :param duration_str: Business days to add (e.g., "5 business days", "2 weeks", "10")
+        :param start_time: Start date (defaults to current time)
+        :param calendar_name: Holiday calendar to use (defaults to the default_holiday_calendar Valve)
+        :return: The resulting business day
+        """
+        return self._shift_business_days(duration_str, start_time, calendar_name, 1, __metadata__, __user__)
+
+    @_offloaded_tool
+    @_instrumented
+    def subtract_business_days(self, duration_str: str, start_time: str = None, calendar_name: str = None,
+                               __metadata__: dict = None, __user__: dict = None) -> str:
+        """
+        Subtract business days from a date, skipping weekends and holidays.
+        Examples: "3 business days before 2024-07-08"
+        :param duration_str: Business days to subtract (e.g., "3 business days", "1 week")
+        :param start_time: Start date (defaults to current time)
+        :param calendar_name: Holiday calendar to use (defaults to the default_holiday_calendar Valve)
+        :return: The resulting business day
+        """
+        return self._shift_business_days(duration_str, start_time, calendar_name, -1, __metadata__, __user__)
+
+    def _shift_business_days(self, duration_str: str, start_time: Optional[str], calendar_name: Optional[str], sign: int,
+                             metadata: Optional[dict] = None, user: Optional[dict] = None) -> str:
+        label, verb = ("Addition", "added") if sign > 0 else ("Subtraction", "subtracted")
+        try:
+            self._sync_valves()
+            context = self._conversation_context(conversation_key(metadata, user))
+            business_calendar = self._business_calendar(calendar_name)
+            days = parse_business_days(duration_str, 7 - len(business_calendar.weekend))
+            start_dt, start_description = resolve_time_argument(start_time, context)
+            
+            year, month, day = ordinal_to_date(business_calendar.add(start_dt.toordinal(), sign * days))
+            result_dt = start_dt.replace(year=year, month=month, day=day)
+            start = datetime_fields(start_dt)
+            result = datetime_fields(result_dt)
+            spanned = abs(result_dt.toordinal() - start_dt.toordinal())
+            
+            return self._render(
+                ToolResult(f"business_day_{label.lower()}", f"Business Day {label} Result")
+                .add_datetime('start', "Start", start, f"{start.display} ({start_description})")
+                .add('business_days', f"Business days {verb}", days, f"{days:,}")
+                .add_datetime('result', "Result", result)
+                .add('day_of_week', "Day of week", result.day_name)
+                .add('calendar_days', "Calendar days spanned", spanned, f"{spanned:,}")
+                .extra('start_description', start_description)
+            )
+                   
+        except Exception as e:
+            return self._fail(f"Error calculating business day {label.lower()}: {str(e)}")
+
+    @_offloaded_tool
+    @_instrumented
+    def count_business_days(self, start_time: str, end_time: str, calendar_name: str = None,
+                            __metadata__: dict = None, __user__: dict = None) -> str:
+        """
+        Count the business days between two dates (the start day is counted, the end day is not).
+        Examples: "How many business days until 2025-01-31?", "working days in March 2024"
+        :param start_time: Start date (e.g., "2024-03-01", "today")
+        :param end_time: End date (e.g., "2024-04-01", "in 3 weeks")
+        :param calendar_name: Holiday calendar to use (defaults to the default_holiday_calendar Valve)
+        :return: The number of business days
+        """
+        try:
+            self._sync_valves()
+            context = self._conversation_context(conversation_key(__metadata__, __user__))
+            business_calendar = self._business_calendar(calendar_name)
+            start_dt, start_description = resolve_time_argument(start_time, context)
+            end_dt, end_description = resolve_time_argument(end_time, context)
+            
+            business_days = business_calendar.count(start_dt.toordinal(), end_dt.toordinal())
+            calendar_days = end_dt.toordinal() - start_dt.toordinal()
+            start = datetime_fields(start_dt)
+            end = datetime_fields(end_dt)
+            
+            return self._render(
+                ToolResult('business_day_count', "Business Day Count")
+                .add('start', "Start", start.date_text, f"{start.date_text} ({start.day_name}) ({start_description})")
+                .add('end', "End", end.date_text, f"{end.date_text} ({end.day_name}) ({end_description})")
+                .add('business_days', "Business days", business_days, f"{business_days:,}")
+                .add('calendar_days', "Calendar days", calendar_days, f"{calendar_days:,}")
+                .add('non_working_days', "Non-working days", calendar_days - business_days,
+                     f"{calendar_days - business_days:,}")
+            )
+                   
+        except Exception as e:
+            return self._fail(f"Error counting business days: {str(e)}")
+
+    @_offloaded_tool
+    @_instrumented
+    def calculate_working_hours(self, start_time: str, end_time: str, calendar_name: str = None,
+                                __metadata__: dict = None, __user__: dict = None) -> str:
+        """
+        Calculate the working hours between two date/times, counting only working hours on business days.
+        Examples: "How many working hours between Friday 4pm and Monday 10:30am?"
+        :param start_time: Start date/time
+        :param end_time: End date/time
+        :param calendar_name: Holiday calendar to use (defaults to the default_holiday_calendar Valve)
+        :return: The working time between the two instants
+        """
+        try:
+            self._sync_valves()
+            context = self._conversation_context(conversation_key(__metadata__, __user__))
+            business_calendar = self._business_calendar(calendar_name)
+            day_start = parse_time_string(self.valves.work_day_start)
+            day_end = parse_time_string(self.valves.work_day_end)
+            start_dt, start_description = resolve_time_argument(start_time, context)
+            end_dt, end_description = resolve_time_argument(end_time, context)
+            if (start_dt.tzinfo is None) != (end_dt.tzinfo is None):
+                start_dt, end_dt = start_dt.astimezone(), end_dt.astimezone()
+            
+            seconds = working_seconds_between(business_calendar, start_dt, end_dt, day_start, day_end)
+            start = datetime_fields(start_dt)
+            end = datetime_fields(end_dt)
+            working_day = f"{day_start.strftime('%H:%M')}-{day_end.strftime('%H:%M')}"
+            
+            return self._render(
+                ToolResult('working_hours', "Working Hours Calculation")
+                .add_datetime('start', "Start", start, f"{start.display} ({start_description})")
+                .add_datetime('end', "End", end, f"{end.display} ({end_description})")
+                .add('working_day', "Working day", working_day)
+                .add('working_seconds', "Working time", seconds,
+                     f"{'-' if seconds < 0 else ''}{format_duration(abs(seconds))}")
+                .add('working_hours', "Working hours", seconds / 3600, f"{seconds / 3600:,.2f}")
+            )
+                   
+        except Exception as e:
+            return self._fail(f"Error calculating working hours: {str(e)}")
+
+    @_streaming_tool
+    @_instrumented
+    def expand_recurrence(
+        self, rule: str, start_time: str = None, count: int = 10, end_time: str = None, after_time: str = None,
+        __metadata__: dict = None, __user__: dict = None,
+    ) -> str:
+        """
+        List the occurrences of a repeating schedule.
+        Examples: "every other Tuesday at 3pm", "the last weekday of each month",
+        "next 50 occurrences of every month on the 15th after 2025-01-01"
+        :param rule: Recurrence rule (e.g., "every 2 weeks on monday and thursday", "first monday of every month at 10am")
+        :param start_time: When the schedule starts; anchors "every other" rules (defaults to now)
+        :param count: Maximum number of occurrences to list (default: 10)
+        :param end_time: Optional date/time after which no occurrences are listed
+        :param after_time: Optional date/time; only occurrences at or after it are listed
+        :return: The upcoming occurrences
+        """
+        try:
+            self._sync_valves()
+            context = self._conversation_context(conversation_key(__metadata__, __user__))
+            recurrence = compile_recurrence_cached(rule)
+            start_dt, start_description = resolve_time_argument(start_time, context)
+            after_dt = parse_natural_datetime(after_time) if after_time else None
+            end_dt = parse_natural_datetime(end_time) if end_time else None
+            if count < 1:
+                return self._fail("The occurrence count must be at least 1.")
+            limit = min(count, self.valves.max_recurrence_occurrences)
+            
+            def rows():
+                for index, occurrence in enumerate(iter_occurrences(recurrence, start_dt, after_dt), 1):
+                    if index > limit or (end_dt is not None and occurrence > end_dt):
+                        break
+                    fields = datetime_fields(occurrence)
+                    yield [(index, str(index)), (fields.iso, fields.display), (fields.day_name, fields.day_name)]
+            
+            expansion = ToolResult('recurrence', "Recurrence Expansion")
+            listed = self._table(expansion, 'occurrences', [('index', "#"), ('datetime', "Date/Time"), ('day', "Day")],
+                                 rows(), lambda done: f"Expanded {done:,} occurrences")
+            if not listed:
+                return self._fail(f"No occurrences of \"{rule}\" in the requested range.")
+            
+            start = datetime_fields(start_dt)
+            expansion.add('rule', "Rule", rule)
+            expansion.add('interpreted_as', "Interpreted as", recurrence.describe())
+            expansion.add_datetime('start', "Starting", start, f"{start.display} ({start_description})")
+            if after_dt:
+                expansion.add_datetime('after', "After", datetime_fields(after_dt))
+            if end_dt:
+                expansion.add_datetime('until', "Until", datetime_fields(end_dt))
+            expansion.add('count', "Occurrences", listed, f"{listed:,}")
+            if count > limit and listed == limit:
+                expansion.note = "Limited by the max_recurrence_occurrences Valve."
+            return self._render(expansion)
                    
         except Exception as e:
-            return f"Error getting time info: {str(e)}"
\ No newline at end of file
+            return self._fail(f"Error expanding recurrence: {str(e)}")
+
+    @_streaming_tool
+    @_instrumented
+    def extract_time_expressions(self, text: str, max_results: int = 50) -> str:
+        """
+        Find every date, time and duration expression in a long text, such as a meeting
+        transcript or an email thread, with its position and resolved value.
+        :param text: The text to search
+        :param max_results: Maximum number of expressions to list (default: 50)
+        :return: The expressions found, in order
+        """
+        try:
+            self._sync_valves()
+            if max_results < 1:
+                return self._fail("max_results must be at least 1.")
+            limit = min(max_results, self.valves.max_extracted_expressions)
+            
+            stream = current_stream()
+            
+            def chunks():
+                for start in range(0, len(text), EXTRACTION_CHUNK_CHARS):
+                    check_cancelled()
+                    if stream is not None and start:
+                        stream.status(f"Scanned {start:,} of {len(text):,} characters")
+                    yield text[start:start + EXTRACTION_CHUNK_CHARS]
+            
+            counts = {'datetime': 0, 'duration': 0}
+            
+            def rows():
+                listed = 0
+                for mention in iter_time_mentions(chunks()):
+                    counts[mention.kind] += 1
+                    if listed >= limit:
+                        continue
+                    if mention.kind == 'datetime':
+                        fields = datetime_fields(mention.value)
+                        value = (fields.iso, fields.display)
+                    else:
+                        duration = mention.value
+                        value = ({unit: amount for unit, amount in duration._asdict().items() if amount},
+                                 _join_duration_parts(duration.years, duration.months, duration.weeks * 7 + duration.days,
+                                                      duration.hours, duration.minutes, duration.seconds))
+                    listed += 1
+                    yield [(listed, str(listed)), (mention.text, mention.text),
+                           (mention.kind, _MENTION_KIND_LABELS[mention.kind]), value,
+                           ([mention.start, mention.end], f"{mention.start}-{mention.end}")]
+            
+            extraction = ToolResult('time_expressions', "Time Expressions Found")
+            listed = self._table(extraction, 'expressions', [('index', "#"), ('text', "Text"), ('type', "Type"),
+                                                             ('value', "Value"), ('span', "Position")],
+                                 rows(), lambda done: f"Listed {done:,} expressions")
+            total = counts['datetime'] + counts['duration']
+            if not total:
+                return self._fail("No date, time or duration expressions found.")
+            
+            extraction.add('count', "Expressions", total, f"{total:,}")
+            extraction.add('datetimes', "Dates and times", counts['datetime'], f"{counts['datetime']:,}")
+            extraction.add('durations', "Durations", counts['duration'], f"{counts['duration']:,}")
+            extraction.add('characters', "Characters scanned", len(text), f"{len(text):,}")
+            if total > listed:
+                extraction.note = f"Showing the first {listed:,} of {total:,}."
+            return self._render(extraction)
+        
+        except Exception as e:
+            return self._fail(f"Error extracting time expressions: {str(e)}")
+
+    @_tool
+    def get_tool_stats(self, export_format: str = "json") -> str:
+        """
+        Report the tool's instrumentation: per-method latency and input-size histograms,
+        parser branch hits, parse failures and fallbacks to the current time.
+        Recording is off unless the enable_stats Valve is on.
+        :param export_format: "json" for a snapshot, or "prometheus" for the Prometheus text format
+        :return: The statistics in the requested format
+        """
+        try:
+            self._sync_valves()
+            if export_format == "prometheus":
+                return TOOL_STATS.to_prometheus()
+            if export_format != "json":
+                return self._fail(f"Unknown export_format: {export_format}. Use 'json' or 'prometheus'")
+            import json
+            return json.dumps(TOOL_STATS.snapshot(), indent=2)
+        
+        except Exception as e:
+            return self._fail(f"Error reporting tool stats: {str(e)}")
+
+    def _exact_calendar(self) -> bool:
+        """
+        True when durations should use exact calendar months and years.
+        """
+        mode = self.valves.calendar_mode
+        if mode not in ("exact", "approximate"):
+            raise ValueError(f"Unknown calendar_mode: {mode}. Use 'exact' or 'approximate'")
+        return mode == "exact"
+
+    def _get_executor(self):
+        """
+        Return the executor described by the Valves, replacing it if the Valves changed.
+        """
+        config = (self.valves.executor_type, self.valves.executor_max_workers)
+        with self._executor_lock:
+            if self._executor is None or self._executor_config != config:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                executor_type, max_workers = config
+                import concurrent.futures
+                if executor_type == "process":
+                    self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+                elif executor_type == "thread":
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=max_workers, thread_name_prefix="time_calculator"
+                    )
+                else:
+                    raise ValueError(f"Unknown executor_type: {executor_type}. Use 'thread' or 'process'")
+                self._executor_config = config
+            return self._executor
+
+    def _call_sync(self, method_name: str, args: tuple, kwargs: dict) -> str:
+        """Run the synchronous implementation of a public method."""
+        return getattr(type(self), method_name).sync(self, *args, **kwargs)
+
+    async def _dispatch(self, method_name: str, args: tuple, kwargs: dict, emitter: Callable = None) -> str:
+        """
+        Run a public method for its coroutine. Calls with less text than the
+        offload_min_chars Valve run inline on the event loop, where they finish faster than
+        an executor hand-off would take, unless their method is marked offload (see _tool);
+        the rest are offloaded.
+        """
+        threshold = self.valves.offload_min_chars
+        if (threshold > 0 and not getattr(type(self), method_name).offload
+                and _input_chars(args, kwargs, threshold) < threshold):
+            return self._run_inline(method_name, args, kwargs)
+        return await self._run_offloaded(method_name, args, kwargs, emitter)
+
+    def _run_inline(self, method_name: str, args: tuple, kwargs: dict) -> str:
+        """
+        Run a synchronous method on the event loop, enforcing the per-call timeout. Nothing
+        can interrupt code running on the loop itself, so the call checks a _Deadline at the
+        same points where an offloaded call checks for cancellation.
+        """
+        timeout = self.valves.call_timeout_seconds
+        if timeout <= 0:
+            return self._call_sync(method_name, args, kwargs)
+        deadline = _Deadline(timeout)
+        try:
+            result = _call_on_thread(functools.partial(self._call_sync, method_name, args, kwargs), deadline, None)
+        except CallCancelled:
+            return self._timed_out(method_name)
+        return self._timed_out(method_name) if deadline.expired else result
+
+    def _timed_out(self, method_name: str) -> str:
+        return self._fail(f"Error: {method_name} timed out after {self.valves.call_timeout_seconds:g} seconds")
+
+    async def _run_offloaded(self, method_name: str, args: tuple, kwargs: dict, emitter: Callable = None) -> str:
+        """
+        Run a synchronous method on the executor, enforcing the per-call timeout.
+        
+        A thread cannot be killed, so a call that times out (or whose task is cancelled) is
+        told to stop and gives up its thread at the next row it produces; a process worker
+        finishes the call and its result is discarded. Streaming and the conversation store
+        live in this process, so with the process executor, calls that pass an event
+        emitter or Open WebUI's __metadata__/__user__ run on the event loop's threads instead.
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        cancel = threading.Event()
+        stream = None
+        try:
+            executor = self._get_executor()
+            needs_this_process = emitter is not None or any(name.startswith('__') for name in kwargs)
+            if self.valves.executor_type == "process" and not needs_this_process:
+                call = functools.partial(_run_in_worker, method_name, self.valves.model_dump(), args, kwargs)
+            else:
+                if self.valves.executor_type == "process":
+                    executor = None  # the event loop's default thread pool
+                if emitter is not None and self.valves.stream_chunk_rows > 0:
+                    stream = ResultStream(emitter, loop, self.valves.stream_chunk_rows, self.valves.output_mode)
+                call = functools.partial(_call_on_thread, functools.partial(self._call_sync, method_name, args, kwargs),
+                                         cancel, stream)
+            
+            future = loop.run_in_executor(executor, call)
+            timeout = self.valves.call_timeout_seconds
+            result = await asyncio.wait_for(future, timeout if timeout > 0 else None)
+            if stream is not None and stream.sent_rows and not stream.failed:
+                try:
+                    await emitter({'type': 'status', 'data': {'description': f"Streamed {stream.sent_rows:,} rows",
+                                                              'done': True}})
+                except Exception:
+                    pass  # the rows are in the chat already; a lost status must not lose the result
+            return result
+            
+        except asyncio.TimeoutError:
+            return self._timed_out(method_name)
+        except Exception as e:
+            return self._fail(f"Error running {method_name}: {str(e)}")
+        finally:
+            cancel.set()
+            if stream is not None:
+                stream.closed = True